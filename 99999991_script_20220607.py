@@ -7,8 +7,12 @@ Created on Mon Dec 13 19:41:17 2021
 
 from sl3 import *
 
+import uos
 import urandom
 
+from portsfile import PortsFile
+from pseudobinary import pseudo_encoder
+
 
 def sutron_day_calc(julian_day, year):
     """
@@ -247,49 +251,52 @@ def sl3_datetime():
     return sl3_date, sl3_time
 
 
-def ports_tag_message_append(flag, val, f, typ=1):
+def ports_tag_message_append(flag, val, msg, typ=1):
     if typ == 1:
-        f.write(flag)
-        f.write("{:>11.1f}\r\n".format(val) if val != -99999.0 else "  Data Flagged as bad or missing\r\n")
+        msg.append(flag)
+        msg.append("{:>11.1f}\r\n".format(val) if val != -99999.0 else "  Data Flagged as bad or missing\r\n")
     elif typ == 2:
-        f.write(flag)
-        f.write("{:>10.3f}".format(val) + "\r\n" if val != -99999.0 else " data not available\r\n")
+        msg.append(flag)
+        msg.append("{:>10.3f}".format(val) + "\r\n" if val != -99999.0 else " data not available\r\n")
     elif typ == 3:
-        f.write(flag)
+        msg.append(flag)
         if -99999.0 not in val[:3]:
-            f.write("{0}{1}{2}{3}{4}\r\n".format("{:>11.3f}".format(val[0]), "{:>9.3f}".format(val[1]),
+            msg.append("{0}{1}{2}{3}{4}\r\n".format("{:>11.3f}".format(val[0]), "{:>9.3f}".format(val[1]),
                                                  "{:>10.0f}".format(val[2]), "{:>10.1f}".format(val[3]),
                                                  "{:>10.1f}".format(val[4])))
         else:
-            f.write("  Data flagged as bad or missing\r\n")
+            msg.append("  Data flagged as bad or missing\r\n")
     elif typ == 4:
-        f.write(flag)
+        msg.append(flag)
         if -99999.0 not in val:
-            f.write("{0}{1}{2}\r\n".format("{:>11.1f}".format(val[0]),
+            msg.append("{0}{1}{2}\r\n".format("{:>11.1f}".format(val[0]),
                                            "{:>9.0f}".format(val[1]),
                                            "{:>10.1f}".format(val[2])))
         else:
-            f.write("  Data flagged as bad or missing\r\n")
+            msg.append("  Data flagged as bad or missing\r\n")
 
     elif typ == 5:
-        f.write(flag)
+        msg.append(flag)
         if -99999.0 not in val:
-            f.write("{0}{1}{2}\r\n".format("{:>11.3f}".format(val[0]),
+            msg.append("{0}{1}{2}\r\n".format("{:>11.3f}".format(val[0]),
                                            "{:>9.3f}".format(val[1]),
                                            "{:>10.0f}".format(val[2])))
         else:
-            f.write("  Data flagged as bad or missing\r\n")
+            msg.append("  Data flagged as bad or missing\r\n")
     elif typ == 6:
         for v in val:
-            f.write(flag)
-            f.write("{:>11.3f}".format(v) + "\r\n" if v != -99999.0 else " data not available\r\n")
+            msg.append(flag)
+            msg.append("{:>11.3f}".format(v) + "\r\n" if v != -99999.0 else " data not available\r\n")
 
     elif typ == 7:
-        f.write(flag)
-        f.write("{:>10.2f}\r\n".format(val) if val != -99999.0 else " Data Flagged as bad or missing\r\n")
+        msg.append(flag)
+        msg.append("{:>10.2f}\r\n".format(val) if val != -99999.0 else " Data Flagged as bad or missing\r\n")
     return
 
 
+ports_file = PortsFile("p", open, uos)
+
+
 def ports_tag_message_formatter():
     """
     This function formats the data to a file for PORTS Tag transmission
@@ -297,6 +304,7 @@ def ports_tag_message_formatter():
     aqt = []
     mwwl1 = []
     mwwl2 = []
+    bwl = []
     wind1 = []
     wind2 = []
     station_id = command_line("!STATION NAME\r").strip()
@@ -307,65 +315,89 @@ def ports_tag_message_formatter():
     pri_hour = str("{:02d}".format(add_sns[0].hour))
     pri_minute = str("{:02d}".format(add_sns[0].minute))
     pri_second = str("{:02d}".format(add_sns[0].second))
-    f = open("p", "w")
-    f.write("NOS {0} {1} {2}:{3}:{4}\r\n".format(station_id, pri_date, pri_hour, pri_minute, pri_second))
+    msg = ["NOS {0} {1} {2}:{3}:{4}\r\n".format(station_id, pri_date, pri_hour, pri_minute, pri_second)]
     for a_s in add_sns:
         if a_s.label in ("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"):
             aqt.append(a_s.value)
             if len(aqt) == 5:
-                ports_tag_message_append("A1 1", aqt, f, 3)
+                ports_tag_message_append("A1 1", aqt, msg, 3)
         elif a_s.label in ("WS", "WD", "WG"):
             wind1.append(a_s.value)
             if len(wind1) == 3:
-                ports_tag_message_append("C1 3", wind1, f, 4)
+                ports_tag_message_append("C1 3", wind1, msg, 4)
         elif a_s.label in ("WS2", "WD2", "WG2"):
             wind2.append(a_s.value)
             if len(wind2) == 3:
-                ports_tag_message_append("C2 3", wind2, f, 4)
+                ports_tag_message_append("C2 3", wind2, msg, 4)
         elif a_s.label in ("MWWL", "MWSTD", "MWOUT"):
             mwwl1.append(a_s.value)
             if len(mwwl1) == 3:
-                ports_tag_message_append("Y1 8", mwwl1, f, 5)
+                ports_tag_message_append("Y1 8", mwwl1, msg, 5)
         elif a_s.label in ("BWL", "BWLSTD", "BWLOUT"):
             bwl.append(a_s.value)
             if len(bwl) == 3:
-                ports_tag_message_append("B1 2", bwl, f, 5)
+                ports_tag_message_append("B1 2", bwl, msg, 5)
         elif a_s.label in ("MWWL2", "MWSTD2", "MWOUT2"):
             mwwl2.append(a_s.value)
             if len(mwwl2) == 3:
-                ports_tag_message_append("Y2 8", mwwl2, f, 5)
+                ports_tag_message_append("Y2 8", mwwl2, msg, 5)
         elif a_s.label == "AT":
-            ports_tag_message_append("D1 4", a_s.value, f)
+            ports_tag_message_append("D1 4", a_s.value, msg)
         elif a_s.label == "WT":
-            ports_tag_message_append("E1 5", a_s.value, f)
+            ports_tag_message_append("E1 5", a_s.value, msg)
         elif a_s.label == "CTWT":
-            ports_tag_message_append("E2 5", a_s.value, f)
+            ports_tag_message_append("E2 5", a_s.value, msg)
         elif a_s.label == "BARO":
-            ports_tag_message_append("F1 6", a_s.value, f)
+            ports_tag_message_append("F1 6", a_s.value, msg)
         elif a_s.label in ("BAT", "BBAT"):
-            ports_tag_message_append("L1 <", a_s.value, f)
+            ports_tag_message_append("L1 <", a_s.value, msg)
         elif a_s.label == "COND":
-            ports_tag_message_append("G1 -7", a_s.value, f, 7)
+            ports_tag_message_append("G1 -7", a_s.value, msg, 7)
         elif a_s.label in ("SNS", "DAT"):
-            ports_tag_message_append(a_s.label, a_s.value, f, 2)
+            ports_tag_message_append(a_s.label, a_s.value, msg, 2)
         elif a_s.label == "TWL":
             val = a_s.value, a_s.value2, a_s.value3, a_s.value4, a_s.value5, a_s.value6
-            ports_tag_message_append("U1", val, f, 6)
-    f.write("\r\nREPORT COMPLETE\r\n")
-    f.close()
+            ports_tag_message_append("U1", val, msg, 6)
+    msg.append("\r\nREPORT COMPLETE\r\n")
+    ports_file.write("".join(msg))
 
 
 message_ready = True
 
 
-def sort_sns_list(list_item, list_label, old_list, new_list):
-    for lst in list_item:
-        try:
-            new_list.append(old_list.pop(list_label.index(lst)))
-            list_label.pop(list_label.index(lst))
-        except ValueError:
-            return list_item, old_list, new_list
-    return list_label, old_list, new_list
+# sensor groups in sensor list order, after the group of the first measurement
+SENSOR_ORDER = (("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), ("MWWL", "MWSTD", "MWOUT", "MWCOUNTS"),
+                ("MWWL2", "MWSTD2", "MWOUT2", "MWCOUNTS2"), ("WS", "WD", "WG"), ("WS2", "WD2", "WG2"), ("AT",), ("WT",),
+                ("CTWT",), ("BARO",), ("COND",), ("BAT",), ("BWL", "BWLSTD", "BWLOUT"), ("BBAT",), ("SNS",), ("DAT",),
+                ("TWL",))
+# label -> sort key: 8 * (group rank + 1) + position in the group
+SENSOR_KEYS = {}
+for g_r, g_l in enumerate(SENSOR_ORDER):
+    for g_p, g_m in enumerate(g_l):
+        SENSOR_KEYS[g_m] = 8 * (g_r + 1) + g_p
+
+
+def order_sensors(sensors):
+    """
+    This function orders the sensors with one keyed sort: the group of the first measurement first, then the
+    groups of SENSOR_ORDER, each in member order. Sensors in no group are left out, except the first
+    :param sensors: Sensor list in measurement order
+    :return: Ordered sensor list
+    """
+    lead_key = SENSOR_KEYS.get(sensors[0].label)
+    lead_rank = lead_key // 8 if lead_key is not None and lead_key % 8 == 0 else None
+    keys = []
+    for i, sensor in enumerate(sensors):
+        key = SENSOR_KEYS.get(sensor.label)
+        if i == 0 and lead_rank is None:
+            key = -1
+        elif key is None:
+            continue
+        elif key // 8 == lead_rank:
+            key %= 8
+        keys.append(key * 64 + i)  # the index keeps equal labels in measurement order
+    keys.sort()
+    return [sensors[k % 64] for k in keys]
 
 
 def status_message(msg):
@@ -401,8 +433,6 @@ command_line("!file mkdir /sd/status_log/\r")
 status_message("Initializing data...")
 
 temp_sns = []
-temp_label = []
-add_sns = []
 cnt_meas = 0
 
 for s_n in range(32):
@@ -415,68 +445,18 @@ for s_n in range(32):
                 temp_sns.append(TsunamiData("M" + str(s_n + 1)))
             else:
                 temp_sns.append(SecondarySensor("M" + str(s_n + 1)))
-for t_s in temp_sns:
-    temp_label.append(t_s.label)
-
-if temp_label[0] == "AQT":
-    temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                  add_sns)
-elif temp_label[0] == "MWWL":
-    temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT", "MWCOUNTS"), temp_label, temp_sns, add_sns)
-
-elif temp_label[0] == "WS":
-    temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-else:
-    add_sns.append(temp_sns.pop(0))
-    temp_label.pop(0)
-print(temp_label, "***")
-if "AQT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                  add_sns)
-if "MWWL" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT"), temp_label, temp_sns, add_sns)
-if "MWWL2" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("MWWL2", "MWSTD2", "MWOUT2", "MWCOUNTS2"), temp_label, temp_sns, add_sns)
-if "WS" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-if "WS2" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("WS2", "WD2", "WG2"), temp_label, temp_sns, add_sns)
-if "AT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["AT"], temp_label, temp_sns, add_sns)
-if "WT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["WT"], temp_label, temp_sns, add_sns)
-if "CTWT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["CTWT"], temp_label, temp_sns, add_sns)
-if "BARO" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["BARO"], temp_label, temp_sns, add_sns)
-if "COND" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["COND"], temp_label, temp_sns, add_sns)
-if "BAT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["BAT"], temp_label, temp_sns, add_sns)
-if "BWL" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("BWL", "BWLSTD", "BWLOUT"), temp_label, temp_sns, add_sns)
-if "BBAT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["BBAT"], temp_label, temp_sns, add_sns)
-if "SNS" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["SNS"], temp_label, temp_sns, add_sns)
-if "DAT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["DAT"], temp_label, temp_sns, add_sns)
-if "TWL" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["TWL"], temp_label, temp_sns, add_sns)
+add_sns = order_sensors(temp_sns)
 del temp_sns
-del temp_label
 ports_tag_message_formatter()
 status_message("Initialization complete!")
 
 
 def initialize_config():
-    global add_sns, cnt_meas, temp_sns, temp_label
+    global add_sns, cnt_meas
     command_line("!file mkdir /sd/status_log/\r")
     status_message("Initializing data...")
 
     temp_sns = []
-    temp_label = []
-    add_sns = []
     cnt_meas = 0
 
     for i in range(32):
@@ -489,73 +469,12 @@ def initialize_config():
                     temp_sns.append(TsunamiData("M" + str(i + 1)))
                 else:
                     temp_sns.append(SecondarySensor("M" + str(i + 1)))
-    for i in temp_sns:
-        temp_label.append(i.label)
-
-    if temp_label[0] == "AQT":
-        temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                      add_sns)
-    elif temp_label[0] == "MWWL":
-        temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT", "MWCOUNTS"), temp_label, temp_sns, add_sns)
-
-    elif temp_label[0] == "WS":
-        temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-    else:
-        add_sns.append(temp_sns.pop(0))
-        temp_label.pop(0)
-    print(temp_label, "***")
-    if "AQT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                      add_sns)
-    if "MWWL" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT"), temp_label, temp_sns, add_sns)
-    if "MWWL2" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("MWWL2", "MWSTD2", "MWOUT2", "MWCOUNTS2"), temp_label, temp_sns, add_sns)
-    if "WS" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-    if "WS2" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("WS2", "WD2", "WG2"), temp_label, temp_sns, add_sns)
-    if "AT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["AT"], temp_label, temp_sns, add_sns)
-    if "WT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["WT"], temp_label, temp_sns, add_sns)
-    if "CTWT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["CTWT"], temp_label, temp_sns, add_sns)
-    if "BARO" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["BARO"], temp_label, temp_sns, add_sns)
-    if "COND" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["COND"], temp_label, temp_sns, add_sns)
-    if "BAT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["BAT"], temp_label, temp_sns, add_sns)
-    if "BWL" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("BWL", "BWLSTD", "BWLOUT"), temp_label, temp_sns, add_sns)
-    if "BBAT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["BBAT"], temp_label, temp_sns, add_sns)
-    if "SNS" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["SNS"], temp_label, temp_sns, add_sns)
-    if "DAT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["DAT"], temp_label, temp_sns, add_sns)
-    if "TWL" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["TWL"], temp_label, temp_sns, add_sns)
+    add_sns = order_sensors(temp_sns)
     del temp_sns
-    del temp_label
     ports_tag_message_formatter()
     status_message("Initialization complete!")
 
 
-def decimal_to_binary(decimal_number):
-    """
-    This function coverts decimal to 18 bits binary number
-    :param decimal_number: Decimal number
-    :return: 18 bits binary number
-    """
-    bi_num = bin(abs(decimal_number)).replace("0b", "")
-    bi_len = len(bi_num)
-    bi_app = "0" * 18
-    bi_app = bi_app[0:18 - bi_len]
-    return bi_app + bi_num
-
-
 def file_deleter(file_dir):
     """
     This function takes the path of the folder to be checked and deletes the files in that folder that are over
@@ -618,7 +537,13 @@ def goes_message_formatter():
     """
     wind_bird = ""
     station_id = command_line("!STATION NAME\r").strip()
-    tsunami = twl.get_encoded_tsunami()
+    # the header, battery and tsunami groups come from these sensors, wherever they are in the sensor list
+    named = {}
+    for a_s in add_sns:
+        named[a_s.label] = a_s
+    pri = add_sns[0]
+    mwstd, mwout, bat, dat, sns = named["MWSTD"], named["MWOUT"], named["BAT"], named["DAT"], named["SNS"]
+    twl = named.get("TWL")  # stations without a tsunami sensor send no tsunami block
     tx_battery = float(command_line("!BATT\r").strip())
     if tx_battery < 9.5:
         tx_battery = 9.5
@@ -626,11 +551,12 @@ def goes_message_formatter():
     if tx_battery > 63:
         tx_battery = 63
     tx_battery = pseudo_encoder(tx_battery, 1, True)
-    tx_message = "P{0}{1}{2}@@{3}0{4}{5}8{6}{7}{8}#{9}<{10} {11}T{12}{13}{14}{15}{16}{17}{18}{19}{20}".format(
+    # the groups are collected in transmission order and joined once: header and water level, then the wind,
+    # AT, WT and BARO groups in sensor order, then battery, TX battery and tsunami
+    segments = ["P{0}{1}{2}@@{3}0{4}{5}8{6}{7}{8}#{9}".format(
         station_id, dat.get_encoded_data(), sns.get_encoded_data(), pri.get_encoded_minute(),
         pri.get_encoded_sutron_day(), pri.get_encoded_hour(), pri.get_encoded_data(), mwstd.get_encoded_data(),
-        mwout.get_encoded_data(), pri.get_encoded_redundant_data(), bat.get_encoded_data(), tx_battery,
-        tsunami[0], tsunami[1], tsunami[2], tsunami[3], tsunami[4], tsunami[5], tsunami[6], tsunami[7], tsunami[8])
+        mwout.get_encoded_data(), pri.get_encoded_redundant_data())]
     for a_s in add_sns:
         if a_s.label == "WS":
             wind_bird += a_s.get_encoded_data()
@@ -638,78 +564,21 @@ def goes_message_formatter():
             wind_bird += a_s.get_encoded_data()
         elif a_s.label == "WG":
             wind_bird += a_s.get_encoded_data()
-            index = tx_message.find('<')
             if len(wind_bird) == 6:
-                tx_message = tx_message[:index] + "3" + wind_bird + tx_message[index:]
+                segments.append("3" + wind_bird)
             else:
-                tx_message = tx_message[:index] + "3" + "??????" + tx_message[index:]
+                segments.append("3??????")
         elif a_s.label == "AT":
-            index = tx_message.find('<')
-            tx_message = tx_message[:index] + "4" + a_s.get_encoded_data() + tx_message[index:]
+            segments.append("4" + a_s.get_encoded_data())
         elif a_s.label == "WT":
-            index = tx_message.find('<')
-            tx_message = tx_message[:index] + "5" + a_s.get_encoded_data() + tx_message[index:]
+            segments.append("5" + a_s.get_encoded_data())
         elif a_s.label == "BARO":
-            index = tx_message.find('<')
-            tx_message = tx_message[:index] + "6" + a_s.get_encoded_data() + tx_message[index:]
+            segments.append("6" + a_s.get_encoded_data())
+    segments.append("<{0} {1}".format(bat.get_encoded_data(), tx_battery))
+    if twl is not None:
+        segments.append("T" + "".join(twl.get_encoded_tsunami()))
 
-    return tx_message
-
-
-def pseudo_encoder(int_val, byt, pos=False):
-    """
-    Pseudobinary encoder function converts binary number from -131072 to 131071
-    :param int_val: Decimal number
-    :param byt: Number of bytes (1,2 or 3)
-    :param pos: Positive only is True
-    :return: Pseudobinary b format
-    """
-    int_val = int(str(int_val).replace(".", ""))
-    iv = 0
-    if int_val < 0 and pos:
-        return "`@@"[:byt]
-    if int_val < 0 and not pos:
-        if byt == 1 and int_val < -31:
-            return "`"
-        if byt == 2 and int_val < -2047:
-            return "`@"
-        if byt == 3 and int_val < -131071:
-            return "`@@"
-        # Call decimal_to_binary Function
-        bi_num = decimal_to_binary(int_val)
-        bi_str = ""
-        for bit in bi_num:
-            if bit == "1":
-                bi_str += "0"
-            else:
-                bi_str += "1"
-        iv = int(bi_str, 2) + 1
-    if int_val >= 0:
-        if not pos:
-            if byt == 1 and int_val > 30:
-                return "_"
-            if byt == 2 and int_val > 2046:
-                return "_?"
-            if byt == 3 and int_val > 131070:
-                return "_??"
-        elif pos:
-            if byt == 1 and int_val > 62:
-                return "?"
-            if byt == 2 and int_val > 4094:
-                return "??"
-            if byt == 3 and int_val > 262142:
-                return "???"
-        iv = int_val
-    bi_array = [iv >> 12, (iv >> 6) & 63, iv & 63]
-    for i in range(3):
-        if bi_array[i] != int(63):
-            bi_array[i] += 64
-    if byt == 1:
-        return chr(bi_array[2])
-    if byt == 2:
-        return chr(bi_array[1]) + chr(bi_array[2])
-    if byt == 3:
-        return chr(bi_array[0]) + chr(bi_array[1]) + chr(bi_array[2])
+    return "".join(segments)
 
 
 @TASK
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the per-cycle entry points of a Satlink 3 script (initialize_config, update_data,
+ports_tag_message_formatter and goes_message) on the sl3emu logger.
+
+Every station profile is run with a growing number of active measurements. For every entry point it reports the
+host wall time per call, the command_line calls, the files opened for writing and the bytes written. Results can
+be saved as a JSON baseline and compared with an earlier one:
+
+    python benchmarks/bench_tasks.py --save benchmarks/baseline.json
+    python benchmarks/bench_tasks.py --compare benchmarks/baseline.json --command-latency 0.002
+
+benchmarks/baseline.json holds the results of mwwl8422.py as committed with it, with the default options. Save it again
+in the same commit as any change of the script's commands, files or bytes, so a comparison only flags new changes.
+Only more commands, files or bytes than the baseline make the comparison fail. Host wall time depends on the machine
+and its load, so a slower entry point is only noted, when it is both tolerance and noise_ms slower.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sl3emu import Logger  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mwwl8422.py")
+
+# profile -> primary group labels, tsunami label or None
+PROFILES = {
+    "mwwl": (("MWWL", "MWSTD", "MWOUT"), None),
+    "mwwl_tsunami": (("MWWL", "MWSTD", "MWOUT"), "MWTWL"),
+    "aqt": (("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), None),
+    "aqt_tsunami": (("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), "AQTWL"),
+    "wind": (("WS", "WD", "WG"), None),
+}
+# measurement groups added after the primary group, in this order, until the station has the requested size. The
+# script only takes complete groups, so a group is added whole or not at all.
+SECONDARY = (("AT",), ("WT",), ("BARO",), ("COND",), ("BAT",), ("SNS",), ("DAT",), ("CTWT",), ("BBAT",),
+             ("BWL", "BWLSTD", "BWLOUT"), ("MWWL2", "MWSTD2", "MWOUT2"), ("WS", "WD", "WG"), ("WS2", "WD2", "WG2"),
+             ("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), ("MWWL", "MWSTD", "MWOUT"))
+TASKS = ("initialize_config", "update_data", "ports_tag_message_formatter", "goes_message")
+RIGHT_DIGITS = {"MWWL": 3, "MWSTD": 3, "MWWL2": 3, "MWSTD2": 3, "AQT": 3, "AQTSTD": 3, "AQT1": 3, "AQT2": 3,
+                "BWL": 3, "BWLSTD": 3, "MWTWL": 3, "AQTWL": 3, "DAT": 3, "COND": 2}
+
+
+def station_labels(profile, size):
+    """
+    This function returns the measurement labels of a station profile with size active measurements
+    :param profile: Profile name
+    :param size: Maximum number of active measurements, the primary group is always included
+    :return: List of labels
+    """
+    primary, tsunami = PROFILES[profile]
+    labels = list(primary)
+    if tsunami:
+        labels.append(tsunami)
+    for group in SECONDARY:
+        if group[0] not in labels and len(labels) + len(group) <= size:
+            labels.extend(group)
+    return labels
+
+
+def make_logger(labels, command_latency, write_latency):
+    """
+    This function creates the emulated logger of a station with half an hour of logged readings
+    :param labels: Measurement labels
+    :param command_latency: Seconds per command_line call
+    :param write_latency: Seconds per file opened for writing
+    :return: Logger
+    """
+    logger = Logger(station="BENCH", start=1700000000, gp1=1, command_latency=command_latency,
+                    write_latency=write_latency)
+    for i, label in enumerate(labels):
+        interval = 60 if label.endswith("TWL") else 360
+        logger.add_measurement(label, right_digits=RIGHT_DIGITS.get(label, 1), interval=interval,
+                               source=lambda t, i=i: 3.0 + math.sin(t / 3600.0 + i))
+    logger.advance(1800)
+    return logger
+
+
+def bench_station(script_path, labels, cycles, command_latency=0.0, write_latency=0.0):
+    """
+    This function loads the script on an emulated station and measures its entry points
+    :param script_path: Script path
+    :param labels: Measurement labels
+    :param cycles: Number of calls of every entry point
+    :return: Dictionary of entry point -> {"wall_ms", "commands", "files", "bytes"} per call
+    """
+    logger = make_logger(labels, command_latency, write_latency)
+    with contextlib.redirect_stdout(io.StringIO()):  # status messages
+        return measure(logger, script_path, cycles)
+
+
+def measure(logger, script_path, cycles):
+    """
+    This function loads the script on the logger and times cycles calls of every entry point
+    """
+    start = time.perf_counter()
+    script = logger.load(script_path)
+    results = {"load": {"wall_ms": (time.perf_counter() - start) * 1000, "commands": logger.commands,
+                        "files": logger.files_written, "bytes": logger.bytes_written}}
+    for task in TASKS:
+        function = getattr(script, task, None)
+        if function is None:
+            continue
+        wall = 0.0
+        commands, files, written = logger.commands, logger.files_written, logger.bytes_written
+        for _ in range(cycles):
+            if task == "update_data":
+                logger.advance(360)
+            start = time.perf_counter()
+            if task == "goes_message":
+                function("")
+            else:
+                function()
+            wall += time.perf_counter() - start
+        results[task] = {"wall_ms": wall * 1000 / cycles,
+                         "commands": (logger.commands - commands) / cycles,
+                         "files": (logger.files_written - files) / cycles,
+                         "bytes": (logger.bytes_written - written) / cycles}
+    return results
+
+
+def run(script_path, profiles, sizes, cycles, command_latency=0.0, write_latency=0.0):
+    """
+    This function benchmarks every profile and size
+    :param script_path: Script path
+    :param profiles: Profile names
+    :param sizes: Numbers of active measurements
+    :param cycles: Number of calls of every entry point
+    :param command_latency: Seconds per command_line call
+    :param write_latency: Seconds per file opened for writing
+    :return: Dictionary of profile -> size -> entry point -> measurements
+    """
+    results = {}
+    for profile in profiles:
+        results[profile] = {}
+        for size in sizes:
+            labels = station_labels(profile, size)
+            results[profile][str(len(labels))] = bench_station(script_path, labels, cycles, command_latency,
+                                                               write_latency)
+    return results
+
+
+def report(results, baseline=None, tolerance=0.2, noise_ms=0.5):
+    """
+    This function prints the results, with the change against the baseline when one is given
+    :param results: Benchmark results
+    :param baseline: Earlier results or None
+    :param tolerance: Relative wall time change noted as slower
+    :param noise_ms: Wall time change in milliseconds per call below which it is not noted
+    :return: Number of regressions (more commands, files or bytes per call)
+    """
+    regressions = 0
+    print("{0:<14}{1:>5} {2:<28}{3:>10}{4:>10}{5:>7}{6:>9}".format(
+        "profile", "size", "entry point", "wall ms", "commands", "files", "bytes"))
+    for profile, sizes in results.items():
+        for size, tasks in sizes.items():
+            for task, m in tasks.items():
+                line = "{0:<14}{1:>5} {2:<28}{3:>10.3f}{4:>10.1f}{5:>7.1f}{6:>9.0f}".format(
+                    profile, size, task, m["wall_ms"], m["commands"], m["files"], m["bytes"])
+                old = (baseline or {}).get(profile, {}).get(size, {}).get(task)
+                if old is not None:
+                    notes = []
+                    worse = False
+                    if old["wall_ms"] and m["wall_ms"] > old["wall_ms"] * (1 + tolerance) and \
+                            m["wall_ms"] > old["wall_ms"] + noise_ms:
+                        notes.append("wall {0:+.0%} (advisory)".format(m["wall_ms"] / old["wall_ms"] - 1))
+                    for key in ("commands", "files", "bytes"):
+                        if m[key] != old[key]:
+                            notes.append("{0} {1:+g}".format(key, m[key] - old[key]))
+                            worse = worse or m[key] > old[key]
+                    if notes:
+                        line += "  <- " + ", ".join(notes)
+                    regressions += worse
+                print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--script", default=SCRIPT, help="script to benchmark (default mwwl8422.py)")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="comma separated station profiles")
+    parser.add_argument("--sizes", default="4,8,16,32", help="comma separated numbers of active measurements")
+    parser.add_argument("--cycles", type=int, default=20, help="calls of every entry point")
+    parser.add_argument("--command-latency", type=float, default=0.0, help="seconds per command_line call")
+    parser.add_argument("--write-latency", type=float, default=0.0, help="seconds per file opened for writing")
+    parser.add_argument("--save", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", help="compare the results with this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative wall time change noted as slower")
+    parser.add_argument("--noise-ms", type=float, default=0.5, help="wall time change per call that is ignored")
+    args = parser.parse_args(argv)
+
+    results = run(args.script, args.profiles.split(","), [int(s) for s in args.sizes.split(",")], args.cycles,
+                  args.command_latency, args.write_latency)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline, args.tolerance, args.noise_ms)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+            f.write("\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
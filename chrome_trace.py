@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Host side converter of spantrace dumps to the Chrome trace event JSON format, so a logger cycle can be viewed as a
+flame chart in chrome://tracing or https://ui.perfetto.dev:
+
+    python chrome_trace.py trace.txt [trace.json]
+"""
+
+import json
+import sys
+
+
+def read_spans(lines):
+    """
+    This function parses the lines of a spantrace dump
+    :param lines: Iterable of lines
+    :return: List of (start, duration, depth, name)
+    """
+    spans = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        start, duration, depth, name = line.split(" ", 3)
+        spans.append((int(start), int(duration), int(depth), name))
+    return spans
+
+
+def chrome_events(spans, pid=1, tid=1):
+    """
+    This function converts spans to complete ("X") trace events
+    :param spans: List of (start, duration, depth, name) in milliseconds
+    :param pid: Process ID shown by the viewer
+    :param tid: Thread ID shown by the viewer
+    :return: Trace event dictionary
+    """
+    events = []
+    for start, duration, depth, name in spans:
+        events.append({"name": name, "cat": name.split(" ", 1)[0], "ph": "X", "ts": start * 1000,
+                       "dur": duration * 1000, "pid": pid, "tid": tid, "args": {"depth": depth}})
+    events.sort(key=lambda e: (e["ts"], e["args"]["depth"]))
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def convert(source, target):
+    """
+    This function converts a spantrace dump file to a Chrome trace file
+    :param source: Dump file path
+    :param target: JSON file path
+    :return: Number of events
+    """
+    with open(source) as f:
+        trace = chrome_events(read_spans(f))
+    with open(target, "w") as f:
+        json.dump(trace, f)
+    return len(trace["traceEvents"])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not 1 <= len(argv) <= 2:
+        print(__doc__.strip())
+        return 2
+    source = argv[0]
+    target = argv[1] if len(argv) == 2 else source.rsplit(".", 1)[0] + ".json"
+    print("{0} events written to {1}".format(convert(source, target), target))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-process bulk decoder for flat files of newline delimited GOES messages (historical backfill).
+
+Input files are split into chunks on line boundaries, every chunk is decoded by goes_parser in a worker process,
+sorted by timestamp and spilled to a temporary run file, indexed by the timestamp of every batch of records. When
+there are more than MERGE_FAN_IN runs, groups of runs are merged into longer runs first, pass after pass. The final
+merge is split into timestamp ranges of about the same size, and the workers merge the ranges in parallel, reading
+only the batches of every run that overlap their range. decode() streams the ranges back to the caller in order,
+decode_into() hands them to a sink in the workers so the records are never built in the calling process. Every worker
+holds a chunk and its decoded records, a multiple of the chunk size, so memory depends on the chunk size and the
+number of workers, not on the size of the archive.
+"""
+
+import bisect
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+
+from goes_parser import GoesParser
+
+CHUNK_SIZE = 32 * 1024 * 1024
+SPILL_BATCH = 512  # records pickled together in a run file, the unit a timestamp range is read in
+MERGE_FAN_IN = 256  # run files open at once while merging
+RUN_SAMPLES = 64  # timestamps kept per run to split the final merge into ranges
+RANGES_PER_WORKER = 4  # timestamp ranges of the final merge per worker
+
+_parser = None
+
+
+def split_file(path, chunk_size=CHUNK_SIZE):
+    """
+    This function splits a file into byte ranges that start and end on line boundaries
+    :param path: File path
+    :param chunk_size: Approximate chunk size in bytes
+    :return: List of (start, end) offsets
+    """
+    chunks = []
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = min(f.tell(), size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def _init_worker(ref_time, right_digits):
+    """
+    This function creates the parser of a worker process once, so its layout cache is shared by all its chunks
+    """
+    global _parser
+    _parser = GoesParser(ref_time, right_digits)
+
+
+def _decode_chunk(task):
+    """
+    This function decodes one chunk, sorts it by timestamp and spills it to a run file. The whole chunk and its
+    records are held in memory at once, several times the chunk size since a record takes more room than its line
+    :param task: (path, start, end, run path)
+    :return: (run, number of records, number of skipped lines), see _write_run for the run
+    """
+    path, start, end, run_path = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    skipped = _parser.skipped
+    records = list(_parser.iter_file(data.splitlines()))
+    del data
+    records.sort(key=_timestamp)
+    return _write_run(run_path, records), len(records), _parser.skipped - skipped
+
+
+def _write_run(run_path, records):
+    """
+    This function writes records to a run file, SPILL_BATCH at a time, and indexes the batches so a timestamp range
+    can be read without unpickling the rest of the run
+    :param run_path: Run file path
+    :param records: Iterable of GoesRecord in timestamp order
+    :return: Run: (run path, [(first timestamp, offset)] per batch, about RUN_SAMPLES timestamps evenly spread)
+    """
+    index = []
+    timestamps = []
+    with open(run_path, "wb") as f:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= SPILL_BATCH:
+                index.append((batch[0].timestamp, f.tell()))
+                timestamps.extend(r.timestamp for r in batch[::SPILL_BATCH // RUN_SAMPLES])
+                pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            index.append((batch[0].timestamp, f.tell()))
+            timestamps.extend(r.timestamp for r in batch[::SPILL_BATCH // RUN_SAMPLES])
+            pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+    step = len(timestamps) // RUN_SAMPLES or 1
+    return run_path, index, timestamps[::step]
+
+
+def _merge_runs(task):
+    """
+    This function merges run files into one run file and deletes them
+    :param task: (runs in input order, merged run path)
+    :return: Merged run
+    """
+    runs, merged_path = task
+    merged = _write_run(merged_path, heapq.merge(*[_read_run(run) for run in runs], key=_timestamp))
+    for run in runs:
+        os.remove(run[0])
+    return merged
+
+
+def _merge_range(task):
+    """
+    This function merges the records of all runs with a timestamp in [low, high) and spills them to a run file, or
+    hands them to the sink when there is one
+    :param task: (runs in input order, low (None for no bound), high (None for no bound), run path, sink)
+    :return: Run, or what the sink returns
+    """
+    runs, low, high, run_path, sink = task
+    records = heapq.merge(*[_read_run(run, low, high) for run in runs], key=_timestamp)
+    if sink is not None:
+        return sink(records)
+    return _write_run(run_path, records)
+
+
+def _timestamp(record):
+    return record.timestamp
+
+
+def _read_run(run, low=None, high=None):
+    """
+    This function streams the records of one run back, only those with a timestamp in [low, high) when bounds are
+    given. Reading starts at the last batch that begins before low and stops at the first that begins at or after high
+    """
+    run_path, index, _ = run
+    i = 0
+    if low is not None:
+        i = max(bisect.bisect_left(index, (low,)) - 1, 0)
+    if i >= len(index):
+        return
+    with open(run_path, "rb") as f:
+        f.seek(index[i][1])
+        for first, _ in index[i:]:
+            if high is not None and first >= high:
+                return
+            for record in pickle.load(f):
+                if (low is None or record.timestamp >= low) and (high is None or record.timestamp < high):
+                    yield record
+
+
+class BulkDecoder:
+    def __init__(self, workers=None, chunk_size=CHUNK_SIZE, ref_time=None, right_digits=None, spill_dir=None,
+                 fan_in=MERGE_FAN_IN):
+        """
+        This BulkDecoder class decodes message archives in parallel worker processes
+        :param workers: Number of worker processes, defaults to the number of cores
+        :param chunk_size: Approximate chunk size in bytes, each worker holds a multiple of it
+        :param ref_time: Seconds since 1970/01/01 used to resolve the Sutron day, defaults to now
+        :param right_digits: Dictionary of label -> right digits overriding goes_parser.RIGHT_DIGITS
+        :param spill_dir: Directory for the temporary run files, defaults to the system temp directory
+        :param fan_in: Maximum number of run files merged (and open) at once, at least 2
+        """
+        if fan_in < 2:
+            raise ValueError("fan_in must be at least 2, not {0}".format(fan_in))
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.fan_in = fan_in
+        self.ref_time = time.time() if ref_time is None else ref_time
+        self.right_digits = right_digits
+        self.spill_dir = spill_dir
+        self.records = 0
+        self.skipped = 0
+
+    def decode(self, paths):
+        """
+        This method decodes one or more archive files. The records are built again in this process from the spilled
+        ranges, which bounds the throughput to what one process can unpickle; decode_into() avoids that
+        :param paths: File path or list of file paths
+        :return: Generator of GoesRecord in timestamp order
+        """
+        run_dir = tempfile.mkdtemp(prefix="goes_runs_", dir=self.spill_dir)
+        try:
+            with Pool(self.workers, _init_worker, (self.ref_time, self.right_digits)) as pool:
+                for run in pool.imap(_merge_range, self._ranges(pool, paths, run_dir, None)):
+                    for record in _read_run(run):
+                        yield record
+                    os.remove(run[0])
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def decode_into(self, paths, sink):
+        """
+        This method decodes one or more archive files and hands the records to sink in the worker processes, one
+        timestamp range at a time, so no record is built in this process (e.g. a sink that writes the range to a
+        database or a file)
+        :param paths: File path or list of file paths
+        :param sink: Module level function taking an iterator of GoesRecord in timestamp order, its result must pickle
+        :return: List of the sink results, in timestamp order of the ranges
+        """
+        run_dir = tempfile.mkdtemp(prefix="goes_runs_", dir=self.spill_dir)
+        try:
+            with Pool(self.workers, _init_worker, (self.ref_time, self.right_digits)) as pool:
+                return pool.map(_merge_range, self._ranges(pool, paths, run_dir, sink))
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _ranges(self, pool, paths, run_dir, sink):
+        """
+        This method decodes the archive files into sorted runs, merges them down to at most fan_in runs, and splits
+        the timestamp axis into ranges of about the same number of records, RANGES_PER_WORKER per worker
+        :return: List of _merge_range tasks in timestamp order
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        tasks = []
+        for path in paths:
+            for start, end in split_file(path, self.chunk_size):
+                tasks.append((path, start, end, os.path.join(run_dir, "{0:06d}.run".format(len(tasks)))))
+        runs = []
+        for run, count, skipped in pool.imap_unordered(_decode_chunk, tasks):
+            runs.append(run)
+            self.records += count
+            self.skipped += skipped
+        # runs are merged in input order, so records with the same timestamp keep their order in the files
+        runs.sort()
+        merged = 0
+        while len(runs) > self.fan_in:
+            merges = []
+            for i in range(0, len(runs), self.fan_in):
+                merges.append((runs[i:i + self.fan_in], os.path.join(run_dir, "m{0:06d}.run".format(merged))))
+                merged += 1
+            runs = pool.map(_merge_runs, merges)
+        samples = sorted(t for run in runs for t in run[2])
+        count = self.workers * RANGES_PER_WORKER
+        bounds = sorted(set(samples[len(samples) * i // count] for i in range(1, count))) if samples else []
+        bounds = [None] + bounds + [None]
+        return [(runs, bounds[i], bounds[i + 1], os.path.join(run_dir, "r{0:06d}.run".format(i)), sink)
+                for i in range(len(bounds) - 1)]
+
+
+def decode_archive(paths, workers=None, chunk_size=CHUNK_SIZE, ref_time=None, right_digits=None, fan_in=MERGE_FAN_IN):
+    """
+    This function decodes message archives in parallel and yields the records in timestamp order
+    :param paths: File path or list of file paths
+    :param workers: Number of worker processes, defaults to the number of cores
+    :param chunk_size: Approximate chunk size in bytes
+    :param ref_time: Seconds since 1970/01/01 used to resolve the Sutron day, defaults to now
+    :param right_digits: Dictionary of label -> right digits overriding goes_parser.RIGHT_DIGITS
+    :param fan_in: Maximum number of run files merged at once
+    :return: Generator of GoesRecord
+    """
+    return BulkDecoder(workers, chunk_size, ref_time, right_digits, fan_in=fan_in).decode(paths)
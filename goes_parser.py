@@ -0,0 +1,641 @@
+# -*- coding: utf-8 -*-
+"""
+Host side parser for the GOES messages built by ports_tag_message_formatter() and goes_message() in mwwl8422.py.
+
+Message layout:
+P<station><DAT><SNS>@@<minute>0<sutron day><hour><groups...>
+Groups are recognized by their ID byte:
+1 AQT AQTSTD AQTOUT AQT1 AQT2 > redundant AQT
+8 MWWL MWSTD MWOUT # redundant MWWL (a second 8 group is MWWL2)
+2 BWL BWLSTD BWLOUT " redundant BWL
+3 WS WD WG (a second 3 group is WS2 WD2 WG2)
+4 AT, 5 WT (a second 5 group is CTWT), 6 BARO, -7 COND
+< BAT (a second < group is BBAT), followed by " " and the TX battery byte once transmitted
+T tsunami hour, minute, offset and the values of the tsunami window (2 bytes each, newest first) up to the end of the
+  message, so the window size is taken from the length of the block
+"""
+
+import time
+from operator import getitem, itemgetter
+
+try:
+    import numpy as np
+except ImportError:  # parse_many() then decodes one message at a time
+    np = None
+
+NAN = float("nan")
+SUTRON_EPOCH_DAY = 5478  # 1984/12/31 in days since 1970/01/01
+TSUNAMI_HEADER = 4  # T + hour + minute + offset, followed by 2 bytes per value
+BATCH_SIZE = 4096  # messages handed to parse_many() or parse_columns() at a time by iter_file() or iter_columns()
+BATCH_MIN = 16  # smaller groups of one shape are decoded one message at a time by parse_many()
+
+# Digits right of the decimal point, same as the PORTS Tag report
+RIGHT_DIGITS = {
+    "AQT": 3, "AQTSTD": 3, "AQTOUT": 0, "AQT1": 1, "AQT2": 1,
+    "MWWL": 3, "MWSTD": 3, "MWOUT": 0, "MWWL2": 3, "MWSTD2": 3, "MWOUT2": 0,
+    "BWL": 3, "BWLSTD": 3, "BWLOUT": 0,
+    "WS": 1, "WD": 0, "WG": 1, "WS2": 1, "WD2": 0, "WG2": 1,
+    "AT": 1, "WT": 1, "CTWT": 1, "BARO": 1, "COND": 2, "BAT": 1, "BBAT": 1,
+    "DAT": 3, "SNS": 3, "TSUNAMI": 3,
+}
+# Raw offsets removed by the encoder
+OFFSETS = {"BARO": 8000}
+
+# group ID -> (labels for the first, second... occurrence, (width, signed) per field, redundant separator)
+GROUPS = {
+    "1": ((("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"),),
+          ((3, True), (2, False), (1, False), (2, True), (2, True)), ">"),
+    "8": ((("MWWL", "MWSTD", "MWOUT"), ("MWWL2", "MWSTD2", "MWOUT2")), ((3, True), (2, False), (1, False)), "#"),
+    "2": ((("BWL", "BWLSTD", "BWLOUT"),), ((3, True), (2, False), (1, False)), '"'),
+    "3": ((("WS", "WD", "WG"), ("WS2", "WD2", "WG2")), ((2, False), (2, False), (2, False)), None),
+    "4": ((("AT",),), ((2, True),), None),
+    "5": ((("WT",), ("CTWT",)), ((2, True),), None),
+    "6": ((("BARO",),), ((2, False),), None),
+    "-7": ((("COND",),), ((3, True),), None),
+    "<": ((("BAT",), ("BBAT",)), ((2, False),), None),
+}
+
+# character code -> 6 bit group, anything that is not pseudobinary is pushed far above the 18 bit range
+_INVALID = 1 << 30
+_DIGIT = tuple(63 if c == 63 else c - 64 if 64 <= c <= 127 else _INVALID for c in range(256))
+_FULL = (0, 63, 4095, 262143)
+# character -> 6 bit group for messages already checked, and character -> shape (pseudobinary becomes ".")
+_DIGITS = bytes(63 if c == 63 else c - 64 if 64 <= c <= 127 else 0 for c in range(256))
+_SHAPE = bytes(46 if 63 <= c <= 127 else c for c in range(256))
+_PSEUDOBINARY = tuple(bytes([c]) for c in range(63, 128))
+_TABLES = {}
+_DIGIT_ARRAY = None if np is None else np.frombuffer(_DIGITS, np.uint8).astype(np.int64)
+
+
+def _decode(msg, i, width, signed):
+    """
+    This function decodes one pseudobinary field
+    :return: Raw integer, or None for missing, saturated or corrupt fields
+    """
+    digit = _DIGIT
+    if width == 1:
+        raw = digit[msg[i]]
+    elif width == 2:
+        raw = (digit[msg[i]] << 6) | digit[msg[i + 1]]
+    else:
+        raw = (digit[msg[i]] << 12) | (digit[msg[i + 1]] << 6) | digit[msg[i + 2]]
+    full = _FULL[width]
+    if raw >= full:
+        return None
+    if signed:
+        half = (full + 1) >> 1
+        if raw >= half:
+            raw -= full + 1
+        if raw == half - 1 or raw == -half:
+            return None
+    return raw
+
+
+def _raw(msg, i, width):
+    """
+    This function decodes one positive only field without treating the all "?" value as missing
+    :return: Raw integer, or None for corrupt fields
+    """
+    raw = 0
+    for k in range(i, i + width):
+        digit = _DIGIT[msg[k]]
+        if digit == _INVALID:
+            return None
+        raw = (raw << 6) | digit
+    return raw
+
+
+def _is_tsunami(msg, i, n):
+    """
+    This function tells whether the "T" at position i starts the tsunami block. The block ends the message, holds
+    an even number of bytes and is pseudobinary throughout. A TX battery byte "T" is followed by an odd number of
+    bytes when the block comes next, or by the ID of the next group
+    :param n: Message length
+    """
+    return msg[i] == 84 and n - i >= TSUNAMI_HEADER + 2 and (n - i) % 2 == 0 and _raw(msg, i + 1, n - i - 1) is not None
+
+
+def _column(d, position, width, signed, scale, offset):
+    """
+    This function decodes one field of every message of a batch, the same way _decode() does for one message
+    :param d: numpy array of the messages translated to 6 bit groups, one row per message
+    :return: numpy array of values, NaN where the field is missing
+    """
+    raw = d[:, position]
+    for k in range(position + 1, position + width):
+        raw = raw << 6 | d[:, k]
+    full = _FULL[width]
+    missing = raw == full
+    if signed:
+        half = (full + 1) >> 1
+        missing |= (raw == half - 1) | (raw == half)
+        raw = np.where(raw >= half, raw - full - 1, raw)
+    values = (raw + offset) * scale
+    values[missing] = NAN
+    return values
+
+
+def _value_table(width, signed, scale, offset):
+    """
+    This function returns a dictionary of every 1 or 2 byte field -> decoded value, NaN where _decode() finds
+    it missing
+    """
+    key = (width, signed, scale, offset)
+    table = _TABLES.get(key)
+    if table is None:
+        fields = _PSEUDOBINARY
+        if width == 2:
+            fields = [hi + lo for hi in _PSEUDOBINARY for lo in _PSEUDOBINARY]
+        table = {}
+        for field in fields:
+            raw = _decode(field, 0, width, signed)
+            table[field] = NAN if raw is None else (raw + offset) * scale
+        _TABLES[key] = table
+    return table
+
+
+def _getter(keys):
+    """
+    This function returns a callable that picks all keys out of a message at once, always as a tuple
+    """
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda msg: (msg[key],)
+    return itemgetter(*keys)
+
+
+class GoesRecord:
+    __slots__ = ("station", "timestamp", "values", "redundant", "tsunami", "battery")
+
+    def __init__(self, station, timestamp, values, redundant, tsunami, battery):
+        """
+        One decoded GOES message
+        :param station: Station ID
+        :param timestamp: Primary sensor time in seconds since 1970/01/01
+        :param values: Dictionary of label -> value, NaN when missing
+        :param redundant: Dictionary of label -> redundant value, NaN when missing
+        :param tsunami: (timestamp, values newest first) or None
+        :param battery: TX battery voltage or None
+        """
+        self.station = station
+        self.timestamp = timestamp
+        self.values = values
+        self.redundant = redundant
+        self.tsunami = tsunami
+        self.battery = battery
+
+    def __repr__(self):
+        return "GoesRecord({0!r}, {1}, {2!r}, {3!r}, {4!r}, {5!r})".format(
+            self.station, self.timestamp, self.values, self.redundant, self.tsunami, self.battery)
+
+
+class GoesColumns:
+    __slots__ = ("station", "timestamps", "values", "redundant", "tsunami", "battery")
+
+    def __init__(self, station, timestamps, values, redundant, tsunami, battery):
+        """
+        Decoded GOES messages of one shape, one numpy array per field with one row per message
+        :param station: Station ID
+        :param timestamps: Primary sensor times in seconds since 1970/01/01
+        :param values: Dictionary of label -> values, NaN when missing
+        :param redundant: Dictionary of label -> redundant values, NaN when missing
+        :param tsunami: (times, values newest first, one row per message) or None when the shape has no tsunami
+        block. The time is -1 and the values are NaN where the block is flagged missing
+        :param battery: TX battery voltages or None
+        """
+        self.station = station
+        self.timestamps = timestamps
+        self.values = values
+        self.redundant = redundant
+        self.tsunami = tsunami
+        self.battery = battery
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+class GoesParser:
+    def __init__(self, ref_time=None, right_digits=None, station_len=None):
+        """
+        This GoesParser class decodes GOES messages in a single pass. The first message of every shape (the
+        positions of the group IDs) is walked group by group and the resulting field layout is cached, later
+        messages with the same shape are decoded straight from the layout
+        :param ref_time: Seconds since 1970/01/01 used to resolve the Sutron day (modulo 4096), defaults to now
+        :param right_digits: Dictionary of label -> right digits overriding RIGHT_DIGITS
+        :param station_len: Length of the station ID, defaults to the leading run of digits
+        """
+        if ref_time is None:
+            ref_time = time.time()
+        ref_day = int(ref_time // 86400) + 1 - SUTRON_EPOCH_DAY
+        # Sutron day -> days since 1970/01/01, picking the latest 4096 day cycle that is not after the reference
+        # time (one day of slack for the logger clock)
+        self.days = tuple(SUTRON_EPOCH_DAY + sd + (ref_day - sd) // 4096 * 4096 for sd in range(4096))
+        self.station_len = station_len
+        digits = dict(RIGHT_DIGITS)
+        if right_digits:
+            digits.update(right_digits)
+        self.scale = dict((label, 10.0 ** -rd) for label, rd in digits.items())
+        self.groups = {}
+        for group_id, (label_sets, fields, separator) in GROUPS.items():
+            compiled = tuple(tuple((label, width, signed) for label, (width, signed) in zip(labels, fields))
+                             for labels in label_sets)
+            self.groups[ord(group_id[0])] = (group_id.encode(), compiled, None if separator is None else ord(separator))
+        self.day_array = None if np is None else np.array(self.days, np.int64)
+        self.layouts = {}
+        self.skipped = 0
+
+    def _walk(self, msg):
+        """
+        This method walks one message group by group and lists its fields
+        :param msg: GOES message (bytes)
+        :return: station end, time tag position, [(redundant, label, position, width, signed)], tsunami position
+        and TX battery position (-1 when absent)
+        """
+        n = len(msg)
+        if n < 8 or msg[0] != 80:  # "P"
+            raise ValueError("not a GOES message: {0!r}".format(msg[:20]))
+        if self.station_len is None:
+            i = 1
+            while i < n and 48 <= msg[i] <= 57:
+                i += 1
+        else:
+            i = 1 + self.station_len
+        station_end = i
+        zero = msg.find(b"0", i)
+        header = zero - i
+        if zero < 0 or header not in (3, 5, 6, 8) or msg[zero - 3:zero - 1] != b"@@" or zero + 4 > n:
+            raise ValueError("bad header in GOES message: {0!r}".format(msg[:20]))
+        if _raw(msg, zero - 1, 1) is None or _raw(msg, zero + 1, 3) is None:
+            raise ValueError("bad time tag in GOES message: {0!r}".format(msg[:20]))
+        fields = []
+        if header >= 6:
+            fields.append((False, "DAT", i, 3, True))
+            i += 3
+        if header in (5, 8):
+            fields.append((False, "SNS", i, 2, True))
+        tsunami = battery = -1
+        seen = {}
+        groups = self.groups
+        i = zero + 4
+        while i < n:
+            c = msg[i]
+            if _is_tsunami(msg, i, n):
+                tsunami = i
+                break
+            spec = groups.get(c)
+            if spec is None or not msg.startswith(spec[0], i):
+                raise ValueError("unknown group {0!r} at {1} in GOES message".format(msg[i:i + 2], i))
+            group_id, label_sets, separator = spec
+            occurrence = seen.get(c, 0)
+            seen[c] = occurrence + 1
+            if occurrence >= len(label_sets):
+                raise ValueError("too many {0!r} groups in GOES message".format(group_id))
+            i += len(group_id)
+            for label, width, signed in label_sets[occurrence]:
+                fields.append((False, label, i, width, signed))
+                i += width
+            if separator is not None:
+                if i + 4 > n or msg[i] != separator:
+                    raise ValueError("missing redundant separator in GOES message")
+                fields.append((True, label_sets[occurrence][0][0], i + 1, 3, True))
+                i += 4
+            elif c == 60 and i < n and msg[i] == 32:  # "<" followed by " " and the TX battery byte
+                i += 1
+                if i < n and msg[i] >= 63 and not _is_tsunami(msg, i, n):
+                    battery = i
+                    i += 1
+        if i > n:
+            raise ValueError("truncated GOES message")
+        return station_end, zero, fields, tsunami, battery
+
+    def _compile(self, msg):
+        """
+        This method turns the fields of one message into a layout that decodes every message of the same shape
+        :param msg: GOES message (bytes)
+        :return: Layout tuple, see parse()
+        """
+        station_end, zero, fields, tsunami, battery = self._walk(msg)
+        labels = []
+        keys = []
+        tables = []
+        wide_labels = []
+        wide = []
+        narrow_columns = []
+        wide_columns = []
+        missing = []
+        redundant_labels = []
+        redundant = []
+        redundant_missing = []
+        for is_redundant, label, position, width, signed in fields:
+            if _raw(msg, position, width) is None:
+                (redundant_missing if is_redundant else missing).append(label)
+            elif is_redundant:
+                redundant_labels.append(label)
+                redundant.append((position, self.scale[label]))
+            elif width < 3:
+                labels.append(label)
+                keys.append(slice(position, position + width))
+                tables.append(_value_table(width, signed, self.scale[label], OFFSETS.get(label, 0)))
+                narrow_columns.append((position, width, signed, self.scale[label], OFFSETS.get(label, 0)))
+            else:
+                wide_labels.append(label)
+                wide.append((position, signed, self.scale[label], OFFSETS.get(label, 0)))
+                wide_columns.append((position, width, signed, self.scale[label], OFFSETS.get(label, 0)))
+        # labels line up with the decoded values: 1 and 2 byte fields, 3 byte fields, then the missing ones. The
+        # last two entries are the same fields as _column() arguments for parse_many()
+        return (station_end, zero, tuple(labels + wide_labels + missing), _getter(keys) if keys else None,
+                tuple(tables), tuple(wide), (NAN,) * len(missing), tuple(redundant_labels + redundant_missing),
+                tuple(redundant), (NAN,) * len(redundant_missing), tsunami, battery,
+                tuple(narrow_columns + wide_columns), tuple((i, 3, True, scale, 0) for i, scale in redundant))
+
+    def _layout(self, msg, shape):
+        """
+        This method returns the layout of a message, compiling and caching it for a new shape
+        :param msg: GOES message (bytes)
+        :param shape: msg translated by _SHAPE
+        :return: Layout tuple, see _compile()
+        """
+        layout = self.layouts.get(shape)
+        if layout is None or (layout[10] >= 0 and msg[layout[10]] != 84):
+            layout = self._compile(msg)
+            if len(self.layouts) >= 4096:
+                self.layouts.clear()
+            self.layouts[shape] = layout
+        return layout
+
+    def parse(self, msg):
+        """
+        This method decodes one message
+        :param msg: GOES message (bytes or str)
+        :return: GoesRecord
+        """
+        if isinstance(msg, str):
+            msg = msg.encode("latin-1")
+        (station_end, zero, labels, getter, tables, wide, missing, redundant_labels, redundant, redundant_missing,
+         tsunami_pos, battery_pos) = self._layout(msg, msg.translate(_SHAPE))[:12]
+        d = msg.translate(_DIGITS)
+        values = list(map(getitem, tables, getter(msg))) if getter else []
+        for i, signed, scale, offset in wide:
+            raw = d[i] << 12 | d[i + 1] << 6 | d[i + 2]
+            if raw == 262143 or (signed and (raw == 131071 or raw == 131072)):
+                values.append(NAN)
+            else:
+                if signed and raw > 131072:
+                    raw -= 262144
+                values.append((raw + offset) * scale)
+        values += missing
+        redundant_values = []
+        for i, scale in redundant:
+            raw = d[i] << 12 | d[i + 1] << 6 | d[i + 2]
+            if raw == 262143 or raw == 131071 or raw == 131072:
+                redundant_values.append(NAN)
+            else:
+                redundant_values.append((raw - 262144 if raw > 131072 else raw) * scale)
+        redundant_values += redundant_missing
+        timestamp = self.days[d[zero + 1] << 6 | d[zero + 2]] * 86400 + d[zero + 3] * 3600 + d[zero - 1] * 60
+        tsunami = None if tsunami_pos < 0 else self._tsunami(d, tsunami_pos + 1, timestamp)
+        battery = None if battery_pos < 0 else 9.5 + d[battery_pos] / 10
+        return GoesRecord(msg[1:station_end].decode(), timestamp, dict(zip(labels, values)),
+                          dict(zip(redundant_labels, redundant_values)), tsunami, battery)
+
+    def _tsunami(self, d, i, timestamp):
+        """
+        This method decodes the tsunami block, the time of the newest value is placed on the day that puts it
+        closest to the primary sensor time
+        :param d: Message translated to 6 bit groups
+        :return: (timestamp, values newest first), or None when the block is flagged missing
+        """
+        hour = d[i]
+        if hour == 63:
+            return None
+        offset = d[i + 2] * 250
+        tsu_time = timestamp - timestamp % 86400 + hour * 3600 + d[i + 1] * 60
+        if tsu_time - timestamp > 43200:
+            tsu_time -= 86400
+        elif timestamp - tsu_time > 43200:
+            tsu_time += 86400
+        scale = self.scale["TSUNAMI"]
+        raws = [d[k] << 6 | d[k + 1] for k in range(i + 3, len(d) - 1, 2)]
+        return tsu_time, tuple([NAN if raw == 4095 else (raw + offset) * scale for raw in raws])
+
+    def parse_many(self, msgs, strict=True):
+        """
+        This method decodes a batch of messages. The messages are grouped by shape and every field is decoded for a
+        whole group at once with numpy. Small groups, and every message when numpy is missing, go through parse()
+        :param msgs: List of GOES messages (bytes or str)
+        :param strict: Raise on malformed messages instead of skipping (and counting) them
+        :return: List of GoesRecord in the order of msgs, without the skipped messages
+        """
+        msgs = [msg.encode("latin-1") if isinstance(msg, str) else msg for msg in msgs]
+        records = [None] * len(msgs)
+        shapes = {}
+        if np is None:
+            shapes[None] = range(len(msgs))
+        else:
+            for index, msg in enumerate(msgs):
+                shapes.setdefault(msg.translate(_SHAPE), []).append(index)
+        for shape, indexes in shapes.items():
+            if len(indexes) < BATCH_MIN:
+                self._parse_each(msgs, indexes, records, strict)
+                continue
+            try:
+                layout = self._layout(msgs[indexes[0]], shape)
+            except ValueError:
+                self._parse_each(msgs, indexes, records, strict)
+                continue
+            if layout[10] >= 0:
+                # the "T" of the tsunami block is pseudobinary, so it is not part of the shape
+                good = [i for i in indexes if msgs[i][layout[10]] == 84]
+                if len(good) < len(indexes):
+                    self._parse_each(msgs, sorted(set(indexes) - set(good)), records, strict)
+                    indexes = good
+            for index, record in zip(indexes, self._decode_group(layout, [msgs[i] for i in indexes])):
+                records[index] = record
+        return [record for record in records if record is not None]
+
+    def _parse_each(self, msgs, indexes, records, strict):
+        """
+        This method decodes some messages of a batch one at a time with parse()
+        :param indexes: Positions of the messages in msgs
+        :param records: Records of the batch, filled in at the same positions
+        """
+        for index in indexes:
+            try:
+                records[index] = self.parse(msgs[index])
+            except ValueError:
+                if strict:
+                    raise
+                self.skipped += 1
+
+    def _decode_group(self, layout, msgs):
+        """
+        This method decodes messages of one shape with numpy, giving the same values as parse()
+        :param layout: Layout of the shape, see _compile()
+        :param msgs: List of messages (bytes) of that shape
+        :return: List of GoesRecord
+        """
+        columns = self._decode_columns(layout, msgs)
+        count = len(msgs)
+        labels = layout[2]
+        redundant_labels = layout[7]
+        values = np.column_stack([columns.values[label] for label in labels]).tolist() if labels else [()] * count
+        redundant_values = (np.column_stack([columns.redundant[label] for label in redundant_labels]).tolist()
+                            if redundant_labels else [()] * count)
+        if columns.tsunami is None:
+            tsunamis = [None] * count
+        else:
+            tsunamis = [None if tsu_time < 0 else (tsu_time, tuple(value))
+                        for tsu_time, value in zip(columns.tsunami[0].tolist(), columns.tsunami[1].tolist())]
+        batteries = [None] * count if columns.battery is None else columns.battery.tolist()
+        station = columns.station
+        return [GoesRecord(station, timestamp, dict(zip(labels, value)), dict(zip(redundant_labels, redundant)),
+                           tsunami, battery)
+                for timestamp, value, redundant, tsunami, battery in zip(columns.timestamps.tolist(), values,
+                                                                          redundant_values, tsunamis, batteries)]
+
+    def _decode_columns(self, layout, msgs):
+        """
+        This method decodes messages of one shape with numpy into one array per field
+        :param layout: Layout of the shape, see _compile()
+        :param msgs: List of messages (bytes) of that shape
+        :return: GoesColumns
+        """
+        (station_end, zero, labels, _, _, _, missing, redundant_labels, _, redundant_missing, tsunami_pos,
+         battery_pos, columns, redundant_columns) = layout
+        count = len(msgs)
+        d = _DIGIT_ARRAY[np.frombuffer(b"".join(msgs), np.uint8).reshape(count, -1)]
+        values = [_column(d, *column) for column in columns] + [np.full(count, NAN)] * len(missing)
+        redundant_values = ([_column(d, *column) for column in redundant_columns] +
+                            [np.full(count, NAN)] * len(redundant_missing))
+        timestamps = (self.day_array[d[:, zero + 1] << 6 | d[:, zero + 2]] * 86400 + d[:, zero + 3] * 3600 +
+                      d[:, zero - 1] * 60)
+        tsunami = None if tsunami_pos < 0 else self._tsunami_many(d, tsunami_pos + 1, timestamps)
+        battery = None if battery_pos < 0 else 9.5 + d[:, battery_pos] / 10
+        station = msgs[0][1:station_end].decode()  # the station ID is part of the shape
+        return GoesColumns(station, timestamps, dict(zip(labels, values)),
+                           dict(zip(redundant_labels, redundant_values)), tsunami, battery)
+
+    def _tsunami_many(self, d, i, timestamps):
+        """
+        This method decodes the tsunami block of every message of a batch, the same way _tsunami() does
+        :param d: numpy array of the messages translated to 6 bit groups, one row per message
+        :param timestamps: numpy array of primary sensor times
+        :return: (numpy array of times, -1 where the block is flagged missing, numpy array of values newest first)
+        """
+        hours = d[:, i]
+        tsu_times = timestamps - timestamps % 86400 + hours * 3600 + d[:, i + 1] * 60
+        tsu_times += 86400 * ((timestamps - tsu_times > 43200).astype(np.int64) -
+                              (tsu_times - timestamps > 43200).astype(np.int64))
+        raws = d[:, i + 3::2] << 6 | d[:, i + 4::2]
+        values = np.where(raws == 4095, NAN, (raws + d[:, i + 2:i + 3] * 250) * self.scale["TSUNAMI"])
+        flagged = hours == 63
+        tsu_times[flagged] = -1
+        values[flagged] = NAN
+        return tsu_times, values
+
+    def parse_columns(self, msgs, strict=True):
+        """
+        This method decodes a batch of messages into columns, without building a record per message. The messages
+        are grouped by shape and every group is decoded with numpy, so the cost per message is a few array
+        operations shared by the whole group
+        :param msgs: List of GOES messages (bytes or str)
+        :param strict: Raise on malformed messages instead of skipping (and counting) them
+        :return: List of GoesColumns, one per shape, the messages of a shape in the order of msgs
+        """
+        if np is None:
+            raise ImportError("parse_columns requires numpy")
+        shapes = {}
+        for msg in msgs:
+            if isinstance(msg, str):
+                msg = msg.encode("latin-1")
+            shapes.setdefault(msg.translate(_SHAPE), []).append(msg)
+        batch = []
+        for shape, group in shapes.items():
+            while group:
+                try:
+                    layout = self._layout(group[0], shape)
+                except ValueError:
+                    if strict:
+                        raise
+                    self.skipped += 1
+                    del group[0]
+                    continue
+                if layout[10] >= 0:
+                    # the "T" of the tsunami block is pseudobinary, so it is not part of the shape
+                    rest = [msg for msg in group if msg[layout[10]] != 84]
+                    if rest:
+                        group = [msg for msg in group if msg[layout[10]] == 84]
+                else:
+                    rest = []
+                batch.append(self._decode_columns(layout, group))
+                group = rest
+        return batch
+
+    def iter_file(self, source, strict=False):
+        """
+        This method streams records from a file of newline delimited messages without loading the whole file, the
+        messages are decoded BATCH_SIZE at a time by parse_many()
+        :param source: File path or file object opened in binary or text mode, or any iterable of lines
+        :param strict: Raise on malformed messages instead of skipping (and counting) them
+        :return: Generator of GoesRecord
+        """
+        for batch in self._batches(source):
+            for record in self.parse_many(batch, strict):
+                yield record
+
+    def iter_columns(self, source, strict=False):
+        """
+        This method streams a file of newline delimited messages as columns, BATCH_SIZE messages at a time are
+        decoded by parse_columns()
+        :param source: File path or file object opened in binary or text mode, or any iterable of lines
+        :param strict: Raise on malformed messages instead of skipping (and counting) them
+        :return: Generator of GoesColumns
+        """
+        for batch in self._batches(source):
+            for columns in self.parse_columns(batch, strict):
+                yield columns
+
+    def _batches(self, source):
+        """
+        This method reads the messages of a file BATCH_SIZE at a time, skipping empty lines
+        :param source: File path or file object opened in binary or text mode, or any iterable of lines
+        :return: Generator of lists of messages
+        """
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                for batch in self._batches(f):
+                    yield batch
+            return
+        batch = []
+        for line in source:
+            line = line.rstrip(b"\r\n" if isinstance(line, bytes) else "\r\n")
+            if line:
+                batch.append(line)
+                if len(batch) >= BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+def parse_message(msg, ref_time=None, right_digits=None):
+    """
+    This function decodes one GOES message
+    :param msg: GOES message (bytes or str)
+    :param ref_time: Seconds since 1970/01/01 used to resolve the Sutron day, defaults to now
+    :param right_digits: Dictionary of label -> right digits overriding RIGHT_DIGITS
+    :return: GoesRecord
+    """
+    return GoesParser(ref_time, right_digits).parse(msg)
+
+
+def iter_messages(source, ref_time=None, right_digits=None, strict=False):
+    """
+    This function streams records from a file of newline delimited GOES messages
+    :param source: File path or file object
+    :param ref_time: Seconds since 1970/01/01 used to resolve the Sutron day, defaults to now
+    :param right_digits: Dictionary of label -> right digits overriding RIGHT_DIGITS
+    :param strict: Raise on malformed messages instead of skipping them
+    :return: Generator of GoesRecord
+    """
+    return GoesParser(ref_time, right_digits).iter_file(source, strict)
@@ -7,76 +7,39 @@ Created on Mon Dec 13 19:41:17 2021
 
 from sl3 import *
 
+import uos
+
 import urandom
 
+from array import array
 
-def decimal_to_binary(decimal_number):
-    """
-    This function coverts decimal to 18 bits binary number
-    :param decimal_number: Decimal number
-    :return: 18 bits binary number
-    """
-    bi_num = bin(abs(decimal_number)).replace("0b", "")
-    bi_len = len(bi_num)
-    bi_app = "0" * 18
-    bi_app = bi_app[0:18 - bi_len]
-    return bi_app + bi_num
+from pseudobinary import pseudo_encoder, encode_many
 
+from portsfile import PortsFile
 
-def pseudo_encoder(int_val, byt, pos=False):
-    """
-    Pseudobinary encoder function converts binary number from -131072 to 131071
-    :param int_val: Decimal number
-    :param byt: Number of bytes (1,2 or 3)
-    :param pos: Positive only is True
-    :return: Pseudobinary b format
-    """
-    int_val = int(str(int_val).replace(".", ""))
-    iv = 0
-    if int_val < 0 and pos:
-        return "`@@"[:byt]
-    if int_val < 0 and not pos:
-        if byt == 1 and int_val < -31:
-            return "`"
-        if byt == 2 and int_val < -2047:
-            return "`@"
-        if byt == 3 and int_val < -131071:
-            return "`@@"
-        # Call decimal_to_binary Function
-        bi_num = decimal_to_binary(int_val)
-        bi_str = ""
-        for bit in bi_num:
-            if bit == "1":
-                bi_str += "0"
-            else:
-                bi_str += "1"
-        iv = int(bi_str, 2) + 1
-    if int_val >= 0:
-        if not pos:
-            if byt == 1 and int_val > 30:
-                return "_"
-            if byt == 2 and int_val > 2046:
-                return "_?"
-            if byt == 3 and int_val > 131070:
-                return "_??"
-        elif pos:
-            if byt == 1 and int_val > 62:
-                return "?"
-            if byt == 2 and int_val > 4094:
-                return "??"
-            if byt == 3 and int_val > 262142:
-                return "???"
-        iv = int_val
-    bi_array = [iv >> 12, (iv >> 6) & 63, iv & 63]
-    for i in range(3):
-        if bi_array[i] != int(63):
-            bi_array[i] += 64
-    if byt == 1:
-        return chr(bi_array[2])
-    if byt == 2:
-        return chr(bi_array[1]) + chr(bi_array[2])
-    if byt == 3:
-        return chr(bi_array[0]) + chr(bi_array[1]) + chr(bi_array[2])
+from spantrace import Tracer, first_word, sensor_label
+
+# number of spans kept by the tracer, 0 disables tracing. The dump_trace task writes them to TRACE_FILE
+TRACE_SPANS = 0
+TRACE_FILE = "/sd/trace.txt"
+tracer = Tracer(TRACE_SPANS, utime.ticks_ms, utime.ticks_diff)
+command_line = tracer.wrap(command_line, "command_line", first_word)
+
+# number of 1 minute samples in the tsunami block of the messages
+TSUNAMI_WINDOW = 6
+
+# sensor readings are kept as integers scaled by the right digits (e.g. 1.234 m with 3 right digits is 1234) from
+# the log text to the pseudobinary encoder. A reading that is missing is kept as MISSING_VALUE
+MISSING_VALUE = -2147483648
+
+# seconds a record may reach the log after its time stamp (e.g. averaged readings). A sensor whose scheduled reading is
+# not in the log yet stays due for that long, then waits for the next scheduled reading
+LOG_DELAY = 300
+
+# size of the response buffer of the LOG query. command_line cuts a response to the buffer size, which would lose the
+# newest records at the end of it, so the buffer is doubled and the query repeated whenever a response fills it. The
+# grown size is kept for the next cycles
+log_buf_size = 2048
 
 
 def sutron_day_calc(julian_day, year):
@@ -93,59 +56,481 @@ def sutron_day_calc(julian_day, year):
     return (365 * year + leap_year + julian_day) % 4096
 
 
+# GOES message buckets, in transmission order. The sensor groups of the message plan are appended to their bucket
+(DAT_GOES, SNS_GOES, HEADER_GOES, PRI_GOES, AQT_GOES, MW_GOES, MW_GOES2, WIND_GOES, WIND_GOES2, AT_GOES, WT_GOES,
+ CTWT_GOES, BARO_GOES, COND_GOES, BAT_GOES, BWL_GOES, BATT_GOES, TSU_GOES) = range(18)
+GOES_BUCKETS = 18
+
+# label of the first sensor of a group -> (group ID, member labels, redundant separator, suffix, GOES bucket,
+# can be primary, PORTS tag flag, PORTS tag format)
+MESSAGE_GROUPS = {
+    "AQT": ("1", ("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), ">", "", AQT_GOES, True, "A1 1", 1),
+    "WS": ("3", ("WS", "WD", "WG"), None, "", WIND_GOES, True, "C1 3", 2),
+    "WS2": ("3", ("WS2", "WD2", "WG2"), None, "", WIND_GOES2, True, "C1 3", 2),
+    "MWWL": ("8", ("MWWL", "MWSTD", "MWOUT"), "#", "", MW_GOES, True, "Y1 8", 3),
+    "MWWL2": ("8", ("MWWL2", "MWSTD2", "MWOUT2"), "#", "", MW_GOES2, False, "Y2 8", 3),
+    "BWL": ("2", ("BWL", "BWLSTD", "BWLOUT"), '"', "", BWL_GOES, True, "B1 2", 3),
+    "AT": ("4", ("AT",), None, "", AT_GOES, True, "D1 4", 4),
+    "WT": ("5", ("WT",), None, "", WT_GOES, True, "E1 5", 4),
+    "CTWT": ("5", ("CTWT",), None, "", CTWT_GOES, True, "E2 5", 4),
+    "BARO": ("6", ("BARO",), None, "", BARO_GOES, True, "F1 6", 4),
+    "BAT": ("<", ("BAT",), None, " ", BAT_GOES, False, "L1 <", 4),
+    "BBAT": ("<", ("BBAT",), None, " ", BATT_GOES, False, "L1 <", 4),
+    "COND": ("-7", ("COND",), None, "", COND_GOES, True, "G1 -7", 5),
+    "SNS": ("", ("SNS",), None, "", SNS_GOES, False, "SNS", 6),
+    "DAT": ("", ("DAT",), None, "", DAT_GOES, False, "DAT", 6),
+    "AQTWL": ("T", ("AQTWL",), None, "", TSU_GOES, False, "U1", 7),
+    "MWTWL": ("T", ("MWTWL",), None, "", TSU_GOES, False, "U1", 7),
+}
+# member label -> label of the first sensor of its group
+GROUP_HEADS = {}
+for g_h in MESSAGE_GROUPS:
+    for g_m in MESSAGE_GROUPS[g_h][1]:
+        GROUP_HEADS[g_m] = g_h
+# label -> (number of bytes, positive only, offset added to the scaled value, encoded missing value or None to
+# encode MISSING_VALUE like any other value). Labels that are not listed are encoded with DEFAULT_SPEC
+LABEL_SPECS = {
+    "AQT": (3, False, 0, "???"),
+    "AQTSTD": (2, True, 0, None),
+    "AQTOUT": (1, True, 0, None),
+    "AQT1": (2, False, 0, "??"),
+    "AQT2": (2, False, 0, "??"),
+    "MWWL": (3, False, 0, "???"),
+    "MWSTD": (2, True, 0, "??"),
+    "MWOUT": (1, True, 0, "?"),
+    "MWWL2": (3, False, 0, "???"),
+    "MWSTD2": (2, True, 0, "??"),
+    "MWOUT2": (1, True, 0, "?"),
+    "BWL": (3, False, 0, "???"),
+    "BWLSTD": (2, True, 0, "??"),
+    "BWLOUT": (1, True, 0, "?"),
+    "WS": (2, True, 0, "??"),
+    "WD": (2, True, 0, "??"),
+    "WG": (2, True, 0, "??"),
+    "WS2": (2, True, 0, "??"),
+    "WD2": (2, True, 0, "??"),
+    "WG2": (2, True, 0, "??"),
+    "AT": (2, False, 0, "??"),
+    "WT": (2, False, 0, "??"),
+    "CTWT": (2, False, 0, "??"),
+    "BARO": (2, True, -8000, "??"),
+    "COND": (3, False, 0, "???"),
+    "BAT": (2, True, 0, "??"),
+    "BBAT": (2, True, 0, "??"),
+    "SNS": (2, False, 0, "??"),
+    "DAT": (3, False, 0, "???"),
+}
+DEFAULT_SPEC = (3, False, 0, None)
+
+# sensor groups in sensor list order, after the group of the first measurement
+GROUP_ORDER = ("AQT", "MWWL", "MWWL2", "WS", "WS2", "AT", "WT", "CTWT", "BARO", "COND", "BAT", "BWL", "BBAT", "SNS",
+               "DAT", "AQTWL", "MWTWL")
+# member label -> sort key: 8 * (group rank + 1) + position in the group
+SENSOR_KEYS = {}
+for g_r, g_h in enumerate(GROUP_ORDER):
+    for g_p, g_m in enumerate(MESSAGE_GROUPS[g_h][1]):
+        SENSOR_KEYS[g_m] = 8 * (g_r + 1) + g_p
+
+
+def encode_data(value, byt, pos, offset, missing):
+    """
+    This function encodes a sensor value
+    :param value: Sensor value scaled by the right digits, MISSING_VALUE if missing
+    :param byt: Number of bytes (1,2 or 3)
+    :param pos: Positive only is True
+    :param offset: Offset added to the scaled value
+    :param missing: Encoded missing value, None to encode MISSING_VALUE like any other value
+    :return: Pseudobinary b format
+    """
+    if value == MISSING_VALUE and missing is not None:
+        return missing
+    return pseudo_encoder(value + offset, byt, pos)
+
+
+def compile_message_plan(sensors, groups):
+    """
+    This function compiles the ordered sensor list into the plan executed by ports_tag_message_formatter every
+    cycle. The plan only depends on the labels and measurement numbers, so it is built once per configuration
+    :param sensors: Ordered sensor list
+    :param groups: Dictionary of group head label -> sensors of the group in member order (see order_sensors)
+    :return: List of (GOES bucket, group ID, fields, redundant, suffix, PORTS tag flag, PORTS tag format, PORTS
+    tag slots, cache). fields are (sensor registry slot,) + the label spec of the sensor (see LABEL_SPECS),
+    redundant is (separator, sensor) or None. Tsunami groups have no fields and carry their sensor instead of slots.
+    cache is [key, GOES segment, PORTS tag text] of the last run, key None until the group is first formatted
+    """
+    plan = []
+    pri_sns_check = ""
+    for sensor in sensors:
+        head = GROUP_HEADS.get(sensor.label)
+        if head is None:
+            continue
+        group_id, members, separator, suffix, bucket, primary, flag, typ = MESSAGE_GROUPS[head]
+        if sensor.label == head and sensor.meas_number == "M1" and len(members) > 1:
+            pri_sns_check = head
+        if group_id == "T":
+            if pri_sns_check[:2] == head[:2]:
+                plan.append((bucket, group_id, None, None, suffix, flag, typ, (sensor,), [None, "", ""]))
+            continue
+        if len(members) == 1:
+            group = (sensor,)
+            if primary and sensor.meas_number == "M1":
+                bucket = PRI_GOES
+        else:
+            group = groups[head]
+            if sensor is not group[-1] or len(group) != len(members):
+                continue  # the group is sent once complete, at its last sensor
+            if primary and pri_sns_check == head:
+                bucket = PRI_GOES
+        fields = tuple((g.slot,) + g.spec for g in group)
+        redundant = None if separator is None else (separator, group[0])
+        plan.append((bucket, group_id, fields, redundant, suffix, flag, typ, tuple(g.slot for g in group),
+                     [None, "", ""]))
+    return plan
+
+
+def parse_duration(text):
+    """
+    This function converts a HH:MM:SS setting of the Satlink 3 to seconds
+    :param text: Setting text e.g. 00:06:00
+    :return: Seconds, 0 when the text is not a duration
+    """
+    parts = text.strip().split(":")
+    if len(parts) != 3:
+        return 0
+    try:
+        return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    except ValueError:
+        return 0
+
+
+class ConfigSnapshot:
+    def __init__(self):
+        """
+        This ConfigSnapshot class constructor creates an empty snapshot of the measurement setup. The setup is read
+        from the Satlink 3 once, the first time it is needed, and then served from memory until invalidate() is
+        called (e.g. at the start of initialize_config)
+        """
+        self.active_cmd = tuple("!M" + str(i + 1) + " active\r" for i in range(32))
+        self.label_cmd = tuple("!M" + str(i + 1) + " LABEL\r" for i in range(32))
+        self.right_digits_cmd = tuple("!M" + str(i + 1) + " RIGHT DIGITS\r" for i in range(32))
+        self.slots = None
+        self.meas = {}
+        self.schedules = {}
+        self.station_name = None
+
+    def invalidate(self):
+        """
+        This method drops the snapshot so the next lookup reads the setup again
+        """
+        self.slots = None
+        self.meas = {}
+        self.schedules = {}
+        self.station_name = None
+
+    def measurements(self):
+        """
+        This method returns the active measurements, probing every slot only once per snapshot
+        :return: List of (measurement number, label, right digits)
+        """
+        if self.slots is None:
+            self.slots = []
+            for i in range(32):
+                if command_line(self.active_cmd[i]).strip() == "On":
+                    slot = ("M" + str(i + 1), command_line(self.label_cmd[i]).strip(),
+                            int(command_line(self.right_digits_cmd[i]).strip()))
+                    self.slots.append(slot)
+                    self.meas[slot[0]] = slot
+        return self.slots
+
+    def measurement(self, meas_number):
+        """
+        This method returns the label and right digits of a measurement
+        :param meas_number: Measurement number e.g M1, M2
+        :return: (label, right digits)
+        """
+        self.measurements()
+        slot = self.meas.get(meas_number)
+        if slot is None:  # inactive measurement, not part of the snapshot
+            return (command_line("!" + meas_number + " LABEL\r").strip(),
+                    int(command_line("!" + meas_number + " RIGHT DIGITS\r").strip()))
+        return slot[1], slot[2]
+
+    def schedule(self, meas_number):
+        """
+        This method returns the measurement interval and time offset of a measurement, read from the setup the first
+        time they are needed
+        :param meas_number: Measurement number e.g M1, M2
+        :return: (interval, offset) in seconds, interval 0 when the setup does not give it
+        """
+        schedule = self.schedules.get(meas_number)
+        if schedule is None:
+            schedule = self.schedules[meas_number] = (
+                parse_duration(command_line("!" + meas_number + " MEAS INTERVAL\r")),
+                parse_duration(command_line("!" + meas_number + " MEAS TIME\r")))
+        return schedule
+
+    def station(self):
+        """
+        This method returns the station name
+        :return: Station name
+        """
+        if self.station_name is None:
+            self.station_name = command_line("!STATION NAME\r").strip()
+        return self.station_name
+
+
+config_snapshot = ConfigSnapshot()
+
+
+class SensorRegistry:
+    def __init__(self, size=32):
+        """
+        This SensorRegistry class constructor creates the parallel columns that hold the state of up to size sensors.
+        The sensor objects are thin views on one slot of these columns, and the message formatter reads the values
+        by slot without going through the objects. Values are integers scaled by the right digits. A slot is marked
+        dirty when its value or redundant value changes, until the message formatter has encoded it again
+        :param size: Number of slots, one per measurement
+        """
+        self.size = size
+        self.values = array("l", [MISSING_VALUE] * size)
+        self.redundant_values = array("l", [MISSING_VALUE] * size)
+        self.right_digits = array("b", [0] * size)
+        self.label_ids = array("B", [0] * size)
+        self.dirty = array("B", [1] * size)
+        self.labels = []  # label ID -> label
+        self.count = 0
+
+    def clear(self):
+        """
+        This method frees all slots before the sensors are created again
+        """
+        self.labels = []
+        self.count = 0
+
+    def add(self, label, right_digits):
+        """
+        This method assigns the next free slot to a sensor
+        :param label: Sensor label
+        :param right_digits: Number of digits right of the decimal point
+        :return: Slot
+        """
+        slot = self.count
+        if slot == self.size:
+            raise IndexError("no free sensor slot")
+        if label not in self.labels:
+            self.labels.append(label)
+        self.label_ids[slot] = self.labels.index(label)
+        self.right_digits[slot] = right_digits
+        self.values[slot] = self.redundant_values[slot] = MISSING_VALUE
+        self.dirty[slot] = 1
+        self.count += 1
+        return slot
+
+
+sensor_registry = SensorRegistry()
+
+
+@tracer.traced("fetch_log")
+def fetch_log(from_date, to_date, wanted):
+    """
+    This function reads the records of all measurements logged between from_date and to_date with a single LOG
+    command, repeated with a larger buffer when the response does not fit in log_buf_size. The response is scanned
+    backwards from its end with index arithmetic and only the newest records of the wanted labels are parsed, so the
+    cost does not depend on how many older rows the window holds
+    :param from_date: Start of the window (YYYY/MM/DD HH:MM:SS)
+    :param to_date: End of the window (YYYY/MM/DD HH:MM:SS)
+    :param wanted: Dictionary of label -> number of records needed
+    :return: Dictionary of label -> list of (YYYY/MM/DD HH:MM:SS, value), newest first
+    """
+    global log_buf_size
+    cmd = "!LOG " + from_date + " " + to_date + " NY NH\r"
+    text = command_line(cmd, log_buf_size)
+    while len(text) >= log_buf_size:
+        log_buf_size *= 2
+        text = command_line(cmd, log_buf_size)
+    log = {}
+    left = len(wanted)
+    end = len(text)
+    while end > 0 and left:
+        start = text.rfind("\n", 0, end) + 1
+        stop = end - 1 if text[end - 1] == "\r" else end
+        end = start - 1
+        c1 = text.find(",", start, stop)
+        c2 = text.find(",", c1 + 1, stop)
+        c3 = text.find(",", c2 + 1, stop)
+        if c1 == -1 or c2 == -1 or c3 == -1:
+            continue
+        label = text[c2 + 1:c3]
+        need = wanted.get(label, 0)
+        records = log.get(label)
+        if records is None:
+            if not need:
+                continue
+            records = log[label] = []
+        elif len(records) == need:
+            continue
+        c4 = text.find(",", c3 + 1, stop)
+        records.append((text[start + 6:start + 10] + "/" + text[start:start + 5] + " " + text[c1 + 1:c2],
+                        text[c3 + 1:stop if c4 == -1 else c4]))
+        if len(records) == need:
+            left -= 1
+    return log
+
+
+def parse_fixed(text, right_digits):
+    """
+    This function converts the decimal text of a log record to an integer scaled by the right digits without going
+    through a float, so the value is exact. Digits past the right digits are rounded half away from zero
+    :param text: Decimal text e.g. -1.25
+    :param right_digits: Number of digits right of the decimal point
+    :return: Scaled integer e.g. -1250 for 3 right digits
+    """
+    text = text.strip()
+    sign = text[:1]
+    if sign == "-" or sign == "+":
+        text = text[1:]
+    dot = text.find(".")
+    if dot == -1:
+        whole, fraction = text, ""
+    else:
+        whole, fraction = text[:dot], text[dot + 1:]
+    if not (whole + fraction).isdigit():
+        raise ValueError("not a decimal number: " + text)
+    value = int((whole or "0") + fraction[:right_digits] + "0" * (right_digits - len(fraction)))
+    if fraction[right_digits:right_digits + 1] >= "5":
+        value += 1
+    if value > 2147483647:  # keep clear of MISSING_VALUE and inside the registry arrays
+        value = 2147483647
+    return -value if sign == "-" else value
+
+
+def log_records(records, from_date, count):
+    """
+    This function returns the latest records logged since from_date
+    :param records: List of (YYYY/MM/DD HH:MM:SS, value), newest first
+    :param from_date: Start of the sensor window (YYYY/MM/DD HH:MM:SS)
+    :param count: Maximum number of records
+    :return: List of (YYYY/MM/DD HH:MM:SS, value), newest first
+    """
+    i = 0
+    while i < len(records) and i < count and records[i][0] >= from_date:
+        i += 1
+    return records[:i]
+
+
+def log_start(sensors, from_date):
+    """
+    This function returns where the LOG query of the cycle starts: the oldest cursor of the sensors read by the query,
+    so only records that they have not seen yet are read. It falls back to from_date on the first run, after a
+    reboot or after a gap
+    :param sensors: Sensors read by the LOG query of the cycle
+    :param from_date: Start of the widest window of the cycle (YYYY/MM/DD HH:MM:SS)
+    :return: Start of the LOG query (YYYY/MM/DD HH:MM:SS)
+    """
+    start = min(s.cursor for s in sensors)
+    return start if start > from_date else from_date
+
+
 class SecondarySensor:
+    __slots__ = ("meas_number", "slot", "spec", "cursor", "records", "keep", "last", "checked", "interval", "offset")
+
     def __init__(self, meas_number):
         """
         This SecondarySensor class constructor uses the measurement number e.g M1 to retrieve relevant sensor
-        attributes, then uses it to create and initialize the sensor object
+        attributes, then uses it to create and initialize the sensor object. Label, right digits and value are
+        kept in the sensor registry slot of the object
         :param meas_number: Measurement number e.g M1, M2
         """
 
         self.meas_number = meas_number
-        self.label = command_line("!" + meas_number + " LABEL\r").strip()
-        self.right_digits = int(command_line("!" + meas_number + " RIGHT DIGITS\r").strip())
-        self.value = -99999.0
+        self.slot = sensor_registry.add(*config_snapshot.measurement(meas_number))
+        self.spec = LABEL_SPECS.get(self.label, DEFAULT_SPEC)
+        self.cursor = ""  # date of the newest log record seen
+        self.records = []  # newest log records, newest first
+        self.keep = 1  # number of log records used by an update
+        self.last = 0  # time of the newest log record seen in seconds, 0 before the first one
+        self.checked = 0  # time of the last LOG query that read the sensor in seconds
+        self.interval, self.offset = config_snapshot.schedule(meas_number)  # measurement schedule in seconds
+
+    @property
+    def label(self):
+        return sensor_registry.labels[sensor_registry.label_ids[self.slot]]
+
+    @property
+    def right_digits(self):
+        return sensor_registry.right_digits[self.slot]
+
+    @property
+    def value(self):
+        return sensor_registry.values[self.slot]
+
+    @value.setter
+    def value(self, value):
+        if sensor_registry.values[self.slot] != value:
+            sensor_registry.values[self.slot] = value
+            sensor_registry.dirty[self.slot] = 1
 
     def get_encoded_data(self):
         """
         This method returns the encoded data of the object when called
         :return: Encoded data
         """
-        if self.value == -99999.0:
-            if self.label in ("AQT", "BWL", "COND", "DAT", "MWWL", "MWWL2"):
-                return "???"
-            if self.label in ("AT", "AQT1", "AQT2", "BAT", "BBAT", "BARO", "BWLSTD", "CTWT", "MWSTD", "MWSTD2", "SNS",
-                              "WT", "WS", "WD", "WG", "WS2", "WD2", "WG2"):
-                return "??"
-            if self.label in ("MWOUT", "MWOUT2", "BWLOUT"):
-                return "?"
-        value = int(self.value * 10 ** self.right_digits)
-        if self.label in ("MWOUT", "MWOUT2", "AQTOUT", "BWLOUT"):
-            return pseudo_encoder(value, 1, True)
-        if self.label in ("AQTSTD", "BARO", "BAT", "BBAT", "BWLSTD", "MWSTD",
-                          "MWSTD2", "WS", "WD", "WG", "WS2", "WD2", "WG2"):
-            if self.label == "BARO":
-                value -= 8000
-            return pseudo_encoder(value, 2, True)
-        if self.label in ("AT", "AQT1", "AQT2", "CTWT", "SNS", "WT"):
-            return pseudo_encoder(value, 2)
-        return pseudo_encoder(value, 3)
-
-    def update_secondary_data(self):
+        return encode_data(self.value, *self.spec)
+
+    def due(self, epoch):
+        """
+        This method tells whether the log can hold a record of the sensor that has not been read yet, so the sensor
+        needs the LOG query of the cycle. That is the case when the newest scheduled reading has not been seen and
+        was logged less than LOG_DELAY seconds before the last query. A missed reading is thus queried for LOG_DELAY
+        seconds only. A sensor without a measurement interval in the setup is always due
+        :param epoch: Time of the cycle in seconds
+        :return: True when the sensor has to be queried
+        """
+        if not self.interval or epoch < self.checked:  # no schedule or the clock was set back
+            return True
+        reading = epoch - (epoch - self.offset) % self.interval
+        return reading > self.last and self.checked < reading + LOG_DELAY
+
+    def read_log(self, log, from_date):
+        """
+        This method moves the log cursor of the sensor past the new records of the cycle
+        :param log: Log records of the cycle grouped by label (see fetch_log)
+        :param from_date: Start of the sensor window (YYYY/MM/DD HH:MM:SS)
+        :return: List of (YYYY/MM/DD HH:MM:SS, value) logged since from_date, newest first
+        """
+        if self.cursor > cycle_clock.to_date:  # the clock was set back
+            self.cursor = ""
+            self.records = []
+            self.last = 0
+        new = log.get(self.label, ())
+        i = 0
+        while i < len(new) and new[i][0] > self.cursor:
+            i += 1
+        if i:
+            self.last = utime.mktime(get_log_date(new[0][0]))
+            self.records = (new[:i] + self.records)[:self.keep]
+            self.cursor = self.records[0][0]
+        return log_records(self.records, from_date, self.keep)
+
+    @tracer.traced("update_secondary_data", sensor_label)
+    def update_secondary_data(self, log):
         """
         This method is used to update the secondary data object with the most recent
         sensor data
-        :return: Most recent sensor data value
+        :param log: Log records of the cycle grouped by label (see fetch_log)
+        :return: Most recent sensor data value, scaled by the right digits
         """
-        log = command_line("!LOG " + from_sec + " " + to_date + " " + self.meas_number + " NY NH\r").strip()
-        if log.count(self.label) > 0:
-            self.value = round(float(log.split("\r\n")[-1].split(",")[3]), self.right_digits)
+        records = self.read_log(log, cycle_clock.from_sec)
+        if records:
+            self.value = parse_fixed(records[0][1], self.right_digits)
             return self.value
-        self.value = -99999.0
+        self.value = MISSING_VALUE
         return self.value
 
 
 class PrimarySensor(SecondarySensor):
+    __slots__ = ("year", "month", "day", "hour", "minute", "second", "julian_day", "sutron_day")
+
     def __init__(self, meas_number):
         """
         This PrimarySensor class constructor inherits the SecondarySensor class attributes
@@ -154,15 +539,22 @@ class PrimarySensor(SecondarySensor):
         :param meas_number: Measurement number e.g M1
         """
         super().__init__(meas_number)
-        self.redundant_value = -99999.0
-        self.year = utime.localtime()[0]
-        self.month = utime.localtime()[1]
-        self.day = utime.localtime()[2]
-        self.hour = utime.localtime()[3]
-        self.minute = utime.localtime()[4]
-        self.second = utime.localtime()[5]
-        self.julian_day = utime.localtime()[7]
-        self.sutron_day = sutron_day_calc(self.julian_day, self.year)
+        self.keep = 2
+        self.redundant_value = MISSING_VALUE
+        now = cycle_clock.now
+        self.year, self.month, self.day, self.hour, self.minute, self.second = now[:6]
+        self.julian_day = now[7]
+        self.sutron_day = cycle_clock.sutron_day
+
+    @property
+    def redundant_value(self):
+        return sensor_registry.redundant_values[self.slot]
+
+    @redundant_value.setter
+    def redundant_value(self, value):
+        if sensor_registry.redundant_values[self.slot] != value:
+            sensor_registry.redundant_values[self.slot] = value
+            sensor_registry.dirty[self.slot] = 1
 
     def get_encoded_hour(self):
         """
@@ -183,10 +575,9 @@ class PrimarySensor(SecondarySensor):
         This method encodes redundant data
         :return: returns encoded data
         """
-        if self.redundant_value == -99999.0:
+        if self.redundant_value == MISSING_VALUE:
             return "???"
-        value = int(self.redundant_value * 10 ** self.right_digits)
-        return pseudo_encoder(value, 3)
+        return pseudo_encoder(self.redundant_value, 3)
 
     def get_encoded_sutron_day(self):
         """
@@ -195,27 +586,29 @@ class PrimarySensor(SecondarySensor):
         """
         return pseudo_encoder(self.sutron_day, 2, True)
 
-    def update_primary_data(self):
+    @tracer.traced("update_primary_data", sensor_label)
+    def update_primary_data(self, log):
         """
         This method is used to update the primary data object with the most recent
         sensor data, date and time
-        :return: Most recent sensor data value, date and time
-        """
-        log = command_line("!LOG " + from_pri + " " + to_date + " " + self.meas_number + " NY NH\r").strip()
-        if log.count(self.label) > 0:
-            new_log = log.split("\r\n")[-1].split(",")
-            self.value = round(float(new_log[3]), self.right_digits)
-            if log.count(self.label) > 1:
-                self.redundant_value = round(float(log.split("\r\n")[-2].split(",")[3]), self.right_digits)
+        :param log: Log records of the cycle grouped by label (see fetch_log)
+        :return: Most recent sensor data value and redundant value, scaled by the right digits
+        """
+        records = self.read_log(log, cycle_clock.from_pri)
+        if records:
+            new_log = records[0]
+            self.value = parse_fixed(new_log[1], self.right_digits)
+            if len(records) > 1:
+                self.redundant_value = parse_fixed(records[1][1], self.right_digits)
             else:
-                self.redundant_value = -99999.0
+                self.redundant_value = MISSING_VALUE
             if self.label == "MWWL":
                 time_diff = 180
             elif self.label == "AQT":
                 time_diff = 90
             else:
                 time_diff = 0
-            pri_date = utime.localtime(utime.mktime(get_log_date(new_log)) - time_diff)
+            pri_date = cycle_clock.log_localtime(new_log[0], -time_diff)
             self.year = pri_date[0]
             self.month = pri_date[1]
             self.day = pri_date[2]
@@ -225,78 +618,245 @@ class PrimarySensor(SecondarySensor):
             self.julian_day = pri_date[7]
             self.sutron_day = sutron_day_calc(self.julian_day, self.year)
             return self.value, self.redundant_value
-        self.value = self.redundant_value = -99999.0
+        self.value = self.redundant_value = MISSING_VALUE
         return self.value, self.redundant_value
 
 
 class TsunamiData(SecondarySensor):
+    __slots__ = ("hour", "minute", "samples", "times", "newest", "count", "low")
+
     def __init__(self, meas_number):
         """
         This TsunamiData class constructor inherits certain PrimarySensor class attributes
-        and methods. It also includes attributes and methods that are tsunami related
+        and methods. It also includes attributes and methods that are tsunami related. The last TSUNAMI_WINDOW
+        readings are kept in a ring as integers scaled by the right digits, with their minimum
         :param meas_number: Measurement number e.g M1
         """
         super().__init__(meas_number)
-        self.value2 = self.value3 = self.value4 = self.value5 = self.value6 = self.value
-        self.hour = utime.localtime()[3]
-        self.minute = utime.localtime()[4]
+        self.keep = TSUNAMI_WINDOW
+        self.samples = array("l", [0] * TSUNAMI_WINDOW)
+        self.times = [""] * TSUNAMI_WINDOW  # log dates of the samples
+        self.newest = TSUNAMI_WINDOW - 1  # ring index of the newest sample
+        self.count = 0  # number of samples in the ring
+        self.low = 0  # smallest sample in the ring
+        self.hour, self.minute = cycle_clock.now[3:5]
+
+    def push(self, date_time, sample):
+        """
+        This method adds a sample to the ring, replacing the oldest one when it is full
+        :param date_time: Log date of the sample (YYYY/MM/DD HH:MM:SS)
+        :param sample: Reading scaled by the right digits
+        """
+        i = (self.newest + 1) % TSUNAMI_WINDOW
+        dropped = self.samples[i]
+        self.samples[i] = sample
+        self.times[i] = date_time
+        self.newest = i
+        if self.count < TSUNAMI_WINDOW:
+            self.count += 1
+            if self.count == 1 or sample < self.low:
+                self.low = sample
+        elif sample <= self.low:
+            self.low = sample
+        elif dropped == self.low:
+            self.low = min(self.samples)
+
+    def complete(self):
+        """
+        This method tells whether the ring holds a full window of samples logged since the tsunami window start
+        :return: True when the tsunami block can be sent
+        """
+        oldest = (self.newest + 1) % TSUNAMI_WINDOW
+        return self.count == TSUNAMI_WINDOW and self.times[oldest] >= cycle_clock.from_tsu
+
+    def series(self):
+        """
+        This method returns the readings of the window, newest first
+        :return: List of values scaled by the right digits, all MISSING_VALUE when the window is not complete
+        """
+        if not self.complete():
+            return [MISSING_VALUE] * TSUNAMI_WINDOW
+        return [self.samples[(self.newest - i) % TSUNAMI_WINDOW] for i in range(TSUNAMI_WINDOW)]
 
     def get_encoded_tsunami(self):
         """
         This method encodes tsunami data
-        :return: returns encoded data
+        :return: returns encoded data: hour, minute, offset and the samples newest first
+        """
+        if not self.complete():
+            return "???" + "??" * TSUNAMI_WINDOW
+        tsunami_offset = self.low // 250
+        base = tsunami_offset * 250
+        block = encode_many([self.samples[(self.newest - i) % TSUNAMI_WINDOW] - base for i in range(TSUNAMI_WINDOW)],
+                            2, False)
+        return pseudo_encoder(self.hour, 1) + pseudo_encoder(self.minute, 1, True) + \
+            pseudo_encoder(tsunami_offset, 1, True) + block
+
+    def read_log(self, log, from_date):
         """
-        if -99999.0 in (self.value, self.value2, self.value3, self.value4, self.value5, self.value6):
-            return "?", "?", "?", "??", "??", "??", "??", "??", "??"
-        value = round(self.value * 10 ** self.right_digits)
-        value2 = round(self.value2 * 10 ** self.right_digits)
-        value3 = round(self.value3 * 10 ** self.right_digits)
-        value4 = round(self.value4 * 10 ** self.right_digits)
-        value5 = round(self.value5 * 10 ** self.right_digits)
-        value6 = round(self.value6 * 10 ** self.right_digits)
-        tsunami_offset = min(value, value2, value3, value4, value5, value6) // 250
-        value = pseudo_encoder(value % 250 + (value // 250 - tsunami_offset) * 250, 2, True)
-        value2 = pseudo_encoder(value2 % 250 + (value2 // 250 - tsunami_offset) * 250, 2, True)
-        value3 = pseudo_encoder(value3 % 250 + (value3 // 250 - tsunami_offset) * 250, 2, True)
-        value4 = pseudo_encoder(value4 % 250 + (value4 // 250 - tsunami_offset) * 250, 2, True)
-        value5 = pseudo_encoder(value5 % 250 + (value5 // 250 - tsunami_offset) * 250, 2, True)
-        value6 = pseudo_encoder(value6 % 250 + (value6 // 250 - tsunami_offset) * 250, 2, True)
-        tsunami_hour = pseudo_encoder(self.hour, 1)
-        tsunami_minute = pseudo_encoder(self.minute, 1, True)
-        tsunami_offset = pseudo_encoder(tsunami_offset, 1, True)
-        return tsunami_hour, tsunami_minute, tsunami_offset, value, value2, value3, value4, value5, value6
-
-    def update_tsunami_data(self):
+        This method pushes the records logged since the last cycle to the ring
+        :param log: Log records of the cycle grouped by label (see fetch_log)
+        :param from_date: Start of the sensor window (YYYY/MM/DD HH:MM:SS)
+        :return: Number of new records
+        """
+        _ = from_date
+        if self.cursor > cycle_clock.to_date:  # the clock was set back
+            self.cursor = ""
+            self.count = 0
+            self.last = 0
+        new = log.get(self.label, ())
+        i = 0
+        while i < len(new) and new[i][0] > self.cursor:
+            i += 1
+        if i:
+            self.last = utime.mktime(get_log_date(new[0][0]))
+            right_digits = self.right_digits
+            for j in range(i - 1, -1, -1):
+                self.push(new[j][0], parse_fixed(new[j][1], right_digits))
+            self.cursor = new[0][0]
+        return i
+
+    @tracer.traced("update_tsunami_data", sensor_label)
+    def update_tsunami_data(self, log):
         """
         This method is used to update the tsunami data object with the most recent
         tsunami sensor data, date and time
-        :return: Most recent tsunami sensor data value, date and time
-        """
-        log = command_line("!LOG " + from_tsu + " " + to_date + " " + self.meas_number + " NY NH\r").strip()
-        command_line("!LOG " + from_tsu + " " + to_date + " " + self.meas_number + " NY NH\r").strip()
-        if log.count(self.label) > 5:
-            tsunami_log = log.split("\r\n")[-1].split(",")
-            self.hour = int((tsunami_log[1])[0:2])
-            self.minute = int((tsunami_log[1])[3:5])
-            self.value = round(float(tsunami_log[3]), self.right_digits)
-            self.value2 = round(float(log.split("\r\n")[-2].split(",")[3]), self.right_digits)
-            self.value3 = round(float(log.split("\r\n")[-3].split(",")[3]), self.right_digits)
-            self.value4 = round(float(log.split("\r\n")[-4].split(",")[3]), self.right_digits)
-            self.value5 = round(float(log.split("\r\n")[-5].split(",")[3]), self.right_digits)
-            self.value6 = round(float(log.split("\r\n")[-6].split(",")[3]), self.right_digits)
-            return self.value, self.value2, self.value3, self.value4, self.value5, self.value6
-        self.value = self.value2 = self.value3 = self.value4 = self.value5 = self.value6 = -99999.0
-        return self.value, self.value2, self.value3, self.value4, self.value5, self.value6
-
-
-def format_date_time(date_time):
-    """
-    This function changes the time and date format in a tuple to this -> (YYYY/MM/DD, HH:MM:SS)
-    :return: Date and time
+        :param log: Log records of the cycle grouped by label (see fetch_log)
+        :return: Most recent tsunami sensor data value, scaled by the right digits
+        """
+        self.read_log(log, cycle_clock.from_tsu)
+        if self.complete():
+            newest = self.times[self.newest]
+            self.hour = int(newest[11:13])
+            self.minute = int(newest[14:16])
+            self.value = self.samples[self.newest]
+        else:
+            self.value = MISSING_VALUE
+        return self.value
+
+
+def create_sensors():
+    """
+    This function creates the sensor objects of the active measurements from the configuration snapshot
+    :return: Sensor list, number of measurements that are not counts
     """
-    start_date = "{:04d}/{:02d}/{:02d}".format(date_time[0], date_time[1], date_time[2])
-    start_time = "{:02d}:{:02d}:{:02d}".format(date_time[3], date_time[4], date_time[5])
-    return start_date, start_time
+    sensors = []
+    count = 0
+    sensor_registry.clear()
+    for meas_number, label, _ in config_snapshot.measurements():
+        if label not in ("MWCOUNTS", "MWCOUNTS2", "AQTCOUNTS", "BWLCOUNTS"):
+            count += 1
+        if count == 1 or label in ("AQT", "BWL", "MWWL", "MWWL2"):
+            sensors.append(PrimarySensor(meas_number))
+        elif label in ("AQTWL", "MWTWL"):
+            sensors.append(TsunamiData(meas_number))
+        else:
+            sensors.append(SecondarySensor(meas_number))
+    return sensors, count
+
+
+def order_sensors(sensors):
+    """
+    This function orders the sensors with one keyed sort: the group of the first measurement first, then the
+    groups of GROUP_ORDER, each in member order. Sensors in no group (e.g. counts) are left out, except the first
+    :param sensors: Sensor list in measurement order
+    :return: Ordered sensor list, dictionary of group head label -> sensors of the group in member order
+    """
+    lead = sensors[0].label
+    lead_rank = SENSOR_KEYS[lead] // 8 if lead in GROUP_ORDER else None
+    keys = []
+    for i, sensor in enumerate(sensors):
+        key = SENSOR_KEYS.get(sensor.label)
+        if i == 0 and lead_rank is None:
+            key = -1
+        elif key is None:
+            continue
+        elif key // 8 == lead_rank:
+            key %= 8
+        keys.append(key * 64 + i)  # the index keeps equal labels in measurement order
+    keys.sort()
+    ordered = [sensors[k % 64] for k in keys]
+    groups = {}
+    for sensor in ordered:
+        head = GROUP_HEADS.get(sensor.label)
+        if head is not None:
+            groups.setdefault(head, []).append(sensor)
+    return ordered, groups
+
+
+class CycleClock:
+    def __init__(self):
+        """
+        This CycleClock class constructor creates the clock context of the cycles. start() reads the logger clock
+        once per cycle, and the sensors and formatters of the cycle take the time, the LOG windows and the Sutron
+        day from it instead of doing the time conversions again
+        """
+        self.epoch = 0
+        self.now = (1970, 1, 1, 0, 0, 0, 3, 1)  # broken down time, like utime.localtime()
+        self.to_date = ""  # end of the LOG window (YYYY/MM/DD HH:MM:SS)
+        self.from_pri = ""  # start of the primary, secondary and tsunami windows
+        self.from_sec = ""
+        self.from_tsu = ""
+        self.sutron_day = 0
+        self.log_times = {}  # (log date, shift) -> broken down time, for the cycle
+        self.stamp_epoch = None
+        self.stamp_text = None
+
+    def start(self):
+        """
+        This method starts a cycle: it reads the clock and works out the LOG windows
+        """
+        now = utime.localtime()
+        epoch = utime.mktime(now[0:6])
+        self.now = now
+        self.epoch = epoch
+        self.to_date = self.log_date(now)
+        self.from_pri = self.log_date(utime.localtime(epoch - 1300))
+        self.from_sec = self.log_date(utime.localtime(epoch - 850))
+        self.from_tsu = self.log_date(utime.localtime(epoch - 60 * TSUNAMI_WINDOW - 140))
+        self.sutron_day = sutron_day_calc(now[7], now[0])
+        self.log_times = {}
+
+    @staticmethod
+    def log_date(date_time):
+        """
+        This method formats a broken down time like the dates of the log records
+        :param date_time: (year, month, day, hour, minute, second, ...)
+        :return: YYYY/MM/DD HH:MM:SS
+        """
+        return "{:04d}/{:02d}/{:02d} {:02d}:{:02d}:{:02d}".format(date_time[0], date_time[1], date_time[2],
+                                                                 date_time[3], date_time[4], date_time[5])
+
+    def log_localtime(self, log_date, shift):
+        """
+        This method returns the broken down time of a log record date moved by shift seconds, converted once per
+        cycle
+        :param log_date: Log record date (YYYY/MM/DD HH:MM:SS)
+        :param shift: Seconds added to the date
+        :return: (year, month, day, hour, minute, second, weekday, yearday)
+        """
+        key = (log_date, shift)
+        date_time = self.log_times.get(key)
+        if date_time is None:
+            date_time = utime.localtime(utime.mktime(get_log_date(log_date)) + shift)
+            self.log_times[key] = date_time
+        return date_time
+
+    def stamp(self):
+        """
+        This method returns the current date and time as text, formatted once per second
+        :return: (YYYY/MM/DD, HH:MM:SS)
+        """
+        epoch = utime.time()
+        if epoch != self.stamp_epoch:
+            date_time = utime.localtime(epoch)
+            self.stamp_text = ("{:04d}/{:02d}/{:02d}".format(date_time[0], date_time[1], date_time[2]),
+                               "{:02d}:{:02d}:{:02d}".format(date_time[3], date_time[4], date_time[5]))
+            self.stamp_epoch = epoch
+        return self.stamp_text
+
+
+cycle_clock = CycleClock()
 
 
 def sl3_datetime():
@@ -305,272 +865,318 @@ def sl3_datetime():
     (YYYY/MM/DD, HH:MM:SS)
     :return: Date and time
     """
+    return cycle_clock.stamp()
 
-    sl3_date_time = utime.localtime()[0:6]
-    sl3_date = "{:04d}/{:02d}/{:02d}".format(sl3_date_time[0], sl3_date_time[1], sl3_date_time[2])
-    sl3_time = "{:02d}:{:02d}:{:02d}".format(sl3_date_time[3], sl3_date_time[4], sl3_date_time[5])
-    return sl3_date, sl3_time
+
+def format_fixed(value, right_digits, decimals, width):
+    """
+    This function renders a value scaled by the right digits with a number of decimals, right aligned, like
+    "{:>width.decimalsf}" renders the value as a float. Dropped digits are rounded half away from zero, and a negative
+    value that rounds to zero keeps its sign (e.g. -0.0). A missing value is rendered as -99999
+    :param value: Value scaled by the right digits
+    :param right_digits: Number of digits right of the decimal point of the value
+    :param decimals: Number of decimals rendered
+    :param width: Minimum width of the text
+    :return: Text
+    """
+    if value == MISSING_VALUE:
+        value = -99999 * 10 ** right_digits
+    negative = value < 0
+    value = -value if negative else value
+    if decimals < right_digits:
+        half = 10 ** (right_digits - decimals)
+        value = (value + half // 2) // half
+    else:
+        value *= 10 ** (decimals - right_digits)
+    text = str(value)
+    if decimals:
+        text = "0" * (decimals + 1 - len(text)) + text
+        text = text[:-decimals] + "." + text[-decimals:]
+    if negative:
+        text = "-" + text
+    return " " * (width - len(text)) + text
 
 
-def ports_tag_message_append(flag, val, typ):
+def ports_tag_message_append(flag, val, right_digits, typ):
+    """
+    This function formats the PORTS tag line(s) of a sensor group
+    :param flag: PORTS tag flag e.g. A1 1
+    :param val: Value or list of values scaled by the right digits
+    :param right_digits: Right digits of the value or list of right digits of the values
+    :param typ: PORTS tag format
+    :return: PORTS tag text
+    """
     msg = ""
     if typ == 1:
         msg += flag
-        if -99999.0 not in val[:3]:
-            msg += "{0}{1}{2}{3}{4}\r\n".format("{:>11.3f}".format(val[0]), "{:>9.3f}".format(val[1]),
-                                                "{:>10.0f}".format(val[2]), "{:>10.1f}".format(val[3]),
-                                                "{:>10.1f}".format(val[4]))
+        if MISSING_VALUE not in val[:3]:
+            msg += "{0}{1}{2}{3}{4}\r\n".format(format_fixed(val[0], right_digits[0], 3, 11),
+                                                format_fixed(val[1], right_digits[1], 3, 9),
+                                                format_fixed(val[2], right_digits[2], 0, 10),
+                                                format_fixed(val[3], right_digits[3], 1, 10),
+                                                format_fixed(val[4], right_digits[4], 1, 10))
         else:
             msg += "  Data flagged as bad or missing\r\n"
     elif typ == 2:
         msg += flag
-        if -99999.0 not in val:
-            msg += "{0}{1}{2}\r\n".format("{:>11.1f}".format(val[0]),
-                                          "{:>9.0f}".format(val[1]),
-                                          "{:>10.1f}".format(val[2]))
+        if MISSING_VALUE not in val:
+            msg += "{0}{1}{2}\r\n".format(format_fixed(val[0], right_digits[0], 1, 11),
+                                          format_fixed(val[1], right_digits[1], 0, 9),
+                                          format_fixed(val[2], right_digits[2], 1, 10))
         else:
             msg += "  Data flagged as bad or missing\r\n"
 
     elif typ == 3:
         msg += flag
-        if -99999.0 not in val:
-            msg += "{0}{1}{2}\r\n".format("{:>11.3f}".format(val[0]),
-                                          "{:>9.3f}".format(val[1]),
-                                          "{:>10.0f}".format(val[2]))
+        if MISSING_VALUE not in val:
+            msg += "{0}{1}{2}\r\n".format(format_fixed(val[0], right_digits[0], 3, 11),
+                                          format_fixed(val[1], right_digits[1], 3, 9),
+                                          format_fixed(val[2], right_digits[2], 0, 10))
         else:
             msg += "  Data flagged as bad or missing\r\n"
     elif typ == 4:
         msg += flag
-        msg += "{:>11.1f}\r\n".format(val) if val != -99999.0 else "  Data flagged as bad or missing\r\n"
+        msg += format_fixed(val, right_digits, 1, 11) + "\r\n" if val != MISSING_VALUE else \
+            "  Data flagged as bad or missing\r\n"
 
     elif typ == 5:
         msg += flag
-        msg += "{:>10.2f}\r\n".format(val) if val != -99999.0 else " Data flagged as bad or missing\r\n"
+        msg += format_fixed(val, right_digits, 2, 10) + "\r\n" if val != MISSING_VALUE else \
+            " Data flagged as bad or missing\r\n"
 
     elif typ == 6:
         msg += flag
-        msg += "{:>10.3f}".format(val) + "\r\n" if val != -99999.0 else " data not available\r\n"
+        msg += format_fixed(val, right_digits, 3, 10) + "\r\n" if val != MISSING_VALUE else " data not available\r\n"
 
     elif typ == 7:
         for v in val:
             msg += flag
-            msg += "{:>11.3f}".format(v) + "\r\n" if v != -99999.0 else " data not available\r\n"
+            msg += format_fixed(v, right_digits, 3, 11) + "\r\n" if v != MISSING_VALUE else " data not available\r\n"
     return msg
 
 
-def ports_tag_message_formatter():
+ports_file = PortsFile("p", open, uos)
+
+
+def build_message_snapshot():
     """
-    This function formats the data to a file for PORTS Tag transmission
+    This function builds the messages of the cycle from the sensors by executing the message plan. The GOES
+    segment and PORTS tag text of a group are only encoded again when a value of the group has changed
+    :return: (GOES message before the TX battery byte, GOES message after it or None when the message has no
+    battery group, PORTS tag text)
     """
-    global goes_msg
-    pri_sns = ""
-    pri_sns_check = ""
-    dat_sns_goes = ""
-    aqt_goes = aqt_temp = aqt_rtemp = aqt_std_temp = aqt_out_temp = aqt1_temp = aqt2_temp = ""
-    bwl_goes = bwl_temp = bwl_std_temp = bwl_out_temp = bwl_rtemp = ""
-    mw_goes = mw_temp = mw_std_temp = mw_out_temp = mw_rtemp = ""
-    mw_goes2 = mw_temp2 = mw_std_temp2 = mw_out_temp2 = mw_rtemp2 = ""
-    wind_goes = ws_temp = wd_temp = wg_temp = ""
-    wind_goes2 = ws_temp2 = wd_temp2 = wg_temp2 = ""
-    at_goes = wt_goes = ctwt_goes = baro_goes = bat_goes = batt_goes = cond_goes = tsu_goes = ""
-    aqt = []
-    mwwl1 = []
-    mwwl2 = []
-    wind1 = []
-    wind2 = []
-    bwl = []
-
-    station_id = command_line("!STATION NAME\r").strip()
-    pri_year = str("{:04d}".format(add_sns[0].year))
-    pri_month = str("{:02d}".format(add_sns[0].month))
-    pri_day = str("{:02d}".format(add_sns[0].day))
-    pri_date = ("{0}/{1}/{2}".format(pri_month, pri_day, pri_year))
-    pri_hour = str("{:02d}".format(add_sns[0].hour))
-    pri_minute = str("{:02d}".format(add_sns[0].minute))
-    pri_second = str("{:02d}".format(add_sns[0].second))
-    time_tag_goes = "0" + add_sns[0].get_encoded_sutron_day() + add_sns[0].get_encoded_hour()
-    min_goes = add_sns[0].get_encoded_minute()
-    sys_goes = "@@"
-    ports_tag_msg = "NOS {0} {1} {2}:{3}:{4}\r\n".format(station_id, pri_date, pri_hour, pri_minute, pri_second)
-    for a_s in add_sns:
-        if a_s.label in ("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"):
-            if a_s.label == "AQT":
-                if a_s.meas_number == str("M1"):
-                    pri_sns_check = a_s.label
-                aqt_temp = a_s.get_encoded_data()
-                aqt_rtemp = a_s.get_encoded_redundant_data()
-            if a_s.label == "AQTSTD":
-                aqt_std_temp = a_s.get_encoded_data()
-            if a_s.label == "AQTOUT":
-                aqt_out_temp = a_s.get_encoded_data()
-            if a_s.label == "AQT1":
-                aqt1_temp = a_s.get_encoded_data()
-            if a_s.label == "AQT2":
-                aqt2_temp = a_s.get_encoded_data()
-            aqt.append(a_s.value)
-            if len(aqt) == 5:
-                if pri_sns_check == "AQT":
-                    pri_sns += "1" + aqt_temp + aqt_std_temp + aqt_out_temp + aqt1_temp + aqt2_temp + ">" + aqt_rtemp
-                else:
-                    aqt_goes += "1" + aqt_temp + aqt_std_temp + aqt_out_temp + aqt1_temp + aqt2_temp + ">" + aqt_rtemp
-                ports_tag_msg += ports_tag_message_append("A1 1", aqt, 1)
-        elif a_s.label in ("WS", "WD", "WG"):
-            if a_s.label == "WS":
-                if a_s.meas_number == str("M1"):
-                    pri_sns_check = a_s.label
-                ws_temp = a_s.get_encoded_data()
-            if a_s.label == "WD":
-                wd_temp = a_s.get_encoded_data()
-            if a_s.label == "WG":
-                wg_temp = a_s.get_encoded_data()
-            wind1.append(a_s.value)
-            if len(wind1) == 3:
-                if pri_sns_check == "WS":
-                    pri_sns += "3" + ws_temp + wd_temp + wg_temp
-                else:
-                    wind_goes += "3" + ws_temp + wd_temp + wg_temp
-                ports_tag_msg += ports_tag_message_append("C1 3", wind1, 2)
-        elif a_s.label in ("WS2", "WD2", "WG2"):
-            if a_s.label == "WS2":
-                if a_s.meas_number == str("M1"):
-                    pri_sns_check = a_s.label
-                ws_temp2 = a_s.get_encoded_data()
-            if a_s.label == "WD2":
-                wd_temp2 = a_s.get_encoded_data()
-            if a_s.label == "WG2":
-                wg_temp2 = a_s.get_encoded_data()
-            wind2.append(a_s.value)
-            if len(wind2) == 3:
-                if pri_sns_check == "WS2":
-                    pri_sns += "3" + ws_temp2 + wd_temp2 + wg_temp2
-                else:
-                    wind_goes2 += "3" + ws_temp2 + wd_temp2 + wg_temp2
-                ports_tag_msg += ports_tag_message_append("C1 3", wind1, 2)
-
-        elif a_s.label in ("MWWL", "MWSTD", "MWOUT"):
-            if a_s.label == "MWWL":
-                if a_s.meas_number == str("M1"):
-                    pri_sns_check = a_s.label
-                mw_temp = a_s.get_encoded_data()
-                mw_rtemp = a_s.get_encoded_redundant_data()
-            if a_s.label == "MWSTD":
-                mw_std_temp = a_s.get_encoded_data()
-            if a_s.label == "MWOUT":
-                mw_out_temp = a_s.get_encoded_data()
-            mwwl1.append(a_s.value)
-            if len(mwwl1) == 3:
-                if pri_sns_check == "MWWL":
-                    pri_sns += "8" + mw_temp + mw_std_temp + mw_out_temp + "#" + mw_rtemp
-                else:
-
-                    mw_goes += "8" + mw_temp + mw_std_temp + mw_out_temp + "#" + mw_rtemp
-                ports_tag_msg += ports_tag_message_append("Y1 8", mwwl1, 3)
-
-        elif a_s.label in ("MWWL2", "MWSTD2", "MWOUT2"):
-            if a_s.label == "MWWL2":
-                if a_s.meas_number == str("M1"):
-                    pri_sns_check = a_s.label
-                mw_temp2 = a_s.get_encoded_data()
-                mw_rtemp2 = a_s.get_encoded_redundant_data()
-            if a_s.label == "MWSTD2":
-                mw_std_temp2 = a_s.get_encoded_data()
-            if a_s.label == "MWOUT2":
-                mw_out_temp2 = a_s.get_encoded_data()
-            mwwl2.append(a_s.value)
-            if len(mwwl2) == 3:
-                if pri_sns_check == "MWW2":
-                    pri_sns += "8" + mw_temp2 + mw_std_temp2 + mw_out_temp2 + "#" + mw_rtemp2
-                else:
-                    mw_goes2 += "8" + mw_temp2 + mw_std_temp2 + mw_out_temp2 + "#" + mw_rtemp2
-                ports_tag_msg += ports_tag_message_append("Y2 8", mwwl2, 3)
-
-        elif a_s.label in ("BWL", "BWLSTD", "BWLOUT"):
-            if a_s.label == "BWL":
-                if a_s.meas_number == str("M1"):
-                    pri_sns_check = a_s.label
-                bwl_temp = a_s.get_encoded_data()
-                bwl_rtemp = a_s.get_encoded_redundant_data()
-            if a_s.label == "BWLSTD":
-                bwl_std_temp = a_s.get_encoded_data()
-            if a_s.label == "BWLOUT":
-                bwl_out_temp = a_s.get_encoded_data()
-            bwl.append(a_s.value)
-            if len(bwl) == 3:
-                if pri_sns_check == "BWL":
-                    pri_sns += "2" + bwl_temp + bwl_std_temp + bwl_out_temp + '"' + bwl_rtemp
-                else:
-                    bwl_goes += "2" + bwl_temp + bwl_std_temp + bwl_out_temp + '"' + bwl_rtemp
-                ports_tag_msg += ports_tag_message_append("B1 2", bwl, 3)
-        elif a_s.label == "AT":
-            if a_s.meas_number == str("M1"):
-                pri_sns += "4" + a_s.get_encoded_data()
-            else:
-                at_goes += "4" + a_s.get_encoded_data()
-            ports_tag_msg += ports_tag_message_append("D1 4", a_s.value, 4)
-        elif a_s.label == "WT":
-            if a_s.meas_number == str("M1"):
-                pri_sns += "5" + a_s.get_encoded_data()
+    pri = add_sns[0]
+    values = sensor_registry.values
+    right_digits = sensor_registry.right_digits
+    dirty = sensor_registry.dirty
+    goes = [""] * GOES_BUCKETS
+    station_id = config_snapshot.station()
+    goes[HEADER_GOES] = "@@" + pri.get_encoded_minute() + "0" + pri.get_encoded_sutron_day() + pri.get_encoded_hour()
+    ports_tag_msg = ["NOS {0} {1:02d}/{2:02d}/{3:04d} {4:02d}:{5:02d}:{6:02d}\r\n".format(
+        station_id, pri.month, pri.day, pri.year, pri.hour, pri.minute, pri.second)]
+    for bucket, group_id, fields, redundant, suffix, flag, typ, ports, cache in message_plan:
+        if fields is None:
+            tsu = ports[0]
+            # the block only depends on the newest sample while the window is complete
+            key = tsu.times[tsu.newest] if tsu.complete() else ""
+            if key != cache[0]:
+                cache[0] = key
+                cache[1] = group_id + tsu.get_encoded_tsunami()
+                cache[2] = ports_tag_message_append(flag, tsu.series(), tsu.right_digits, typ)
+            goes[bucket] += cache[1]
+            ports_tag_msg.append(cache[2])
+            continue
+        stale = cache[0] is None
+        for p in ports:
+            if dirty[p]:
+                dirty[p] = 0
+                stale = True
+        if stale:
+            segment = group_id
+            for slot, byt, pos, offset, missing in fields:
+                segment += encode_data(values[slot], byt, pos, offset, missing)
+            if redundant is not None:
+                segment += redundant[0]
+                if redundant[1] is not None:
+                    segment += redundant[1].get_encoded_redundant_data()
+            cache[0] = True
+            cache[1] = segment + suffix
+            if typ < 4:
+                cache[2] = ports_tag_message_append(flag, [values[p] for p in ports], [right_digits[p] for p in ports],
+                                                    typ)
             else:
-                wt_goes += "5" + a_s.get_encoded_data()
-            ports_tag_msg += ports_tag_message_append("E1 5", a_s.value, 4)
-        elif a_s.label == "CTWT":
-            if a_s.meas_number == str("M1"):
-                pri_sns += "5" + a_s.get_encoded_data()
-            else:
-                ctwt_goes += "5" + a_s.get_encoded_data()
-            ports_tag_msg += ports_tag_message_append("E2 5", a_s.value, 4)
-        elif a_s.label == "BARO":
-            if a_s.meas_number == str("M1"):
-                pri_sns += "6" + a_s.get_encoded_data()
-            else:
-                baro_goes += "6" + a_s.get_encoded_data()
-            ports_tag_msg += ports_tag_message_append("F1 6", a_s.value, 4)
-        elif a_s.label == "BAT":
-            bat_goes += "<" + a_s.get_encoded_data() + " "
-            ports_tag_msg += ports_tag_message_append("L1 <", a_s.value, 4)
-        elif a_s.label == "BBAT":
-            batt_goes += "<" + a_s.get_encoded_data() + " "
-            ports_tag_msg += ports_tag_message_append("L1 <", a_s.value, 4)
-        elif a_s.label == "COND":
-            if a_s.meas_number == str("M1"):
-                pri_sns += "-7" + a_s.get_encoded_data()
-            else:
-                cond_goes += "-7" + a_s.get_encoded_data()
-            ports_tag_msg += ports_tag_message_append("G1 -7", a_s.value, 5)
-        elif a_s.label in "SNS":
-            dat_sns_goes = dat_sns_goes + a_s.get_encoded_data()
-            ports_tag_msg += ports_tag_message_append(a_s.label, a_s.value, 6)
-        elif a_s.label == "DAT":
-            ports_tag_msg += ports_tag_message_append(a_s.label, a_s.value, 6)
-            dat_sns_goes = a_s.get_encoded_data() + dat_sns_goes
-        elif a_s.label in ("AQTWL", "MWTWL"):
-            a_s.get_encoded_tsunami()
-            tsu = a_s.get_encoded_tsunami()
-            if pri_sns_check[:2] == a_s.label[:2]:
-                tsu_goes += "T" + tsu[0] + tsu[1] + tsu[2] + tsu[3] + tsu[4] + tsu[5] + tsu[6] + tsu[7] + tsu[8]
-                val = a_s.value, a_s.value2, a_s.value3, a_s.value4, a_s.value5, a_s.value6
-                ports_tag_msg += ports_tag_message_append("U1", val, 7)
-    goes_msg = "P{0}{1}{2}{3}{4}{5}{6}{7}{8}{9}{10}{11}{12}{13}{14}{15}{16}{17}{18}{19}".\
-        format(station_id, dat_sns_goes, sys_goes, min_goes, time_tag_goes, pri_sns, aqt_goes, mw_goes,
-               mw_goes2, wind_goes, wind_goes2, at_goes, wt_goes, ctwt_goes, baro_goes, cond_goes,
-               bat_goes, bwl_goes, batt_goes, tsu_goes)
-
-    ports_tag_msg += "\r\nREPORT COMPLETE\r\n"
-    with open("p", "w") as f:
-        f.write(ports_tag_msg)
-
-
-message_ready = True
-
-
-def sort_sns_list(list_item, list_label, old_list, new_list):
-    for lst in list_item:
+                cache[2] = ports_tag_message_append(flag, values[ports[0]], right_digits[ports[0]], typ)
+        goes[bucket] += cache[1]
+        ports_tag_msg.append(cache[2])
+    # the TX battery byte goes right after the last battery group. When both BAT and BBAT are sent, the space of
+    # the first one is dropped
+    if goes[BATT_GOES]:
+        if goes[BAT_GOES]:
+            goes[BAT_GOES] = goes[BAT_GOES][:-1]
+        head, tail = "P" + station_id + "".join(goes[:BATT_GOES + 1]), "".join(goes[BATT_GOES + 1:])
+    elif goes[BAT_GOES]:
+        head, tail = "P" + station_id + "".join(goes[:BAT_GOES + 1]), "".join(goes[BAT_GOES + 1:])
+    else:
+        head, tail = "P" + station_id + "".join(goes), None
+
+    ports_tag_msg.append("\r\nREPORT COMPLETE\r\n")
+    return head, tail, "".join(ports_tag_msg)
+
+
+@tracer.traced("ports_tag_message_formatter")
+def ports_tag_message_formatter():
+    """
+    This function builds the next message snapshot off to the side and publishes it with a single assignment, so
+    goes_message always reads a complete snapshot of one cycle and never the sensors being updated. The PORTS tag
+    file is then replaced from the same snapshot
+    """
+    global message_snapshot
+    snapshot = build_message_snapshot()
+    message_snapshot = snapshot
+    ports_file.write(snapshot[2])
+
+
+def file_date_sec(file_name):
+    """
+    This function returns the date of a dated file name (e.g. status2022.06.07.txt) in seconds
+    :param file_name: File name
+    :return: Seconds since the epoch or None if the name holds no date
+    """
+    try:
+        file_date = list(map(int, file_name.split("status")[1].split(".")[0:3]))
+    except (IndexError, ValueError):
+        return None
+    if len(file_date) < 3:
+        return None
+    file_date.extend([0, 0, 0])
+    return utime.mktime(tuple(file_date))
+
+
+class RetentionIndex:
+    def __init__(self, file_dir, max_days=1095):
+        """
+        This RetentionIndex class constructor creates the index of the dated files (statusYYYY.MM.DD.txt) of a
+        folder. The folder is listed once, the first time the index is needed, and the index is then kept up to
+        date as files are added and deleted
+        :param file_dir: Folder on the SD card e.g. status_log
+        :param max_days: Files older than this number of days are deleted
+        """
+        self.file_dir = file_dir
+        self.max_days = max_days
+        self.files = None  # sorted list of (file date in seconds, file name), oldest first
+        self.names = set()
+
+    def scan(self):
+        """
+        This method lists the folder once and parses the date of every file name
+        """
+        self.files = []
+        self.names = set()
+        for line in command_line("!file dir /sd/" + self.file_dir + "\r").strip().split("\r\n"):
+            parts = line.split()
+            if len(parts) > 3:
+                file_time_sec = file_date_sec(parts[3])
+                if file_time_sec is not None and parts[3] not in self.names:
+                    self.files.append((file_time_sec, parts[3]))
+                    self.names.add(parts[3])
+        self.files.sort()
+
+    def add(self, file_name):
+        """
+        This method adds a file to the index, e.g. when a new daily status file is created
+        :param file_name: File name
+        """
+        if self.files is None or file_name in self.names:
+            return
+        file_time_sec = file_date_sec(file_name)
+        if file_time_sec is None:
+            return
+        self.names.add(file_name)
+        self.files.append((file_time_sec, file_name))
+        if len(self.files) > 1 and file_time_sec < self.files[-2][0]:
+            self.files.sort()
+
+    def purge(self):
+        """
+        This method deletes all files of the index that are over max_days old in one pass
+        """
         try:
-            new_list.append(old_list.pop(list_label.index(lst)))
-            list_label.pop(list_label.index(lst))
-        except ValueError:
-            return list_item, old_list, new_list
-    return list_label, old_list, new_list
+            if self.files is None:
+                self.scan()
+        except OSError as e:
+            self.files = None
+            status_message(str(e))
+            return
+        sl3_time_sec = utime.mktime(utime.localtime()[0:6])
+        while self.files:
+            file_time_sec, file_name = self.files[0]
+            file_diff_day = round((sl3_time_sec - file_time_sec) / 86400)
+            file_diff_year = "{:.3f}".format(file_diff_day / 360)
+            if file_diff_day <= self.max_days:
+                msg = "The oldest file {0} is appx {1} years old. Files 3 years and older are deleted".format(
+                    file_name, file_diff_year)
+                status_message(msg)
+                return
+            response = command_line("!FILE DEL /SD/" + self.file_dir + "/" + file_name + "\r").strip()
+            msg = "{0}. It was {1} year(s) old which exceeds 3 years".format(response, file_diff_year)
+            status_message(msg)
+            self.files.pop(0)
+            self.names.discard(file_name)
+        status_message("No dated files left in /sd/" + self.file_dir)
+
+
+status_retention = RetentionIndex("status_log")
+
+
+class StatusLog:
+    def __init__(self):
+        """
+        This StatusLog class constructor creates the in memory queue of status records. Records are only written to
+        the daily status file by the flush() calls at the end of the tasks, never by write(), so callers (the
+        transmission function included) never wait for the SD card. The queue keeps every record until the next
+        flush, a few per task and two per transmission in between
+        """
+        self.queue = []
+        self.enabled = None  # cached GP1 state, None until read
+
+    def refresh(self):
+        """
+        This method reads the GP1 state that activates the status file
+        """
+        self.enabled = float(command_line("!gp1 value\r")) >= 1
+
+    def write(self, msg):
+        """
+        This method prints a status message and queues it for the status file when activated
+        :param msg: Status message
+        """
+        print(msg)
+        if self.enabled is None:
+            self.refresh()
+        if self.enabled:
+            sl3_date, sl3_time = sl3_datetime()
+            self.queue.append((sl3_date, "{0} {1}: {2}\r\n".format(sl3_date, sl3_time, msg)))
+
+    @tracer.traced("status_flush")
+    def flush(self):
+        """
+        This method appends the queued records to their daily status files, opening each file once
+        """
+        queue, self.queue = self.queue, []
+        i = 0
+        while i < len(queue):
+            sl3_date = queue[i][0]
+            j = i
+            while j < len(queue) and queue[j][0] == sl3_date:
+                j += 1
+            file_name = "status" + sl3_date.replace("/", ".") + ".txt"
+            with open("/sd/status_log/" + file_name, "a") as f:
+                f.write("".join(record[1] for record in queue[i:j]))
+            status_retention.add(file_name)
+            i = j
+
+
+status_log = StatusLog()
 
 
 def status_message(msg):
@@ -578,201 +1184,40 @@ def status_message(msg):
     This function updates the status file with status messages
     only when activated
     """
-    global message_ready
-    gp1_value = float(command_line("!gp1 value\r"))
-    if gp1_value >= 1:
-        count = 0
-        while True:
-            if message_ready:
-                message_ready = False
-                sl3_date, sl3_time = sl3_datetime()
-                with open("/sd/status_log/status" + sl3_datetime()[0].replace("/", ".") + ".txt", "a") as f:
-                    f.write("{0} {1}: {2}\r\n".format(sl3_date, sl3_time, msg))
-                message_ready = True
-                print(msg)
-                return
-            elif not message_ready:
-                count += 1
-                if count == 15:
-                    print(msg)
-                    return
-                utime.sleep(0.025)
-    else:
-        print(msg)
-        return
+    status_log.write(msg)
 
 
 command_line("!file mkdir /sd/status_log/\r")
 status_message("Initializing data...")
 
-to_date = utime.localtime()[0:6]
-from_pri = utime.localtime(utime.mktime(to_date) - 1300)[:6]
-from_sec = utime.localtime(utime.mktime(to_date) - 850)[:6]
-from_tsu = utime.localtime(utime.mktime(to_date) - 500)[:6]
-from_pri, from_sec, from_tsu = format_date_time(from_pri), format_date_time(from_sec), format_date_time(from_tsu)
-to_date = format_date_time(to_date)
-to_date = to_date[0] + " " + to_date[1]
-from_pri = from_pri[0] + " " + from_pri[1]
-from_sec = from_sec[0] + " " + from_sec[1]
-from_tsu = from_tsu[0] + " " + from_tsu[1]
-
-temp_sns = []
-temp_label = []
-add_sns = []
-cnt_meas = 0
-goes_msg = ""
-for s_n in range(32):
-    if command_line("!M" + str(s_n + 1) + " active\r").strip() == "On":
-        if command_line("!M" + str(s_n + 1) + " LABEL\r").strip() not in ("MWCOUNTS", "MWCOUNTS2", "AQTCOUNTS", "BWLCOUNTS"):
-            cnt_meas += 1
-        if cnt_meas == 1 or command_line("!M" + str(s_n + 1) + " LABEL\r").strip() in ("AQT", "BWL", "MWWL", "MWWL2"):
-            temp_sns.append(PrimarySensor("M" + str(s_n + 1)))
-        else:
-            if command_line("!M" + str(s_n + 1) + " LABEL\r").strip() in ("AQTWL", "MWTWL"):
-                temp_sns.append(TsunamiData("M" + str(s_n + 1)))
-            else:
-                temp_sns.append(SecondarySensor("M" + str(s_n + 1)))
-for t_s in temp_sns:
-    temp_label.append(t_s.label)
-
-if temp_label[0] == "AQT":
-    temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                  add_sns)
-elif temp_label[0] == "MWWL":
-    temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT"), temp_label, temp_sns, add_sns)
-
-elif temp_label[0] == "WS":
-    temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-else:
-    add_sns.append(temp_sns.pop(0))
-    temp_label.pop(0)
-if "AQT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                  add_sns)
-if "MWWL" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT"), temp_label, temp_sns, add_sns)
-if "MWWL2" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("MWWL2", "MWSTD2", "MWOUT2"), temp_label, temp_sns, add_sns)
-if "WS" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-if "WS2" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("WS2", "WD2", "WG2"), temp_label, temp_sns, add_sns)
-if "AT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["AT"], temp_label, temp_sns, add_sns)
-if "WT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["WT"], temp_label, temp_sns, add_sns)
-if "CTWT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["CTWT"], temp_label, temp_sns, add_sns)
-if "BARO" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["BARO"], temp_label, temp_sns, add_sns)
-if "COND" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["COND"], temp_label, temp_sns, add_sns)
-if "BAT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["BAT"], temp_label, temp_sns, add_sns)
-if "BWL" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(("BWL", "BWLSTD", "BWLOUT"), temp_label, temp_sns, add_sns)
-if "BBAT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["BBAT"], temp_label, temp_sns, add_sns)
-if "SNS" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["SNS"], temp_label, temp_sns, add_sns)
-if "DAT" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["DAT"], temp_label, temp_sns, add_sns)
-if "AQTWL" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["AQTWL"], temp_label, temp_sns, add_sns)
-if "MWTWL" in temp_label:
-    temp_label, temp_sns, add_sns = sort_sns_list(["MWTWL"], temp_label, temp_sns, add_sns)
+cycle_clock.start()
+# (GOES message before the TX battery byte, after it or None, PORTS tag text) of the last update, never modified
+message_snapshot = ("", None, "")
+temp_sns, cnt_meas = create_sensors()
+add_sns, sensor_groups = order_sensors(temp_sns)
 del temp_sns
-del temp_label
+message_plan = compile_message_plan(add_sns, sensor_groups)
 ports_tag_message_formatter()
 status_message("Initialization complete!")
+status_log.flush()
 
 
 def initialize_config():
-    global add_sns, cnt_meas, temp_sns, temp_label, goes_msg, from_pri, from_sec, from_tsu, to_date
-    to_date = utime.localtime()[0:6]
-    from_pri = utime.localtime(utime.mktime(to_date) - 1300)[:6]
-    from_sec = utime.localtime(utime.mktime(to_date) - 850)[:6]
-    from_tsu = utime.localtime(utime.mktime(to_date) - 500)[:6]
-    from_pri, from_sec, from_tsu = format_date_time(from_pri), format_date_time(from_sec), format_date_time(from_tsu)
-    to_date = format_date_time(to_date)
-    to_date = to_date[0] + " " + to_date[1]
-    from_pri = from_pri[0] + " " + from_pri[1]
-    from_sec = from_sec[0] + " " + from_sec[1]
-    from_tsu = from_tsu[0] + " " + from_tsu[1]
+    global add_sns, cnt_meas, sensor_groups, message_plan
+    cycle_clock.start()
 
     command_line("!file mkdir /sd/status_log/\r")
+    status_log.refresh()
     status_message("Initializing data...")
 
-    temp_sns = []
-    temp_label = []
-    add_sns = []
-    cnt_meas = 0
-
-    for i in range(32):
-        if command_line("!M" + str(i + 1) + " active\r").strip() == "On":
-            if command_line("!M" + str(i + 1) + " LABEL\r").strip() not in ("MWCOUNTS", "MWCOUNTS2", "AQTCOUNTS", "BWLCOUNTS"):
-                cnt_meas += 1
-            if cnt_meas == 1 or command_line("!M" + str(i + 1) + " LABEL\r").strip() in \
-                    ("AQT", "BWL", "MWWL", "MWWL2"):
-                temp_sns.append(PrimarySensor("M" + str(i + 1)))
-            else:
-                if command_line("!M" + str(i + 1) + " LABEL\r").strip() in ("AQTWL", "MWTWL"):
-                    temp_sns.append(TsunamiData("M" + str(i + 1)))
-                else:
-                    temp_sns.append(SecondarySensor("M" + str(i + 1)))
-    for i in temp_sns:
-        temp_label.append(i.label)
-
-    if temp_label[0] == "AQT":
-        temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                      add_sns)
-    elif temp_label[0] == "MWWL":
-        temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT"), temp_label, temp_sns, add_sns)
-
-    elif temp_label[0] == "WS":
-        temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-    else:
-        add_sns.append(temp_sns.pop(0))
-        temp_label.pop(0)
-    if "AQT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"), temp_label, temp_sns,
-                                                      add_sns)
-    if "MWWL" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("MWWL", "MWSTD", "MWOUT"), temp_label, temp_sns, add_sns)
-    if "MWWL2" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("MWWL2", "MWSTD2", "MWOUT2"), temp_label, temp_sns, add_sns)
-    if "WS" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("WS", "WD", "WG"), temp_label, temp_sns, add_sns)
-    if "WS2" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("WS2", "WD2", "WG2"), temp_label, temp_sns, add_sns)
-    if "AT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["AT"], temp_label, temp_sns, add_sns)
-    if "WT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["WT"], temp_label, temp_sns, add_sns)
-    if "CTWT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["CTWT"], temp_label, temp_sns, add_sns)
-    if "BARO" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["BARO"], temp_label, temp_sns, add_sns)
-    if "COND" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["COND"], temp_label, temp_sns, add_sns)
-    if "BAT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["BAT"], temp_label, temp_sns, add_sns)
-    if "BWL" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(("BWL", "BWLSTD", "BWLOUT"), temp_label, temp_sns, add_sns)
-    if "BBAT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["BBAT"], temp_label, temp_sns, add_sns)
-    if "SNS" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["SNS"], temp_label, temp_sns, add_sns)
-    if "DAT" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["DAT"], temp_label, temp_sns, add_sns)
-    if "AQTWL" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["AQTWL"], temp_label, temp_sns, add_sns)
-    if "MWTWL" in temp_label:
-        temp_label, temp_sns, add_sns = sort_sns_list(["MWTWL"], temp_label, temp_sns, add_sns)
+    config_snapshot.invalidate()
+    temp_sns, cnt_meas = create_sensors()
+    add_sns, sensor_groups = order_sensors(temp_sns)
     del temp_sns
-    del temp_label
+    message_plan = compile_message_plan(add_sns, sensor_groups)
     ports_tag_message_formatter()
     status_message("Initialization complete!")
+    status_log.flush()
 
 
 def file_deleter(file_dir):
@@ -782,55 +1227,29 @@ def file_deleter(file_dir):
     :param file_dir: File directory to be deleted
     :return: Deletes files that are over 3 years from current date
     """
-    count = 0
-    while count < 10:
-        try:
-            file_sample = command_line("!file dir /sd/" + file_dir + "\r").strip().split("\r\n")[0]
-            file_name = file_sample.split()[3]
-            file_date = file_sample.split("status")[1].split(".")[0:3]
-            file_date = list(map(int, file_date))
-            file_date.extend([0, 0, 0])
-            file_date = tuple(file_date)
-            sl3_date = utime.localtime()[0:6]
-            file_time_sec = utime.mktime(file_date)
-            sl3_time_sec = utime.mktime(sl3_date)
-            file_diff_day = round((sl3_time_sec - file_time_sec) / 86400)
-            file_diff_year = "{:.3f}".format(file_diff_day / 360)
-        except IndexError as e:
-            status_message(str(e))
-            break
-        except OSError as e:
-            status_message(str(e))
-            break
-        else:
-            if file_diff_day > 1095:
-                response = command_line("!FILE DEL /SD/" + file_dir + "/" + file_name + "\r").strip()
-                msg = "{0}. It was {1} year(s) old which exceeds 3 years".format(response, file_diff_year)
-                status_message(msg)
-            else:
-                msg = "The oldest file {0} is appx {1} years old. Files 3 years and older are deleted".format(
-                    file_name, file_diff_year)
-                status_message(msg)
-                break
-        count += 1
+    if file_dir == status_retention.file_dir:
+        status_retention.purge()
+    else:
+        RetentionIndex(file_dir).purge()
 
 
 def get_log_date(log):
     """
-    This function retrieves the date and time from a log string from a sensor
-    :param log: Log
+    This function retrieves the date and time from the date of a log record
+    :param log: Log record date (YYYY/MM/DD HH:MM:SS)
     :return: log_year, log_month, log_day, log_hour, log_minute, log_second
     """
-    log_year = int(log[0][6:10])
-    log_month = int((log[0])[0:2])
-    log_day = int((log[0])[3:5])
-    log_hour = int((log[1])[0:2])
-    log_minute = int((log[1])[3:5])
-    log_second = int((log[1])[6:8])
+    log_year = int(log[0:4])
+    log_month = int(log[5:7])
+    log_day = int(log[8:10])
+    log_hour = int(log[11:13])
+    log_minute = int(log[14:16])
+    log_second = int(log[17:19])
     return log_year, log_month, log_day, log_hour, log_minute, log_second
 
 
 @TASK
+@tracer.traced("delete_old_files")
 def delete_old_files():
     """
     This task checks the status_log folders and deletes the files that are over 3 years old.
@@ -838,9 +1257,11 @@ def delete_old_files():
     """
     status_message("Checking for old files to delete...")
     file_deleter("status_log")
+    status_log.flush()
 
 
 @TASK
+@tracer.traced("initialize_configuration")
 def initialize_configuration():
     """
     This task initializes the configuration
@@ -849,60 +1270,76 @@ def initialize_configuration():
 
 
 @TASK
+@tracer.traced("update_data")
 def update_data():
     """
-    This task updates the sensor objects
+    This task updates the sensor objects. Only the sensors that are due are read by the LOG command, which is
+    skipped when none is. The other sensors keep the records of earlier cycles
     """
-    global to_date, from_pri, from_sec, from_tsu
+    status_log.refresh()
     status_message("Updating all data...")
-    to_date = utime.localtime()[0:6]
-    from_pri = utime.localtime(utime.mktime(to_date) - 1300)[:6]
-    from_sec = utime.localtime(utime.mktime(to_date) - 850)[:6]
-    from_tsu = utime.localtime(utime.mktime(to_date) - 500)[:6]
-    from_pri, from_sec, from_tsu = format_date_time(from_pri), format_date_time(from_sec), format_date_time(from_tsu)
-    to_date = format_date_time(to_date)
-    to_date = to_date[0] + " " + to_date[1]
-    from_pri = from_pri[0] + " " + from_pri[1]
-    from_sec = from_sec[0] + " " + from_sec[1]
-    from_tsu = from_tsu[0] + " " + from_tsu[1]
+    cycle_clock.start()
+    due = []
+    wanted = {}
+    for i in range(cnt_meas):
+        if add_sns[i].due(cycle_clock.epoch):
+            due.append(add_sns[i])
+            wanted[add_sns[i].label] = add_sns[i].keep
+    if due:
+        log = fetch_log(log_start(due, min(cycle_clock.from_pri, cycle_clock.from_tsu)),
+                        cycle_clock.to_date, wanted)
+        for sensor in due:
+            sensor.checked = cycle_clock.epoch
+    else:
+        log = {}
     for i in range(cnt_meas):
         if i == 0 or add_sns[i].label in ("AQT", "BWL", "MWWL", "MWWL2"):
-            add_sns[i].update_primary_data()
+            add_sns[i].update_primary_data(log)
         else:
             if add_sns[i].label in ("AQTWL", "MWTWL"):
-                add_sns[i].update_tsunami_data()
+                add_sns[i].update_tsunami_data(log)
             else:
-                add_sns[i].update_secondary_data()
+                add_sns[i].update_secondary_data(log)
     ports_tag_message_formatter()
     status_message("Updates successful!")
+    status_log.flush()
 
 
 @TXFORMAT
+@tracer.traced("goes_message")
 def goes_message(standard):
     """
-    This transmission function returns the GOES message for transmission
+    This transmission function returns the GOES message for transmission. It only reads the message snapshot
+    published by the last update and adds the TX battery byte
     """
     status_message("Transmitting GOES message...")
     _ = standard  # neatly discards the input from sensor because it's not needed
-    good_goes_message = goes_msg
-    tx_battery = float(command_line("!BATT\r").strip())
-    if tx_battery < 9.5:
-        tx_battery = 9.5
-    tx_battery = round((tx_battery - 9.5) * 10)
-    tx_battery = pseudo_encoder(tx_battery, 1, True)
-    idx = good_goes_message.rfind(" ")
-    cnt = good_goes_message.count(" ")
-    if idx == -1:
-        pass
+    head, tail, _ = message_snapshot
+    if tail is None:
+        good_goes_message = head
     else:
-        good_goes_message = good_goes_message[:idx + 1] + tx_battery + good_goes_message[idx + 1:]
-        if cnt == 2:
-            good_goes_message = good_goes_message.replace(" ", "", 1)
+        tx_battery = float(command_line("!BATT\r").strip())
+        if tx_battery < 9.5:
+            tx_battery = 9.5
+        tx_battery = round((tx_battery - 9.5) * 10)
+        good_goes_message = head + pseudo_encoder(tx_battery, 1, True) + tail
     status_message("GOES transmission successful!")
 
     return good_goes_message
 
 
+@TASK
+def dump_trace():
+    """
+    This task writes the spans kept by the tracer to TRACE_FILE, when tracing is enabled
+    """
+    if tracer.size:
+        with open(TRACE_FILE, "w") as f:
+            count = tracer.write(f)
+        status_message("{0} trace spans written to {1}".format(count, TRACE_FILE))
+        status_log.flush()
+
+
 @MEASUREMENT
 def mwwl(standard):
     _ = standard  # neatly discards the input from sensor because it's not needed
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+PORTS tag file writer shared by the Satlink 3 scripts.
+
+The report is written to a temporary file that is renamed over the PORTS tag file, so a reader never sees a half
+written report, and nothing is written when the report has not changed since the last write. The file functions are
+passed in by the script (its open() and uos module), so the same class runs on the logger and on sl3emu.
+"""
+
+
+class PortsFile:
+    def __init__(self, path, opener, fs):
+        """
+        This PortsFile class constructor creates the writer of the PORTS tag file
+        :param path: File path
+        :param opener: open() of the script
+        :param fs: uos module of the script (rename and remove)
+        """
+        self.path = path
+        self.temp_path = path + ".tmp"
+        self.opener = opener
+        self.fs = fs
+        self.text = None  # content of the last write, None until the first one
+
+    def write(self, text):
+        """
+        This method replaces the file with text, unless text is the same as last time
+        :param text: File content
+        :return: True when the file was written
+        """
+        if text == self.text:
+            return False
+        with self.opener(self.temp_path, "w") as f:
+            f.write(text)
+        try:
+            self.fs.rename(self.temp_path, self.path)
+        except OSError:  # the file system does not rename over an existing file
+            self.fs.remove(self.path)
+            self.fs.rename(self.temp_path, self.path)
+        self.text = text
+        return True
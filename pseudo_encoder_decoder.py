@@ -1,3 +1,6 @@
+from pseudobinary import pseudo_encoder
+
+
 def decimal_to_binary(n):
     bi_num = bin(abs(n)).replace("0b", "")
     bi_len = len(bi_num)
@@ -35,51 +38,6 @@ def pseudo_decoder(pse_val, rn, pos=False):
         return bi_val * 10 ** -rn
 
 
-def pseudo_encoder(int_val, byt):
-    """
-    Pseudobinary encoder function converts binary number from -131072 to 131071
-    :param int_val: Decimal number
-    :param byt: Number of bytes (1,2 or 3)
-    :return: Pseudobinary b format
-    """
-    int_val = int(str(int_val).replace(".", ""))
-    iv = 0
-    if int_val < 0:
-        if byt == 1 and int_val < -31:
-            return "`"
-        if byt == 2 and int_val < -2047:
-            return "`@"
-        if byt == 3 and int_val < -131071:
-            return "`@@"
-        # Call decimal_to_binary Function
-        bi_num = decimal_to_binary(int_val)
-        bi_str = ""
-        for bit in bi_num:
-            if bit == "1":
-                bi_str += "0"
-            else:
-                bi_str += "1"
-        iv = int(bi_str, 2) + 1
-    if int_val >= 0:
-        if byt == 1 and int_val > 30:
-            return "_"
-        if byt == 2 and int_val > 2046:
-            return "_?"
-        if byt == 3 and int_val > 131070:
-            return "_??"
-        iv = int_val
-    bi_array = [iv >> 12, (iv >> 6) & 63, iv & 63]
-    for i in range(3):
-        if bi_array[i] != int(63):
-            bi_array[i] += 64
-    if byt == 1:
-        return chr(bi_array[2])
-    elif byt == 2:
-        return chr(bi_array[1]) + chr(bi_array[2])
-    elif byt == 3:
-        return chr(bi_array[0]) + chr(bi_array[1]) + chr(bi_array[2])
-
-
 j = -99999
 enc = pseudo_encoder(j, 2)
 dec = pseudo_decoder("", 0)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Pseudobinary (b format) encoder and decoder shared by the Satlink 3 scripts and the host side tools.
+
+Each 6 bit group is sent as a printable character: 63 stays "?", every other group is offset by 64.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # the Satlink 3 has no numpy, only decode_array needs it
+    np = None
+
+# 6 bit group -> character code
+_DIGITS = bytes([g if g == 63 else g + 64 for g in range(64)])
+# 1 byte lookup table, indexed by 6 bit pattern
+_ONE_BYTE = tuple(chr(d) for d in _DIGITS)
+# 2 byte lookup table, indexed by 12 bit pattern
+_TWO_BYTE = tuple(_ONE_BYTE[p >> 6] + _ONE_BYTE[p & 63] for p in range(4096))
+_MASK = (0, 63, 4095, 262143)
+
+# (lowest value, highest value, value below range, value above range) indexed by [pos][byt]
+_LIMITS = (
+    (None, (-31, 30, "`", "_"), (-2047, 2046, "`@", "_?"), (-131071, 131070, "`@@", "_??")),
+    (None, (0, 62, "`", "?"), (0, 4094, "`@", "??"), (0, 262142, "`@@", "???")),
+)
+
+
+def pseudo_encoder(int_val, byt, pos=False):
+    """
+    Pseudobinary encoder function converts binary number from -131072 to 131071
+    :param int_val: Decimal number
+    :param byt: Number of bytes (1,2 or 3)
+    :param pos: Positive only is True
+    :return: Pseudobinary b format
+    """
+    if not isinstance(int_val, int):
+        int_val = int(str(int_val).replace(".", ""))
+    low, high, under, over = _LIMITS[pos][byt]
+    if int_val < low:
+        return under
+    if int_val > high:
+        return over
+    int_val &= _MASK[byt]
+    if byt == 1:
+        return _ONE_BYTE[int_val]
+    if byt == 2:
+        return _TWO_BYTE[int_val]
+    return _ONE_BYTE[int_val >> 12] + _TWO_BYTE[int_val & 4095]
+
+
+def encode_many(values, widths, signed=True):
+    """
+    This function encodes a whole sensor vector in one pass. The result is the same as joining
+    pseudo_encoder(value, width, not signed) for every value
+    :param values: Decimal numbers
+    :param widths: Number of bytes (1,2 or 3) for every value, or one number of bytes for all of them
+    :param signed: Signed is True, positive only is False. One flag for every value or one flag for all of them
+    :return: Pseudobinary b format
+    """
+    count = len(values)
+    if isinstance(widths, int):
+        widths = (widths,) * count
+    if signed is True or signed is False:
+        signed = (signed,) * count
+    digits = _DIGITS
+    out = bytearray()
+    for i in range(count):
+        int_val = values[i]
+        if not isinstance(int_val, int):
+            int_val = int(str(int_val).replace(".", ""))
+        byt = widths[i]
+        low, high, under, over = _LIMITS[not signed[i]][byt]
+        if int_val < low:
+            out.extend(under.encode())
+        elif int_val > high:
+            out.extend(over.encode())
+        else:
+            int_val &= _MASK[byt]
+            if byt == 3:
+                out.append(digits[int_val >> 12])
+            if byt > 1:
+                out.append(digits[(int_val >> 6) & 63])
+            out.append(digits[int_val & 63])
+    return out.decode()
+
+
+def decode_array(buffer, width, signed=True, right_digits=0, under_range=False):
+    """
+    This function decodes a slab of fixed width pseudobinary fields in one go. Fields holding characters that are
+    not pseudobinary (e.g. "///"), the all "?" missing/saturated value and, for signed fields, the "_??" and "`@@"
+    saturation values come back as NaN. For positive only fields "`@@" is a valid reading (131072) unless the caller
+    marks it as the under range value pseudo_encoder() sends for a negative reading
+    :param buffer: bytes, bytearray, memoryview or numpy array (uint8 or fixed width bytes) holding the fields
+    :param width: Number of bytes (1,2 or 3) of each field
+    :param signed: Signed is True, positive only is False
+    :param right_digits: Number of digits right of the decimal point
+    :param under_range: Positive only fields decode "`@@" ("`@", "`") as NaN
+    :return: float64 numpy array with one value per field
+    """
+    if np is None:
+        raise ImportError("decode_array requires numpy")
+    if isinstance(buffer, np.ndarray):
+        raw = np.ascontiguousarray(buffer)
+        raw = raw.view(np.uint8) if raw.dtype.kind == "S" else raw.astype(np.uint8, copy=False)
+    else:
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+    if raw.size % width:
+        raise ValueError("buffer length {0} is not a multiple of the field width {1}".format(raw.size, width))
+    raw = raw.reshape(-1, width)
+    digits = np.where(raw == 63, 63, raw.astype(np.int64) - 64)
+    values = digits[:, 0]
+    for k in range(1, width):
+        values = (values << 6) | digits[:, k]
+    bad = ((raw < 63) | (raw > 127)).any(axis=1) | (raw == 63).all(axis=1)
+    if signed:
+        half = 1 << (6 * width - 1)
+        values = np.where(values >= half, values - 2 * half, values)
+        bad |= (values == half - 1) | (values == -half)
+    elif under_range:
+        bad |= values == 1 << (6 * width - 1)
+    result = values * 10.0 ** -right_digits
+    result[bad] = np.nan
+    return result
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+Host side stand-in for the Satlink 3 sl3 module, so the logger scripts can run, be profiled and benchmarked off the
+logger. It provides command_line, utime, urandom, uos, open and the TASK/TXFORMAT/MEASUREMENT decorators, backed by a
+scriptable measurement table, an in memory log and a virtual clock:
+
+    logger = Logger(station="8422")
+    logger.add_measurement("MWWL", right_digits=3, interval=60, source=lambda t: 4.0)
+    logger.advance(1800)  # half an hour of readings before the script starts
+    script = logger.load("mwwl8422.py")
+    logger.run(days=2, tasks={"update_data": 360})
+    message = logger.transmit()
+"""
+
+from sl3emu.clock import VirtualClock
+from sl3emu.logger import Logger, Measurement
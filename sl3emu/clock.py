@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Virtual clock behind the emulated utime module. Time only moves when the emulator advances it (or a script
+sleeps), so days of logger cycles run in seconds.
+"""
+
+import calendar
+import time
+
+
+class VirtualClock:
+    def __init__(self, start=None):
+        """
+        This VirtualClock class constructor sets the clock to start
+        :param start: Seconds since 1970/01/01, defaults to the host time rounded down to the minute
+        """
+        if start is None:
+            start = int(time.time()) // 60 * 60
+        self.start = float(start)
+        self.now = float(start)
+
+    def time(self):
+        """
+        This method returns the current time in whole seconds, like utime.time()
+        :return: Seconds since 1970/01/01
+        """
+        return int(self.now)
+
+    def advance(self, seconds):
+        """
+        This method moves the clock forward
+        :param seconds: Number of seconds
+        """
+        self.now += seconds
+
+    def localtime(self, secs=None):
+        """
+        This method returns the broken down time like the MicroPython utime.localtime()
+        :param secs: Seconds since 1970/01/01, defaults to now
+        :return: (year, month, day, hour, minute, second, weekday, yearday)
+        """
+        tm = time.gmtime(int(self.now if secs is None else secs))
+        return tm.tm_year, tm.tm_mon, tm.tm_mday, tm.tm_hour, tm.tm_min, tm.tm_sec, tm.tm_wday, tm.tm_yday
+
+    @staticmethod
+    def mktime(date_time):
+        """
+        This method is the inverse of localtime, only the first 6 items are used
+        :param date_time: (year, month, day, hour, minute, second, ...)
+        :return: Seconds since 1970/01/01
+        """
+        return calendar.timegm(tuple(date_time[:6]) + (0, 0, 0))
+
+    def ticks_ms(self):
+        """
+        This method returns the milliseconds elapsed on the clock since it was created
+        :return: Milliseconds
+        """
+        return int((self.now - self.start) * 1000)
+
+    def ticks_us(self):
+        """
+        This method returns the microseconds elapsed on the clock since it was created
+        :return: Microseconds
+        """
+        return int((self.now - self.start) * 1000000)
+
+    def sleep(self, seconds):
+        """
+        This method sleeps by moving the clock forward, it returns immediately
+        :param seconds: Number of seconds
+        """
+        self.advance(seconds)
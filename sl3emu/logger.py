@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""
+Emulated Satlink 3: measurement table, log store, SD card and the command_line interpreter used by the scripts.
+"""
+
+import bisect
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+from sl3emu.clock import VirtualClock
+
+
+class Measurement:
+    def __init__(self, label, right_digits=2, interval=360, offset=0, source=0.0, units="", active=True):
+        """
+        This Measurement class constructor creates one row of the measurement setup
+        :param label: Measurement label e.g. MWWL
+        :param right_digits: Number of digits right of the decimal point
+        :param interval: Measurement interval in seconds
+        :param offset: Measurement time offset in seconds
+        :param source: Value of the readings: a number, a function of the measurement time returning the value (None
+        logs nothing, i.e. a missing reading) or the name of a MEASUREMENT function of the loaded script
+        :param units: Units logged with the readings
+        :param active: Measurement is On
+        """
+        self.label = label
+        self.right_digits = right_digits
+        self.interval = interval
+        self.offset = offset
+        self.source = source
+        self.units = units
+        self.active = active
+        self.due = None  # time of the next reading
+
+
+class Logger:
+    def __init__(self, station="SL3EMU", start=None, root=None, seed=0, battery=12.5, gp1=0, command_latency=0.0,
+                 write_latency=0.0, host_ticks=False):
+        """
+        This Logger class constructor creates an emulated Satlink 3
+        :param station: Station name
+        :param start: Seconds since 1970/01/01 the virtual clock starts at
+        :param root: Host folder holding the logger flash and the SD card (root/sd), defaults to a temp folder
+        :param seed: Seed of the emulated urandom module
+        :param battery: Battery voltage answered to !BATT
+        :param gp1: Value of the general purpose variable GP1 (status file switch of the scripts)
+        :param command_latency: Host seconds every command_line call takes, to model the logger interpreter
+        :param write_latency: Host seconds every file opened for writing takes, to model the SD card
+        :param host_ticks: utime.ticks_ms/ticks_us count host time instead of the virtual clock, for tracing
+        """
+        self.station = station
+        self.clock = VirtualClock(start)
+        self.root = root or tempfile.mkdtemp(prefix="sl3emu_")
+        self.random = random.Random(seed)
+        self.battery = battery
+        self.gp1 = gp1
+        self.measurements = {}  # slot (1 to 32) -> Measurement
+        self.times = []  # time of every log record, in order
+        self.records = []  # (slot, label, value text, units, quality), same order as times
+        self.tasks = {}
+        self.txformats = {}
+        self.meas_functions = {}
+        self.commands = 0
+        self.command_counts = {}
+        self.truncated = 0  # responses cut to the buffer size
+        self.bytes_written = 0
+        self.files_written = 0
+        self.command_latency = command_latency
+        self.write_latency = write_latency
+        self.host_ticks = host_ticks
+        self.script = None
+
+    # measurement setup and log store
+
+    def add_measurement(self, label, slot=None, **kwargs):
+        """
+        This method adds a measurement to the setup
+        :param label: Measurement label
+        :param slot: Measurement number (1 to 32), defaults to the next free one
+        :param kwargs: Measurement arguments (right_digits, interval, offset, source, units, active)
+        :return: Measurement number
+        """
+        if slot is None:
+            slot = 1
+            while slot in self.measurements:
+                slot += 1
+        if not 1 <= slot <= 32:
+            raise ValueError("measurement number {0} is not between 1 and 32".format(slot))
+        self.measurements[slot] = Measurement(label, **kwargs)
+        return slot
+
+    def log(self, slot, value, secs=None, quality="G"):
+        """
+        This method adds a record to the log
+        :param slot: Measurement number
+        :param value: Value
+        :param secs: Record time, defaults to now
+        :param quality: Quality flag
+        """
+        meas = self.measurements[slot]
+        secs = self.clock.time() if secs is None else int(secs)
+        i = bisect.bisect_right(self.times, secs)
+        self.times.insert(i, secs)
+        self.records.insert(i, (slot, meas.label, "{0:.{1}f}".format(value, meas.right_digits), meas.units, quality))
+
+    def measure(self, slot, secs):
+        """
+        This method takes the reading of a measurement and logs it
+        :param slot: Measurement number
+        :param secs: Measurement time
+        """
+        meas = self.measurements[slot]
+        source = meas.source
+        if isinstance(source, str):
+            value = self.meas_functions[source](0.0)
+        elif callable(source):
+            value = source(secs)
+        else:
+            value = source
+        if value is not None:
+            self.log(slot, value, secs)
+
+    def advance(self, seconds):
+        """
+        This method moves the virtual clock forward, taking every reading that falls due on the way
+        :param seconds: Number of seconds
+        """
+        end = self.clock.now + seconds
+        while True:
+            due = None
+            for slot in sorted(self.measurements):
+                meas = self.measurements[slot]
+                if not meas.active:
+                    continue
+                if meas.due is None:
+                    meas.due = (int(self.clock.now) - meas.offset) // meas.interval * meas.interval + meas.offset
+                    if meas.due < self.clock.now:
+                        meas.due += meas.interval
+                if meas.due <= end and (due is None or meas.due < due):
+                    due = meas.due
+            if due is None:
+                break
+            self.clock.now = max(self.clock.now, due)
+            for slot in sorted(self.measurements):
+                meas = self.measurements[slot]
+                if meas.active and meas.due == due:
+                    self.measure(slot, due)
+                    meas.due += meas.interval
+        self.clock.now = max(self.clock.now, end)
+
+    def run(self, seconds=0, days=0, tasks=None):
+        """
+        This method runs the logger: readings are taken as they fall due and the TASK functions of the script are
+        called on their schedule, after the readings of the same second
+        :param seconds: Number of seconds to run
+        :param days: Number of days to run, added to seconds
+        :param tasks: Dictionary of task name -> interval in seconds or (interval, offset)
+        :return: Number of task calls
+        """
+        end = self.clock.now + seconds + days * 86400
+        schedule = []
+        for name, interval in (tasks or {}).items():
+            offset = 0
+            if isinstance(interval, tuple):
+                interval, offset = interval
+            due = (int(self.clock.now) - offset) // interval * interval + offset
+            if due <= self.clock.now:
+                due += interval
+            schedule.append([due, name, interval])
+        calls = 0
+        while schedule:
+            schedule.sort()
+            due, name, interval = schedule[0]
+            if due > end:
+                break
+            self.advance(due - self.clock.now)
+            self.tasks[name]()
+            calls += 1
+            schedule[0][0] += interval
+        self.advance(end - self.clock.now)
+        return calls
+
+    def transmit(self, name=None):
+        """
+        This method calls a TXFORMAT function of the script like a transmission would
+        :param name: Function name, defaults to the only one
+        :return: Formatted message
+        """
+        if name is None:
+            name, = self.txformats
+        return self.txformats[name]("")
+
+    # command line
+
+    def command_line(self, cmd, buf_size=512):
+        """
+        This method answers the Satlink 3 commands used by the scripts. Like on the logger, the response is cut
+        to the size of the response buffer
+        :param cmd: Command e.g. "!M1 LABEL\\r"
+        :param buf_size: Response buffer size in bytes
+        :return: Response text, at most buf_size characters
+        """
+        self.commands += 1
+        if self.command_latency:
+            time.sleep(self.command_latency)
+        response = self.answer(cmd)
+        if len(response) > buf_size:
+            self.truncated += 1
+        return response[:buf_size]
+
+    def answer(self, cmd):
+        """
+        This method returns the full response to a command, see command_line
+        """
+        words = cmd.strip().split()
+        if not words:
+            return ""
+        verb = words[0].upper().lstrip("!")
+        if verb[:1] == "M" and verb[1:].isdigit():
+            self.command_counts["M"] = self.command_counts.get("M", 0) + 1
+            return self.measurement_command(int(verb[1:]), " ".join(words[1:]).upper())
+        self.command_counts[verb] = self.command_counts.get(verb, 0) + 1
+        if verb == "LOG":
+            return self.log_command(words[1:])
+        if verb == "STATION" and len(words) > 1 and words[1].upper() == "NAME":
+            return self.station + "\r\n"
+        if verb == "BATT":
+            return "{0:.2f}\r\n".format(self.battery)
+        if verb == "GP1":
+            return "{0}\r\n".format(self.gp1)
+        if verb == "FILE" and len(words) > 2:
+            return self.file_command(words[1].upper(), words[2])
+        return "Unknown command\r\n"
+
+    def measurement_command(self, slot, setting):
+        """
+        This method answers !Mn ACTIVE, !Mn LABEL, !Mn RIGHT DIGITS, !Mn MEAS INTERVAL and !Mn MEAS TIME
+        """
+        meas = self.measurements.get(slot)
+        if setting == "ACTIVE":
+            return ("On" if meas is not None and meas.active else "Off") + "\r\n"
+        if setting == "LABEL":
+            return (meas.label if meas is not None else "Sense{0:02d}".format(slot)) + "\r\n"
+        if setting == "RIGHT DIGITS":
+            return "{0}\r\n".format(meas.right_digits if meas is not None else 2)
+        if setting in ("MEAS INTERVAL", "MEAS TIME"):
+            secs = 0 if meas is None else meas.interval if setting == "MEAS INTERVAL" else meas.offset
+            return "{0:02d}:{1:02d}:{2:02d}\r\n".format(secs // 3600, secs // 60 % 60, secs % 60)
+        return "Unknown setting\r\n"
+
+    def log_command(self, args):
+        """
+        This method answers !LOG <from date> <from time> <to date> <to time> [Mn ...] [options] and
+        !LOG <days> [Mn ...] [options] with MM/DD/YYYY,HH:MM:SS,label,value,units,quality records
+        """
+        now = self.clock.time()
+        if len(args) >= 4 and "/" in args[0] and "/" in args[2]:
+            start, end = parse_date(args[0], args[1]), parse_date(args[2], args[3])
+            args = args[4:]
+        elif args and args[0].replace(".", "", 1).isdigit():
+            start, end = now - int(float(args[0]) * 86400), now
+            args = args[1:]
+        else:
+            start, end = 0, now
+        slots = set(int(a[1:]) for a in args if a[:1].upper() == "M" and a[1:].isdigit())
+        lines = []
+        for i in range(bisect.bisect_left(self.times, start), bisect.bisect_right(self.times, end)):
+            slot, label, value, units, quality = self.records[i]
+            if slots and slot not in slots:
+                continue
+            tm = self.clock.localtime(self.times[i])
+            lines.append("{0:02d}/{1:02d}/{2:04d},{3:02d}:{4:02d}:{5:02d},{6},{7},{8},{9}".format(
+                tm[1], tm[2], tm[0], tm[3], tm[4], tm[5], label, value, units, quality))
+        return "\r\n".join(lines) + "\r\n" if lines else ""
+
+    def file_command(self, action, path):
+        """
+        This method answers !FILE MKDIR, !FILE DEL and !FILE DIR on the emulated SD card
+        """
+        host = self.host_path(path)
+        if action == "MKDIR":
+            os.makedirs(host, exist_ok=True)
+            return "Directory created\r\n"
+        if action == "DEL":
+            try:
+                os.remove(host)
+            except OSError:
+                return "File not found {0}\r\n".format(path)
+            return "File deleted {0}\r\n".format(path)
+        if action == "DIR":
+            try:
+                names = sorted(os.listdir(host))
+            except OSError:
+                return "Directory not found {0}\r\n".format(path)
+            lines = []
+            for name in names:
+                stat = os.stat(os.path.join(host, name))
+                tm = self.clock.localtime(stat.st_mtime)
+                lines.append("{0:04d}/{1:02d}/{2:02d} {3:02d}:{4:02d}:{5:02d} {6:>10} {7}".format(
+                    tm[0], tm[1], tm[2], tm[3], tm[4], tm[5], stat.st_size, name))
+            return "\r\n".join(lines) + "\r\n"
+        return "Unknown command\r\n"
+
+    # flash and SD card
+
+    def host_path(self, path):
+        """
+        This method maps a logger path to the host: /sd/... goes to root/sd/..., anything else to the root folder
+        :param path: Logger path
+        :return: Host path
+        """
+        parts = [p for p in path.replace("\\", "/").split("/") if p and p != ".."]
+        if path.startswith("/") and parts and parts[0].lower() == "sd":
+            parts[0] = "sd"
+        return os.path.join(self.root, *parts)
+
+    def open(self, path, mode="r", *args, **kwargs):
+        """
+        This method is the open() seen by the scripts, on the host paths of host_path
+        """
+        host = self.host_path(path)
+        if "w" in mode or "a" in mode:
+            os.makedirs(os.path.dirname(host), exist_ok=True)
+            self.files_written += 1
+            if self.write_latency:
+                time.sleep(self.write_latency)
+            return CountingFile(open(host, mode, *args, **kwargs), self)
+        return open(host, mode, *args, **kwargs)
+
+    # script
+
+    def modules(self):
+        """
+        This method creates the sl3, utime, urandom and uos modules bound to this logger
+        :return: Dictionary of module name -> module
+        """
+        clock = self.clock
+        utime = types.ModuleType("utime")
+        utime.time = clock.time
+        utime.localtime = clock.localtime
+        utime.mktime = clock.mktime
+        utime.sleep = clock.sleep
+        utime.sleep_ms = lambda ms: clock.sleep(ms / 1000)
+        utime.sleep_us = lambda us: clock.sleep(us / 1000000)
+        utime.ticks_ms = clock.ticks_ms
+        utime.ticks_us = clock.ticks_us
+        if self.host_ticks:
+            origin = time.perf_counter()
+            utime.ticks_ms = lambda: int((time.perf_counter() - origin) * 1000)
+            utime.ticks_us = lambda: int((time.perf_counter() - origin) * 1000000)
+        utime.ticks_diff = lambda new, old: new - old
+        utime.ticks_add = lambda ticks, delta: ticks + delta
+
+        urandom = types.ModuleType("urandom")
+        for name in ("random", "uniform", "randint", "randrange", "choice", "getrandbits", "seed"):
+            setattr(urandom, name, getattr(self.random, name))
+
+        uos = types.ModuleType("uos")
+        host = self.host_path
+        uos.rename = lambda old, new: os.replace(host(old), host(new))
+        uos.remove = lambda path: os.remove(host(path))
+        uos.listdir = lambda path="": os.listdir(host(path))
+        uos.mkdir = lambda path: os.makedirs(host(path))
+        uos.stat = lambda path: tuple(os.stat(host(path)))
+
+        sl3 = types.ModuleType("sl3")
+        sl3.command_line = self.command_line
+        sl3.utime = utime
+        sl3.open = self.open
+        sl3.TASK = self.register(self.tasks)
+        sl3.TXFORMAT = self.register(self.txformats)
+        sl3.MEASUREMENT = self.register(self.meas_functions)
+        sl3.__all__ = ["command_line", "utime", "open", "TASK", "TXFORMAT", "MEASUREMENT"]
+        return {"sl3": sl3, "utime": utime, "urandom": urandom, "uos": uos}
+
+    @staticmethod
+    def register(registry):
+        """
+        This method returns a decorator that records the decorated functions by name
+        """
+        def decorator(function):
+            registry[function.__name__] = function
+            return function
+        return decorator
+
+    def install(self):
+        """
+        This method makes sl3, utime, urandom and uos importable, bound to this logger
+        """
+        sys.modules.update(self.modules())
+
+    def load(self, path, name=None):
+        """
+        This method installs the emulated modules and runs a script, including its start up code
+        :param path: Script path
+        :param name: Module name, defaults to the file name
+        :return: Script module
+        """
+        self.install()
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        folder = os.path.dirname(os.path.abspath(path))
+        if folder not in sys.path:
+            sys.path.insert(0, folder)
+        spec = importlib.util.spec_from_file_location(name, path)
+        script = importlib.util.module_from_spec(spec)
+        sys.modules[name] = script
+        spec.loader.exec_module(script)
+        self.script = script
+        return script
+
+
+class CountingFile:
+    def __init__(self, f, logger):
+        """
+        This CountingFile class constructor wraps a file opened for writing and counts the bytes written
+        :param f: File object
+        :param logger: Logger keeping the count
+        """
+        self.f = f
+        self.logger = logger
+
+    def write(self, data):
+        self.logger.bytes_written += len(data)
+        return self.f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+
+def parse_date(date, time_of_day):
+    """
+    This function converts a LOG command date and time (YYYY/MM/DD HH:MM:SS) to seconds since 1970/01/01
+    """
+    year, month, day = (int(x) for x in date.split("/"))
+    parts = [int(x) for x in time_of_day.split(":")] + [0, 0]
+    return VirtualClock.mktime((year, month, day, parts[0], parts[1], parts[2]))
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in span tracing for the Satlink 3 scripts.
+
+A Tracer wraps functions and records one span per call (start tick, duration, nesting depth and name) into a fixed
+size ring, so a trace never grows past the memory given to it. When the ring size is 0 the decorators return the
+functions unchanged, so a disabled tracer costs nothing per call.
+
+The ring is written on demand with Tracer.write() as one "start duration depth name" line per span, oldest first, and
+converted on the host with chrome_trace.py.
+"""
+
+from array import array
+
+
+def first_word(text, *args):
+    """
+    This function returns the first word of a command, used as span detail of command_line (e.g. "!LOG")
+    :param text: Command text
+    :return: First word
+    """
+    _ = args
+    return text.split(" ", 1)[0].strip()
+
+
+def sensor_label(sensor, *args):
+    """
+    This function returns the label of a sensor object, used as span detail of the sensor update methods
+    :param sensor: Sensor object
+    :return: Label
+    """
+    _ = args
+    return sensor.label
+
+
+def _untraced(function):
+    return function
+
+
+def _named(name, function):
+    """
+    This function returns function under the given name. The sl3 decorators register TASK, TXFORMAT and MEASUREMENT
+    functions by name, so a wrapper that shows up under another name would replace the script function. MicroPython
+    does not allow assigning __name__, so there the function is forwarded by a function defined under that name
+    :param name: Function name
+    :param function: Function
+    :return: Function whose __name__ is name
+    :raise RuntimeError: The name cannot be kept
+    """
+    try:
+        function.__name__ = name
+    except AttributeError:
+        scope = {"function": function}
+        try:
+            exec("def {0}(*args, **kwargs):\n    return function(*args, **kwargs)\n".format(name), scope)
+            function = scope[name]
+        except (NameError, SyntaxError, KeyError):  # no exec on this port, or not a valid name
+            pass
+    if getattr(function, "__name__", None) != name:
+        raise RuntimeError("tracing cannot keep the name of " + name + ", set TRACE_SPANS = 0")
+    return function
+
+
+class Tracer:
+    def __init__(self, size, ticks_ms, ticks_diff):
+        """
+        This Tracer class constructor allocates the span ring
+        :param size: Number of spans kept, 0 disables tracing
+        :param ticks_ms: Millisecond tick function (utime.ticks_ms)
+        :param ticks_diff: Tick difference function (utime.ticks_diff)
+        """
+        self.size = size
+        self.ticks_ms = ticks_ms
+        self.ticks_diff = ticks_diff
+        self.starts = array("l", [0] * size)
+        self.durations = array("l", [0] * size)
+        self.depths = array("B", [0] * size)
+        self.names = [None] * size
+        self.count = 0  # spans recorded since the last clear, older ones are overwritten
+        self.depth = 0
+        self.origin = ticks_ms()
+
+    def clear(self):
+        """
+        This method empties the ring and restarts the span times from now
+        """
+        self.count = 0
+        self.depth = 0
+        self.origin = self.ticks_ms()
+
+    def traced(self, name, detail=None):
+        """
+        This method returns a decorator that records a span for every call of the decorated function
+        :param name: Span name
+        :param detail: Function of the call arguments returning text appended to the name, or None
+        :return: Decorator
+        """
+        if not self.size:
+            return _untraced
+
+        def decorator(function):
+            return self.wrap(function, name, detail)
+        return decorator
+
+    def wrap(self, function, name, detail=None):
+        """
+        This method wraps a function so every call records a span
+        :param function: Function
+        :param name: Span name
+        :param detail: Function of the call arguments returning text appended to the name, or None
+        :return: Wrapped function, or the function itself when tracing is disabled
+        """
+        if not self.size:
+            return function
+        tracer = self
+        ticks_ms = self.ticks_ms
+        ticks_diff = self.ticks_diff
+
+        def span(*args, **kwargs):
+            depth = tracer.depth
+            tracer.depth = depth + 1
+            start = ticks_ms()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.depth = depth
+                tracer.record(name if detail is None else name + " " + detail(*args), start,
+                              ticks_diff(ticks_ms(), start), depth)
+        return _named(function.__name__, span)
+
+    def record(self, name, start, duration, depth):
+        """
+        This method stores one span in the ring, overwriting the oldest one when it is full
+        :param name: Span name
+        :param start: Start tick
+        :param duration: Duration in milliseconds
+        :param depth: Nesting depth, 0 for the outermost span
+        """
+        i = self.count % self.size
+        self.starts[i] = self.ticks_diff(start, self.origin)
+        self.durations[i] = duration
+        self.depths[i] = min(depth, 255)
+        self.names[i] = name
+        self.count += 1
+
+    def spans(self):
+        """
+        This method returns the spans in the ring, oldest first
+        :return: List of (start, duration, depth, name)
+        """
+        kept = min(self.count, self.size)
+        first = self.count - kept
+        spans = []
+        for n in range(first, self.count):
+            i = n % self.size
+            spans.append((self.starts[i], self.durations[i], self.depths[i], self.names[i]))
+        return spans
+
+    def write(self, f):
+        """
+        This method writes the spans in the ring to an open file
+        :param f: File opened for writing
+        :return: Number of spans written
+        """
+        spans = self.spans()
+        f.write("# spantrace {0} {1}\n".format(len(spans), self.count - len(spans)))
+        f.write("".join("{0} {1} {2} {3}\n".format(*s) for s in spans))
+        return len(spans)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of goes_bulk.py against a single process goes_parser.py pass over the same archive.
+"""
+
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from goes_bulk import BulkDecoder  # noqa: E402
+from goes_parser import GoesParser  # noqa: E402
+from sl3emu import Logger  # noqa: E402
+
+SCRIPT = os.path.join(ROOT, "mwwl8422.py")
+START = 1700000000
+
+
+def write_archive(path, cycles):
+    """
+    This function writes the messages mwwl8422.py transmits on the emulated logger, shuffled and with some of them
+    repeated, to an archive file
+    :return: Number of lines
+    """
+    logger = Logger(station="8422", start=START, gp1=1)
+    for i, label in enumerate(("MWWL", "MWSTD", "MWOUT", "MWTWL", "AT", "BAT")):
+        logger.add_measurement(label, right_digits=3, interval=60 if label == "MWTWL" else 360,
+                               source=lambda t, i=i: 1.0 + math.sin(t / 3600.0 + i))
+    logger.advance(3600)
+    msgs = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT)
+        for _ in range(cycles):
+            logger.advance(360)
+            script.update_data()
+            msgs.append(logger.transmit())
+    rnd = random.Random(0)
+    msgs += rnd.sample(msgs, cycles // 4) + ["P8422 not a message"]
+    rnd.shuffle(msgs)
+    with open(path, "w") as f:
+        f.write("".join(msg + "\r\n" for msg in msgs))
+    return len(msgs)
+
+
+def reprs(records):
+    """
+    This function is a decode_into sink returning the representation of the records of a range
+    """
+    return [repr(record) for record in records]
+
+
+def test_bulk_matches_single_process(tmp_path):
+    archive = str(tmp_path / "archive.txt")
+    lines = write_archive(archive, 120)
+    single = GoesParser(ref_time=START)
+    expected = sorted(single.iter_file(archive), key=lambda record: record.timestamp)
+    assert single.skipped == 1 and len(expected) == lines - 1
+    # about 40 chunks merged 3 at a time takes several passes
+    decoder = BulkDecoder(workers=2, chunk_size=os.path.getsize(archive) // 40, ref_time=START,
+                          spill_dir=str(tmp_path), fan_in=3)
+    records = list(decoder.decode(archive))
+    assert [repr(record) for record in records] == [repr(record) for record in expected]
+    assert decoder.records == len(expected) and decoder.skipped == 1
+    assert os.listdir(str(tmp_path)) == ["archive.txt"]
+
+
+def test_sink_gets_the_ranges_in_order(tmp_path):
+    archive = str(tmp_path / "archive.txt")
+    write_archive(archive, 120)
+    expected = sorted(GoesParser(ref_time=START).iter_file(archive), key=lambda record: record.timestamp)
+    decoder = BulkDecoder(workers=2, chunk_size=os.path.getsize(archive) // 40, ref_time=START,
+                          spill_dir=str(tmp_path), fan_in=3)
+    ranges = decoder.decode_into(archive, reprs)
+    assert len(ranges) > 2
+    assert [text for texts in ranges for text in texts] == [repr(record) for record in expected]
+    assert os.listdir(str(tmp_path)) == ["archive.txt"]
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Round trip of the GOES messages of mwwl8422.py, transmitted by the sl3emu logger, through goes_parser.py.
+"""
+
+import contextlib
+import io
+import math
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from goes_parser import GoesParser, GoesRecord  # noqa: E402
+from sl3emu import Logger  # noqa: E402
+
+SCRIPT = os.path.join(ROOT, "mwwl8422.py")
+START = 1700000000
+LABELS = ("MWWL", "MWSTD", "MWOUT", "MWTWL", "AT", "WT", "BARO", "COND", "BAT", "DAT", "SNS", "BWL", "BWLSTD",
+          "BWLOUT", "WS", "WD", "WG")
+RIGHT_DIGITS = {"MWWL": 3, "MWSTD": 3, "MWOUT": 0, "MWTWL": 3, "COND": 2, "DAT": 3, "SNS": 3, "BWL": 3, "BWLSTD": 3,
+                "BWLOUT": 0, "WD": 0}
+
+
+def transmissions(script_path=SCRIPT, cycles=5, battery=12.5, name=None):
+    """
+    This function runs the script on the emulated logger and transmits after every update_data
+    :param script_path: Script path
+    :param cycles: Number of update_data calls, 6 minutes apart
+    :param battery: Battery voltage of the logger
+    :param name: Module name of the script
+    :return: List of (message, logger time, label -> [(time, value)] newest first)
+    """
+    logger = Logger(station="8422", start=START, gp1=1, battery=battery)
+    for i, label in enumerate(LABELS):
+        base = 1013.0 if label == "BARO" else 1.0
+        logger.add_measurement(label, right_digits=RIGHT_DIGITS.get(label, 1), interval=60 if label == "MWTWL" else 360,
+                               source=lambda t, i=i, base=base: base + math.sin(t / 3600.0 + i))
+    logger.advance(3600)
+    sent = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(script_path, name)
+        for _ in range(cycles):
+            logger.advance(360)
+            script.update_data()
+            readings = {}
+            for secs, record in zip(reversed(logger.times), reversed(logger.records)):
+                readings.setdefault(record[1], []).append((secs, float(record[2])))
+            sent.append((logger.transmit(), logger.clock.now, readings))
+    return sent
+
+
+def check_tsunami(record, readings, window):
+    tsu_time, values = record.tsunami
+    assert tsu_time == readings["MWTWL"][0][0]
+    assert values == pytest.approx([value for _, value in readings["MWTWL"][:window]])
+
+
+def test_message_round_trip():
+    for msg, now, readings in transmissions():
+        record = GoesParser(ref_time=now).parse(msg)
+        assert record.station == "8422"
+        assert record.timestamp == readings["MWWL"][0][0] - 180
+        for label in LABELS:
+            if label != "MWTWL":
+                assert record.values[label] == pytest.approx(readings[label][0][1]), label
+        assert record.redundant == pytest.approx({"MWWL": readings["MWWL"][1][1], "BWL": readings["BWL"][1][1]})
+        assert record.battery == pytest.approx(12.5)
+        check_tsunami(record, readings, 6)
+
+
+def test_battery_byte_t():
+    # 11.5 V is sent as "T", the same byte as the tsunami block ID
+    for msg, now, readings in transmissions(battery=11.5):
+        record = GoesParser(ref_time=now).parse(msg)
+        assert record.battery == pytest.approx(11.5)
+        check_tsunami(record, readings, 6)
+
+
+@pytest.mark.parametrize("window", [3, 10])
+def test_tsunami_window_from_block_length(tmp_path, window):
+    with open(SCRIPT) as f:
+        source = f.read()
+    assert "\nTSUNAMI_WINDOW = 6\n" in source
+    path = tmp_path / "mwwl8422_window.py"
+    path.write_text(source.replace("\nTSUNAMI_WINDOW = 6\n", "\nTSUNAMI_WINDOW = {0}\n".format(window)))
+    for msg, now, readings in transmissions(str(path), cycles=3, name="mwwl8422_window{0}".format(window)):
+        record = GoesParser(ref_time=now).parse(msg)
+        assert len(record.tsunami[1]) == window
+        check_tsunami(record, readings, window)
+        assert record.values["BAT"] == pytest.approx(readings["BAT"][0][1])
+
+
+def test_parse_many_matches_parse():
+    msgs = [msg for msg, _, _ in transmissions(cycles=40)]
+    msgs += [msg for msg, _, _ in transmissions(cycles=20, battery=11.5)]
+    lines = msgs[:10] + ["P8422 not a message", msgs[10][:-3]] + msgs[10:]
+    expected = [repr(GoesParser(ref_time=START).parse(msg)) for msg in msgs]
+    parser = GoesParser(ref_time=START)
+    assert [repr(record) for record in parser.parse_many(lines, strict=False)] == expected
+    assert parser.skipped == 2
+    parser = GoesParser(ref_time=START)
+    archive = io.BytesIO("".join(line + "\r\n" for line in lines).encode("latin-1"))
+    assert [repr(record) for record in parser.iter_file(archive)] == expected
+    assert parser.skipped == 2
+    with pytest.raises(ValueError):
+        GoesParser(ref_time=START).parse_many(lines)
+
+
+def test_parse_columns_matches_parse():
+    msgs = [msg for msg, _, _ in transmissions(cycles=20)]
+    msgs += [msg for msg, _, _ in transmissions(cycles=20, battery=11.5)]
+    lines = msgs[:10] + ["P8422 not a message"] + msgs[10:]
+    parser = GoesParser(ref_time=START)
+    batch = parser.parse_columns(lines, strict=False)
+    assert parser.skipped == 1
+    assert sum(len(columns) for columns in batch) == len(msgs)
+    records = [GoesParser(ref_time=START).parse(msg) for msg in msgs]
+    rows = []
+    for columns in batch:
+        for i in range(len(columns)):
+            tsunami = None
+            if columns.tsunami is not None and columns.tsunami[0][i] >= 0:
+                tsunami = (int(columns.tsunami[0][i]), tuple(columns.tsunami[1][i].tolist()))
+            rows.append(repr(GoesRecord(columns.station, int(columns.timestamps[i]),
+                                        dict((label, float(v[i])) for label, v in columns.values.items()),
+                                        dict((label, float(v[i])) for label, v in columns.redundant.items()),
+                                        tsunami, None if columns.battery is None else float(columns.battery[i]))))
+    assert sorted(rows) == sorted(repr(record) for record in records)
+    with pytest.raises(ValueError):
+        GoesParser(ref_time=START).parse_columns(lines)
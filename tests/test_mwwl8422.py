@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of mwwl8422.py run on the sl3emu logger.
+"""
+
+import calendar
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chrome_trace import convert  # noqa: E402
+from goes_parser import GoesParser  # noqa: E402
+from sl3emu import Logger  # noqa: E402
+
+SCRIPT = os.path.join(ROOT, "mwwl8422.py")
+START = 1700000000
+
+
+def newest_reading(logger, label):
+    """
+    This function returns the value text of the newest log record of a label
+    """
+    for record in reversed(logger.records):
+        if record[1] == label:
+            return record[2]
+    return None
+
+
+def load_script():
+    """
+    This function loads the script on an emulated logger with a single measurement
+    """
+    logger = Logger(station="8422", start=START, gp1=1)
+    logger.add_measurement("MWWL", right_digits=3, source=3.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return logger.load(SCRIPT)
+
+
+def test_parse_fixed():
+    script = load_script()
+    cases = [("1.234", 3, 1234), ("-1.25", 3, -1250), ("1.2345", 3, 1235), ("-1.2345", 3, -1235), ("1.2344", 3, 1234),
+             ("12", 2, 1200), (" +0.5\r", 0, 1), ("-0.4", 0, 0), (".5", 1, 5), ("-0.000", 3, 0), ("3.", 1, 30),
+             ("99999999999", 0, 2147483647), ("-99999999999", 0, -2147483647)]
+    for text, right_digits, value in cases:
+        assert script.parse_fixed(text, right_digits) == value, text
+    for text in ("", "-", "abc", "1e3", "1.2.3", "--1"):
+        with pytest.raises(ValueError):
+            script.parse_fixed(text, 2)
+
+
+def test_format_fixed_matches_float_formatting():
+    script = load_script()
+    for right_digits in (0, 1, 2, 3):
+        for decimals in (0, 1, 3):
+            # no ties, where float formatting rounds half to even and format_fixed half away from zero
+            for value in (0, 1, -1, 4, -4, 7, -7, 123, -123, 1234, -1234, 99999, -99999, 1234567, -1234567):
+                if decimals < right_digits and value % 10 ** (right_digits - decimals) * 2 == \
+                        10 ** (right_digits - decimals):
+                    continue
+                expected = "{0:>10.{1}f}".format(value / 10.0 ** right_digits, decimals)
+                assert script.format_fixed(value, right_digits, decimals, 10) == expected, (value, right_digits)
+    assert script.format_fixed(-40, 3, 1, 6) == "  -0.0"
+    assert script.format_fixed(-5, 1, 0, 3) == " -1"  # half away from zero
+    assert script.format_fixed(script.MISSING_VALUE, 3, 3, 11) == " -99999.000"
+    assert script.format_fixed(script.MISSING_VALUE, 0, 1, 0) == "-99999.0"
+    assert script.format_fixed(123456, 3, 3, 2) == "123.456"
+
+
+def test_reading_after_a_missed_one_is_sent():
+    # BAT misses the first reading after the script is loaded and another one later. The reading after each gap must
+    # still be picked up by the next update, although it comes two intervals after the previous one
+    first = (START + 3600) // 360 * 360 + 360  # first reading after the script is loaded
+    missed = (first, first + 1440)
+    logger = Logger(station="8422", start=START, gp1=1)
+    logger.add_measurement("MWWL", right_digits=3, interval=360, source=lambda t: 3.0 + t % 7200 / 7200.0)
+    logger.add_measurement("MWSTD", right_digits=3, interval=360, source=0.05)
+    logger.add_measurement("MWOUT", right_digits=0, interval=360, source=1)
+    logger.add_measurement("BAT", right_digits=1, interval=360,
+                           source=lambda t: None if t in missed else 11.0 + t // 360 % 20 / 10.0)
+    logger.advance(3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT)
+        for _ in range(60):
+            logger.advance(60)
+            script.update_data()
+            report = open(logger.host_path("p")).read()
+            assert "L1 <{0:>11}\n".format(newest_reading(logger, "BAT")) in report
+    assert logger.clock.now > missed[-1] + 360
+
+
+def test_transmission_does_not_write_status_file():
+    logger = Logger(station="8422", start=START, gp1=1)
+    logger.add_measurement("MWWL", right_digits=3, interval=360, source=3.0)
+    logger.add_measurement("BAT", right_digits=1, interval=360, source=12.0)
+    logger.advance(3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT)
+        files_written = logger.files_written
+        for _ in range(40):  # 80 status messages, kept until the next task
+            logger.transmit()
+        assert logger.files_written == files_written
+        logger.advance(360)
+        script.update_data()
+    folder = logger.host_path("/sd/status_log")
+    lines = "".join(open(os.path.join(folder, name)).read() for name in sorted(os.listdir(folder))).splitlines()
+    # every status message of the transmissions is written by the next task, none is lost
+    messages = [line.split(": ", 1)[1] for line in lines]
+    assert messages[:2] == ["Initializing data...", "Initialization complete!"]
+    assert messages[2:82] == ["Transmitting GOES message...", "GOES transmission successful!"] * 40
+    assert messages[82:] == ["Updating all data...", "Updates successful!"]
+
+
+def test_newest_records_survive_the_log_buffer():
+    # the LOG response of 17 sensors is several times the 512 bytes command_line returns by default, and the newest
+    # records come last
+    logger = Logger(station="8422", start=START, gp1=1)
+    labels = ("MWWL", "MWSTD", "MWOUT", "MWTWL", "AT", "WT", "BARO", "COND", "BAT", "DAT", "SNS", "BWL", "BWLSTD",
+              "BWLOUT", "WS", "WD", "WG")
+    for i, label in enumerate(labels):
+        base = 1013.0 if label == "BARO" else 1.0
+        logger.add_measurement(label, right_digits=1, interval=60 if label == "MWTWL" else 360,
+                               source=lambda t, i=i, base=base: base + math.sin(t / 3600.0 + i))
+    logger.advance(3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT)
+        for _ in range(10):
+            logger.advance(360)
+            script.update_data()
+            record = GoesParser(ref_time=logger.clock.now, right_digits=dict.fromkeys(labels, 1)).parse(
+                logger.transmit())
+            for label in labels:
+                if label != "MWTWL":
+                    assert "{0:.1f}".format(record.values[label]) == newest_reading(logger, label), label
+    assert logger.truncated <= 2  # the buffer is grown once and kept
+
+
+def test_only_due_sensors_are_queried():
+    # BAT, DAT and SNS are logged hourly and MWWL every 6 minutes. With updates every 2 minutes only one cycle in three
+    # has a new record to read
+    logger = Logger(station="8422", start=START, gp1=1)
+    for i, label in enumerate(("MWWL", "BAT", "DAT", "SNS")):
+        logger.add_measurement(label, right_digits=3, interval=360 if label == "MWWL" else 3600,
+                               source=lambda t, i=i: 1.0 + math.sin(t / 3600.0 + i))
+    logger.advance(3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT)
+        queries = logger.command_counts.get("LOG", 0)
+        for _ in range(60):
+            logger.advance(120)
+            script.update_data()
+            for sensor in script.add_sns[:script.cnt_meas]:
+                window = 1300 if sensor.label == "MWWL" else 850
+                expected = script.MISSING_VALUE
+                for secs, record in zip(reversed(logger.times), reversed(logger.records)):
+                    if record[1] == sensor.label:
+                        if secs >= logger.clock.now - window:
+                            expected = script.parse_fixed(record[2], 3)
+                        break
+                assert sensor.value == expected, sensor.label
+    assert logger.command_counts["LOG"] - queries == 21  # the first cycle reads the records logged before it
+
+
+def test_log_query_starts_at_the_due_sensors():
+    # the hourly BAT cursor must not pull the query of the cycles in between back to the start of the window
+    logger = Logger(station="8422", start=START, gp1=1)
+    logger.add_measurement("MWWL", right_digits=3, interval=360, source=3.0)
+    logger.add_measurement("BAT", right_digits=1, interval=3600, source=12.0)
+    logger.advance(3600)
+    answer = logger.answer
+    spans = []
+
+    def log_span(cmd):
+        if cmd.startswith("!LOG "):
+            start = time.strptime(cmd.split()[1] + " " + cmd.split()[2] + " UTC", "%Y/%m/%d %H:%M:%S %Z")
+            spans.append(logger.clock.now - calendar.timegm(start))
+        return answer(cmd)
+
+    logger.answer = log_span
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT)
+        for _ in range(60):
+            logger.advance(360)
+            script.update_data()
+    assert len(spans) == 60
+    # the queries start at the previous MWWL record, except the first one and those of the hourly BAT readings which
+    # read the whole window
+    assert len([span for span in spans if span > 720]) <= 1 + 6
+
+
+def test_trace_ring_wraps_and_converts(tmp_path):
+    with open(SCRIPT) as f:
+        source = f.read()
+    assert "\nTRACE_SPANS = 0\n" in source
+    path = tmp_path / "mwwl8422_traced.py"
+    path.write_text(source.replace("\nTRACE_SPANS = 0\n", "\nTRACE_SPANS = 32\n"))
+    logger = Logger(station="8422", start=START, gp1=1)
+    for label in ("MWWL", "MWSTD", "MWOUT", "AT", "BAT"):
+        logger.add_measurement(label, right_digits=1, source=3.0)
+    logger.advance(3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(str(path), "mwwl8422_traced")
+        # the tasks are registered under their own names, not under the name of the tracing wrapper
+        assert {"update_data", "goes_message", "dump_trace"} <= set(logger.tasks) | set(logger.txformats)
+        logger.run(seconds=3 * 360, tasks={"update_data": 360})
+        count = script.tracer.count
+        logger.tasks["dump_trace"]()
+    assert count > script.tracer.size == 32
+    with open(logger.host_path(script.TRACE_FILE)) as f:
+        dump = f.read().splitlines()
+    assert dump[0] == "# spantrace 32 {0}".format(count - 32) and len(dump) == 33
+    target = str(tmp_path / "trace.json")
+    assert convert(logger.host_path(script.TRACE_FILE), target) == 32
+    with open(target) as f:
+        events = json.load(f)["traceEvents"]
+    assert [event["ts"] for event in events] == sorted(event["ts"] for event in events)
+    assert set(event["ph"] for event in events) == {"X"}
+    assert "update_data" in [event["name"] for event in events]
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of pseudobinary.py against the string based encoder the Satlink 3 scripts used before it, and of the batch
+functions against the single value ones.
+"""
+
+import math
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pseudobinary import decode_array, encode_many, pseudo_encoder  # noqa: E402
+
+# (lowest value, highest value) of the fields indexed by [pos][byt]
+RANGES = ((None, (-31, 30), (-2047, 2046), (-131071, 131070)), (None, (0, 62), (0, 4094), (0, 262142)))
+
+
+def decimal_to_binary(decimal_number):
+    """
+    This function converts decimal to 18 bits binary number (mwwl8422.py before the shared encoder)
+    """
+    bi_num = bin(abs(decimal_number)).replace("0b", "")
+    bi_len = len(bi_num)
+    bi_app = "0" * 18
+    bi_app = bi_app[0:18 - bi_len]
+    return bi_app + bi_num
+
+
+def reference_encoder(int_val, byt, pos=False):
+    """
+    This function is pseudo_encoder() of mwwl8422.py before the shared encoder
+    """
+    int_val = int(str(int_val).replace(".", ""))
+    iv = 0
+    if int_val < 0 and pos:
+        return "`@@"[:byt]
+    if int_val < 0 and not pos:
+        if byt == 1 and int_val < -31:
+            return "`"
+        if byt == 2 and int_val < -2047:
+            return "`@"
+        if byt == 3 and int_val < -131071:
+            return "`@@"
+        bi_num = decimal_to_binary(int_val)
+        bi_str = ""
+        for bit in bi_num:
+            if bit == "1":
+                bi_str += "0"
+            else:
+                bi_str += "1"
+        iv = int(bi_str, 2) + 1
+    if int_val >= 0:
+        if not pos:
+            if byt == 1 and int_val > 30:
+                return "_"
+            if byt == 2 and int_val > 2046:
+                return "_?"
+            if byt == 3 and int_val > 131070:
+                return "_??"
+        elif pos:
+            if byt == 1 and int_val > 62:
+                return "?"
+            if byt == 2 and int_val > 4094:
+                return "??"
+            if byt == 3 and int_val > 262142:
+                return "???"
+        iv = int_val
+    bi_array = [iv >> 12, (iv >> 6) & 63, iv & 63]
+    for i in range(3):
+        if bi_array[i] != int(63):
+            bi_array[i] += 64
+    if byt == 1:
+        return chr(bi_array[2])
+    if byt == 2:
+        return chr(bi_array[1]) + chr(bi_array[2])
+    if byt == 3:
+        return chr(bi_array[0]) + chr(bi_array[1]) + chr(bi_array[2])
+
+
+@pytest.mark.parametrize("pos", [False, True])
+@pytest.mark.parametrize("byt", [1, 2, 3])
+def test_pseudo_encoder_matches_reference(byt, pos):
+    low, high = RANGES[pos][byt]
+    values = set(range(-3, 4))
+    for edge in (low, high):  # saturation at both ends
+        values.update(range(edge - 3, edge + 4))
+    values.update((-262144, -131072, -4096, -64, 64, 4096, 131072, 262144, 10 ** 6, -10 ** 6))
+    values.update(random.Random(byt).randint(2 * low - 5, 2 * high + 5) for _ in range(500))
+    if byt < 3:
+        values.update(range(low - 5, high + 6))  # every value of the field
+    for value in sorted(values):
+        assert pseudo_encoder(value, byt, pos) == reference_encoder(value, byt, pos), value
+
+
+@pytest.mark.parametrize("value", [0.0, 1.5, -1.5, 12.25, -12.25, 0.5, -0.5, 3.0, 204.6, -204.7, 13107.0, 6.3,
+                                   26214.2, "42", "-7"])
+@pytest.mark.parametrize("byt", [1, 2, 3])
+def test_pseudo_encoder_matches_reference_for_float_inputs(value, byt):
+    # the decimal point is dropped, so 12.25 is sent as 1225
+    for pos in (False, True):
+        assert pseudo_encoder(value, byt, pos) == reference_encoder(value, byt, pos)
+
+
+def test_encode_many_matches_pseudo_encoder():
+    rnd = random.Random(0)
+    widths = [rnd.choice((1, 2, 3)) for _ in range(400)]
+    signed = [rnd.random() < 0.5 for _ in widths]
+    values = [rnd.randint(-300000, 300000) // 10 ** rnd.randint(0, 5) for _ in widths]
+    values[::7] = [value / 4.0 for value in values[::7]]
+    assert encode_many(values, widths, signed) == "".join(
+        pseudo_encoder(value, width, not flag) for value, width, flag in zip(values, widths, signed))
+    for width in (1, 2, 3):
+        for flag in (True, False):
+            assert encode_many(values, width, flag) == "".join(pseudo_encoder(value, width, not flag)
+                                                               for value in values)
+    assert encode_many([], 2) == ""
+
+
+@pytest.mark.parametrize("signed", [True, False])
+@pytest.mark.parametrize("width", [1, 2, 3])
+def test_decode_array_round_trip(width, signed):
+    np = pytest.importorskip("numpy")
+    low, high = RANGES[not signed][width]
+    values = sorted(set([low, low + 1, -1, 0, 1, high - 1, high] + random.Random(width).sample(range(low, high), 50)))
+    # a signed -1 is all "?", the missing value
+    values = [value for value in values if low <= value <= high and not (signed and value == -1)]
+    encoded = encode_many(values, width, signed).encode()
+    assert decode_array(encoded, width, signed).tolist() == values
+    assert decode_array(np.frombuffer(encoded, "S{0}".format(width)), width, signed).tolist() == values
+    assert decode_array(encoded, width, signed, right_digits=2) == pytest.approx([value / 100.0 for value in values])
+
+
+@pytest.mark.parametrize("width", [1, 2, 3])
+def test_decode_array_missing_and_saturated(width):
+    pytest.importorskip("numpy")
+    missing = "?" * width
+    low = "`@@"[:width]
+    high = "_??"[:width]
+    corrupt = "///"[:width]
+    values = decode_array((missing + low + high + corrupt).encode(), width)
+    assert all(math.isnan(value) for value in values)
+    values = decode_array((missing + low + high + corrupt).encode(), width, signed=False)
+    assert math.isnan(values[0]) and math.isnan(values[3])
+    assert values[1] == 1 << (6 * width - 1) and values[2] == (1 << (6 * width - 1)) - 1
+    # a negative reading of a positive only field is sent as the under range value "`@@"
+    assert pseudo_encoder(-5, width, True) == low
+    values = decode_array((missing + low + high + corrupt).encode(), width, signed=False, under_range=True)
+    assert math.isnan(values[1]) and values[2] == (1 << (6 * width - 1)) - 1
+    if width > 1:
+        with pytest.raises(ValueError):
+            decode_array(b"@" * (width + 1), width)
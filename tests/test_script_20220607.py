@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of 99999991_script_20220607.py run on the sl3emu logger.
+"""
+
+import contextlib
+import io
+import math
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sl3emu import Logger  # noqa: E402
+
+SCRIPT = os.path.join(ROOT, "99999991_script_20220607.py")
+START = 1700000000
+LABELS = ("MWWL", "MWSTD", "MWOUT", "MWCOUNTS", "WS", "WD", "WG", "AT", "WT", "BARO", "BAT", "DAT", "SNS", "TWL")
+
+
+def transmit(labels, cycles=3):
+    """
+    This function runs the script on the emulated logger
+    :return: (logger, last GOES message)
+    """
+    logger = Logger(station="9999", start=START, gp1=1)
+    for i, label in enumerate(labels):
+        logger.add_measurement(label, right_digits=3 if label in ("MWWL", "MWSTD", "DAT", "TWL") else 1,
+                               interval=60 if label == "TWL" else 360,
+                               source=lambda t, i=i: 3.0 + math.sin(t / 3000.0 + i))
+    logger.advance(3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT, "script_20220607")
+        for _ in range(cycles):
+            logger.advance(360)
+            script.initialize_config()
+            script.update_data()
+        return logger, logger.transmit()
+
+
+def test_station_without_tsunami_sensor():
+    with_twl = transmit(LABELS)[1]
+    without_twl = transmit([label for label in LABELS if label != "TWL"])[1]
+    assert with_twl.startswith(without_twl) and with_twl[len(without_twl)] == "T"
+    assert "T" not in without_twl[without_twl.rindex("<"):]
+
+
+def test_ports_file_is_replaced_whole():
+    logger, _ = transmit(LABELS)
+    with open(logger.host_path("p")) as f:
+        report = f.read()
+    assert report.startswith("NOS 9999 ") and report.endswith("\nREPORT COMPLETE\n")
+    assert "Y1 8 " in report and report.count("U1 ") == 6
+    assert not os.path.exists(logger.host_path("p.tmp"))
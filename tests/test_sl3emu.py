@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of the sl3emu logger.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sl3emu import Logger  # noqa: E402
+
+
+def test_command_line_cuts_response_to_buffer():
+    logger = Logger(station="8422", start=1700000000)
+    logger.add_measurement("MWWL", right_digits=3, interval=60, source=1.0)
+    logger.advance(3600)
+    full = logger.answer("!LOG 1\r")
+    assert len(full) > 512
+    assert logger.command_line("!LOG 1\r") == full[:512]
+    assert logger.command_line("!LOG 1\r", 100) == full[:100]
+    assert logger.command_line("!LOG 1\r", len(full)) == full
+    assert logger.truncated == 2
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of thelatestsip.py run on the sl3emu logger.
+"""
+
+import contextlib
+import io
+import math
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sl3emu import Logger  # noqa: E402
+
+SCRIPT = os.path.join(ROOT, "thelatestsip.py")
+START = 1700000000
+LABELS = ("MWWL", "MWSTD", "MWOUT", "MWCOUNTS", "WS", "WD", "WG", "AT", "WT", "BARO", "BAT", "DAT", "SNS", "TWL")
+
+
+def baseline_encoded_data(sensor, pseudo_encoder):
+    """
+    This function is SecondarySensor.get_encoded_data of the baseline thelatestsip.py, before the label table
+    """
+    if sensor.value == -99999.0:
+        if sensor.label in ("MWWL", "COND"):
+            return "???"
+        if sensor.label in ("MWSTD", "AT", "WT", "CTWT"):
+            return "??"
+        if sensor.label in ("MWOUT"):
+            return "?"
+        if sensor.label in ("BARO"):
+            return "@@@"
+        if sensor.label in ("SNS"):
+            return "@@"
+        if sensor.label in ("BAT"):
+            return "_?"
+
+    value = int(sensor.value * 10 ** sensor.right_digits)
+    if sensor.label in ("MWOUT"):
+        return pseudo_encoder(value, 1, True)
+    if sensor.label in ("BARO", "BAT", "MWSTD", "WD", "WG", "WS"):
+        if sensor.label in ("BARO"):
+            value -= 8000
+        return pseudo_encoder(value, 2, True)
+    if sensor.label in ("SNS", "AT", "WT"):
+        return pseudo_encoder(value, 2)
+    return pseudo_encoder(value, 3)
+
+
+def baseline_goes_message(script):
+    """
+    This function is goes_message_formatter of the baseline thelatestsip.py, which inserts every group in front of
+    the battery group, with its sensors looked up by label (the baseline used names it never defined)
+    :param script: Loaded script module
+    :return: GOES message
+    """
+    named = dict((a_s.label, a_s) for a_s in script.add_sns)
+    pri, twl = script.add_sns[0], named["TWL"]
+
+    def encoded(label):
+        return baseline_encoded_data(named[label], script.pseudo_encoder)
+
+    wind_bird = ""
+    station_id = script.command_line("!STATION NAME\r").strip()
+    tsunami = twl.get_encoded_tsunami()
+    tx_battery = float(script.command_line("!BATT\r").strip())
+    if tx_battery < 9.5:
+        tx_battery = 9.5
+    tx_battery = round((tx_battery - 9.5) * 10)
+    if tx_battery > 63:
+        tx_battery = 63
+    tx_battery = script.pseudo_encoder(tx_battery, 1, True)
+    tx_message = "P{0}{1}{2}@@{3}0{4}{5}8{6}{7}{8}#{9}<{10} {11}T{12}".format(
+        station_id, encoded("DAT"), encoded("SNS"), pri.get_encoded_minute(), pri.get_encoded_sutron_day(),
+        pri.get_encoded_hour(), baseline_encoded_data(pri, script.pseudo_encoder), encoded("MWSTD"),
+        encoded("MWOUT"), pri.get_encoded_redundant_data(), encoded("BAT"), tx_battery, "".join(tsunami))
+    for a_s in script.add_sns:
+        if a_s.label == "WS":
+            wind_bird += baseline_encoded_data(a_s, script.pseudo_encoder)
+        elif a_s.label == "WD":
+            wind_bird += baseline_encoded_data(a_s, script.pseudo_encoder)
+        elif a_s.label == "WG":
+            wind_bird += baseline_encoded_data(a_s, script.pseudo_encoder)
+            index = tx_message.find("<")
+            if len(wind_bird) == 6:
+                tx_message = tx_message[:index] + "3" + wind_bird + tx_message[index:]
+            else:
+                tx_message = tx_message[:index] + "3" + "??????" + tx_message[index:]
+        elif a_s.label == "AT":
+            index = tx_message.find("<")
+            tx_message = tx_message[:index] + "4" + baseline_encoded_data(a_s, script.pseudo_encoder) + \
+                tx_message[index:]
+        elif a_s.label == "WT":
+            index = tx_message.find("<")
+            tx_message = tx_message[:index] + "5" + baseline_encoded_data(a_s, script.pseudo_encoder) + \
+                tx_message[index:]
+        elif a_s.label == "BARO":
+            index = tx_message.find("<")
+            tx_message = tx_message[:index] + "6" + baseline_encoded_data(a_s, script.pseudo_encoder) + \
+                tx_message[index:]
+    return tx_message
+
+
+def transmit(labels, cycles=3):
+    """
+    This function runs the script on the emulated logger
+    :return: (logger, last GOES message, script module)
+    """
+    logger = Logger(station="9999", start=START, gp1=1)
+    for i, label in enumerate(labels):
+        logger.add_measurement(label, right_digits=3 if label in ("MWWL", "MWSTD", "DAT", "TWL") else 1,
+                               interval=60 if label == "TWL" else 360,
+                               source=lambda t, i=i: 3.0 + math.sin(t / 3000.0 + i))
+    logger.advance(3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        script = logger.load(SCRIPT, "thelatestsip")
+        for _ in range(cycles):
+            logger.advance(360)
+            script.initialize_config()
+            script.update_data()
+        return logger, logger.transmit(), script
+
+
+def test_station_starts_up():
+    logger, msg, _ = transmit(LABELS)
+    assert msg.startswith("P9999")
+    with open(logger.host_path("p")) as f:
+        report = f.read()
+    assert report.startswith("NOS 9999 ") and report.endswith("\nREPORT COMPLETE\n")
+    assert report.count("U1 ") == 6
+
+
+def test_station_without_tsunami_sensor():
+    with_twl = transmit(LABELS)[1]
+    without_twl = transmit([label for label in LABELS if label != "TWL"])[1]
+    assert with_twl.startswith(without_twl) and with_twl[len(without_twl)] == "T"
+    logger, _, _ = transmit([label for label in LABELS if label != "TWL"])
+    with open(logger.host_path("p")) as f:
+        assert "U1 " not in f.read()
+
+
+def test_goes_message_matches_baseline():
+    for cycles in (1, 3, 8):
+        _, msg, script = transmit(LABELS, cycles)
+        assert msg == baseline_goes_message(script)
+    # missing readings are sent as the sentinels of the baseline
+    for a_s in script.add_sns:
+        if a_s.label in ("MWSTD", "MWOUT", "AT", "WT", "BARO", "SNS", "BAT"):
+            a_s.value = -99999.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        msg = script.goes_message_formatter()
+    assert msg == baseline_goes_message(script)
+    assert "???#" in msg and "4??5??6@@@<_? " in msg
@@ -7,6 +7,31 @@ Created on Mon Dec 13 19:41:17 2021
 
 from sl3 import *
 
+import uos
+
+from pseudobinary import pseudo_encoder
+
+from portsfile import PortsFile
+
+# label -> (number of bytes, positive only, offset added to the scaled value, encoded missing value or None to
+# encode -99999.0 like any other value). Labels that are not listed are encoded with DEFAULT_SPEC
+LABEL_SPECS = {
+    "MWWL": (3, False, 0, "???"),
+    "MWSTD": (2, True, 0, "??"),
+    "MWOUT": (1, True, 0, "?"),
+    "AT": (2, False, 0, "??"),
+    "WT": (2, False, 0, "??"),
+    "CTWT": (3, False, 0, "??"),
+    "COND": (3, False, 0, "???"),
+    "BARO": (2, True, -8000, "@@@"),
+    "SNS": (2, False, 0, "@@"),
+    "BAT": (2, True, 0, "_?"),
+    "WS": (2, True, 0, None),
+    "WD": (2, True, 0, None),
+    "WG": (2, True, 0, None),
+}
+DEFAULT_SPEC = (3, False, 0, None)
+
 
 def sutron_day_calc(julian_day, year):
     """
@@ -33,6 +58,7 @@ class SecondarySensor:
         self.meas_number = meas_number
         self.label = command_line("!" + meas_number + " LABEL\r").strip()
         self.right_digits = int(command_line("!" + meas_number + " RIGHT DIGITS\r").strip())
+        self.spec = (10 ** self.right_digits,) + LABEL_SPECS.get(self.label, DEFAULT_SPEC)
         self.value = -99999.0
 
     def get_encoded_data(self):
@@ -40,30 +66,10 @@ class SecondarySensor:
         This method returns the encoded data of the object when called
         :return: Encoded data
         """
-        if self.value == -99999.0:
-            if self.label in ("MWWL", "COND"):
-                return "???"
-            if self.label in ("MWSTD", "AT", "WT", "CTWT"):
-                return "??"
-            if self.label in ("MWOUT"):
-                return "?"
-            if self.label in ("BARO"):
-                return "@@@"
-            if self.label in ("SNS"):
-                return "@@"
-            if self.label in ("BAT"):
-                return "_?"
-
-        value = int(self.value * 10 ** self.right_digits)
-        if self.label in ("MWOUT"):
-            return pseudo_encoder(value, 1, True)
-        if self.label in ("BARO", "BAT", "MWSTD", "WD", "WG", "WS"):
-            if self.label in ("BARO"):
-                value -= 8000
-            return pseudo_encoder(value, 2, True)
-        if self.label in ("SNS", "AT", "WT"):
-            return pseudo_encoder(value, 2)
-        return pseudo_encoder(value, 3)
+        scale, byt, pos, offset, missing = self.spec
+        if self.value == -99999.0 and missing is not None:
+            return missing
+        return pseudo_encoder(int(self.value * scale) + offset, byt, pos)
 
     def update_secondary_data(self):
         """
@@ -119,7 +125,7 @@ class PrimarySensor(SecondarySensor):
         """
         if self.redundant_value == -99999.0:
             return "@@@"
-        value = int(self.redundant_value * 10 ** self.right_digits)
+        value = int(self.redundant_value * self.spec[0])
         return pseudo_encoder(value, 3)
 
     def get_encoded_sutron_day(self):
@@ -245,9 +251,23 @@ def sl3_datetime():
     return sl3_date, sl3_time
 
 
-def ports_tag_message_append(flag, val, f):
-    f.write(flag)
-    f.write("{:>11.1f}\r\n".format(val) if val != -99999.0 else "  Data Flagged as bad or missing\r\n")
+def ports_tag_message_append(flag, val):
+    return flag + ("{:>11.1f}\r\n".format(val) if val != -99999.0 else "  Data Flagged as bad or missing\r\n")
+
+
+ports_file = PortsFile("p", open, uos)
+
+
+def named_sensors():
+    """
+    This function returns the sensors by label, so the header, battery and tsunami groups can find their sensors
+    wherever they are in the sensor list
+    :return: Dictionary of label -> sensor
+    """
+    named = {}
+    for a_s in add_sns:
+        named[a_s.label] = a_s
+    return named
 
 
 def ports_tag_message_formatter():
@@ -267,47 +287,49 @@ def ports_tag_message_formatter():
     pri_hour = str("{:02d}".format(add_sns[0].hour))
     pri_minute = str("{:02d}".format(add_sns[0].minute))
     pri_second = str("{:02d}".format(add_sns[0].second))
-    f = open("p", "w")
-    f.write("NOS {0} {1} {2}:{3}:{4}\r\n".format(station_id, pri_date, pri_hour, pri_minute, pri_second))
+    msg = ["NOS {0} {1} {2}:{3}:{4}\r\n".format(station_id, pri_date, pri_hour, pri_minute, pri_second)]
     for a_s in add_sns:
         if a_s.label in ("AQT", "AQTSTD", "AQTOUT", "AQT1", "AQT2"):
             aqt.append(a_s.value)
             if len(aqt) == 5 and -99999.0 not in aqt[:3]:
-                f.write("A1 1")
-                f.write("{0}{1}{2}{3}{4}\r\n".format("{:>11.3f}".format(aqt[0]), "{:>9.3f}".format(aqt[1]),
-                                                     "{:>10.0f}".format(aqt[2]), "{:>10.1f}".format(aqt[3]),
-                                                     "{:>10.1f}".format(aqt[4])))
+                msg.append("A1 1{0}{1}{2}{3}{4}\r\n".format("{:>11.3f}".format(aqt[0]), "{:>9.3f}".format(aqt[1]),
+                                                           "{:>10.0f}".format(aqt[2]), "{:>10.1f}".format(aqt[3]),
+                                                           "{:>10.1f}".format(aqt[4])))
             else:
-                f.write("A1 1  Data flagged as bad or missing\r\n")
+                msg.append("A1 1  Data flagged as bad or missing\r\n")
 
         if a_s.label in ("WS", "WD", "WG"):
             wind1.append(a_s.value)
             if len(wind1) == 3 and -99999.0 not in wind1:
-                f.write("C1 3")
-                f.write("{0}{1}{2}\r\n".format("{:>11.1f}".format(wind1[0]),
-                                               "{:>9.0f}".format(wind1[1]),
-                                               "{:>10.1f}".format(wind1)))
+                msg.append("C1 3{0}{1}{2}\r\n".format("{:>11.1f}".format(wind1[0]),
+                                                     "{:>9.0f}".format(wind1[1]),
+                                                     "{:>10.1f}".format(wind1[2])))
             else:
-                f.write("C1 3  Data flagged as bad or missing\r\n")
+                msg.append("C1 3  Data flagged as bad or missing\r\n")
         elif a_s.label == "AT":
-            ports_tag_message_append("D1 4", a_s.value, f)
+            msg.append(ports_tag_message_append("D1 4", a_s.value))
         elif a_s.label == "WT":
-            ports_tag_message_append("E1 5", a_s.value, f)
+            msg.append(ports_tag_message_append("E1 5", a_s.value))
         elif a_s.label == "BARO":
-            ports_tag_message_append("F1 6", a_s.value, f)
-
-    f.write("L1 <")
-    f.write("{:>11.1f}\r\n".format(bat.value) if bat.value != -99999.0 else "  Data flagged as bad or missing\r\n")
-    f.write("DAT")
-    f.write("{:>10.3f}".format(dat.value) + "\r\n" if dat.value != -99999.0 else " data not available\r\n")
-    f.write("SNS")
-    f.write("{:>10.3f}".format(sns.value) + "\r\n" if sns.value != -99999.0 else " data not available\r\n")
-    temps = (twl.value, twl.value2, twl.value3, twl.value4, twl.value5, twl.value6)
-    for temp in temps:
-        f.write("U1")
-        f.write("{:>11.3f}".format(temp) + "\r\n" if temp != -99999.0 else " data not available\r\n")
-    f.write("\r\nREPORT COMPLETE\r\n")
-    f.close()
+            msg.append(ports_tag_message_append("F1 6", a_s.value))
+
+    # sensors missing from the setup are reported like missing readings, and without a TWL sensor there are no
+    # tsunami lines
+    named = named_sensors()
+    bat, dat, sns, twl = named.get("BAT"), named.get("DAT"), named.get("SNS"), named.get("TWL")
+    value = -99999.0 if bat is None else bat.value
+    msg.append("L1 <" + ("{:>11.1f}\r\n".format(value) if value != -99999.0
+                         else "  Data flagged as bad or missing\r\n"))
+    value = -99999.0 if dat is None else dat.value
+    msg.append("DAT" + ("{:>10.3f}".format(value) + "\r\n" if value != -99999.0 else " data not available\r\n"))
+    value = -99999.0 if sns is None else sns.value
+    msg.append("SNS" + ("{:>10.3f}".format(value) + "\r\n" if value != -99999.0 else " data not available\r\n"))
+    if twl is not None:
+        temps = (twl.value, twl.value2, twl.value3, twl.value4, twl.value5, twl.value6)
+        for temp in temps:
+            msg.append("U1" + ("{:>11.3f}".format(temp) + "\r\n" if temp != -99999.0 else " data not available\r\n"))
+    msg.append("\r\nREPORT COMPLETE\r\n")
+    ports_file.write("".join(msg))
 
 
 message_ready = True
@@ -388,19 +410,6 @@ def initialize_config():
     status_message("Initialization complete!")
 
 
-def decimal_to_binary(decimal_number):
-    """
-    This function coverts decimal to 18 bits binary number
-    :param decimal_number: Decimal number
-    :return: 18 bits binary number
-    """
-    bi_num = bin(abs(decimal_number)).replace("0b", "")
-    bi_len = len(bi_num)
-    bi_app = "0" * 18
-    bi_app = bi_app[0:18 - bi_len]
-    return bi_app + bi_num
-
-
 def file_deleter(file_dir):
     """
     This function takes the path of the folder to be checked and deletes the files in that folder that are over
@@ -463,7 +472,10 @@ def goes_message_formatter():
     """
     wind_bird = ""
     station_id = command_line("!STATION NAME\r").strip()
-    tsunami = twl.get_encoded_tsunami()
+    named = named_sensors()
+    pri = add_sns[0]
+    mwstd, mwout, bat, dat, sns = named["MWSTD"], named["MWOUT"], named["BAT"], named["DAT"], named["SNS"]
+    twl = named.get("TWL")  # stations without a tsunami sensor send no tsunami block
     tx_battery = float(command_line("!BATT\r").strip())
     if tx_battery < 9.5:
         tx_battery = 9.5
@@ -471,11 +483,12 @@ def goes_message_formatter():
     if tx_battery > 63:
         tx_battery = 63
     tx_battery = pseudo_encoder(tx_battery, 1, True)
-    tx_message = "P{0}{1}{2}@@{3}0{4}{5}8{6}{7}{8}#{9}<{10} {11}T{12}{13}{14}{15}{16}{17}{18}{19}{20}".format(
+    # the groups are collected in transmission order and joined once: header and water level, then the wind,
+    # AT, WT and BARO groups in sensor order, then battery, TX battery and tsunami
+    segments = ["P{0}{1}{2}@@{3}0{4}{5}8{6}{7}{8}#{9}".format(
         station_id, dat.get_encoded_data(), sns.get_encoded_data(), pri.get_encoded_minute(),
         pri.get_encoded_sutron_day(), pri.get_encoded_hour(), pri.get_encoded_data(), mwstd.get_encoded_data(),
-        mwout.get_encoded_data(), pri.get_encoded_redundant_data(), bat.get_encoded_data(), tx_battery,
-        tsunami[0], tsunami[1], tsunami[2], tsunami[3], tsunami[4], tsunami[5], tsunami[6], tsunami[7], tsunami[8])
+        mwout.get_encoded_data(), pri.get_encoded_redundant_data())]
     for a_s in add_sns:
         if a_s.label == "WS":
             wind_bird += a_s.get_encoded_data()
@@ -483,78 +496,21 @@ def goes_message_formatter():
             wind_bird += a_s.get_encoded_data()
         elif a_s.label == "WG":
             wind_bird += a_s.get_encoded_data()
-            index = tx_message.find('<')
             if len(wind_bird) == 6:
-                tx_message = tx_message[:index] + "3" + wind_bird + tx_message[index:]
+                segments.append("3" + wind_bird)
             else:
-                tx_message = tx_message[:index] + "3" + "??????" + tx_message[index:]
+                segments.append("3??????")
         elif a_s.label == "AT":
-            index = tx_message.find('<')
-            tx_message = tx_message[:index] + "4" + a_s.get_encoded_data() + tx_message[index:]
+            segments.append("4" + a_s.get_encoded_data())
         elif a_s.label == "WT":
-            index = tx_message.find('<')
-            tx_message = tx_message[:index] + "5" + a_s.get_encoded_data() + tx_message[index:]
+            segments.append("5" + a_s.get_encoded_data())
         elif a_s.label == "BARO":
-            index = tx_message.find('<')
-            tx_message = tx_message[:index] + "6" + a_s.get_encoded_data() + tx_message[index:]
-
-    return tx_message
+            segments.append("6" + a_s.get_encoded_data())
+    segments.append("<{0} {1}".format(bat.get_encoded_data(), tx_battery))
+    if twl is not None:
+        segments.append("T" + "".join(twl.get_encoded_tsunami()))
 
-
-def pseudo_encoder(int_val, byt, pos=False):
-    """
-    Pseudobinary encoder function converts binary number from -131072 to 131071
-    :param int_val: Decimal number
-    :param byt: Number of bytes (1,2 or 3)
-    :param pos: Positive only is True
-    :return: Pseudobinary b format
-    """
-    int_val = int(str(int_val).replace(".", ""))
-    iv = 0
-    if int_val < 0 and pos:
-        return "`@@"[:byt]
-    if int_val < 0 and not pos:
-        if byt == 1 and int_val < -31:
-            return "`"
-        if byt == 2 and int_val < -2047:
-            return "`@"
-        if byt == 3 and int_val < -131071:
-            return "`@@"
-        # Call decimal_to_binary Function
-        bi_num = decimal_to_binary(int_val)
-        bi_str = ""
-        for bit in bi_num:
-            if bit == "1":
-                bi_str += "0"
-            else:
-                bi_str += "1"
-        iv = int(bi_str, 2) + 1
-    if int_val >= 0:
-        if not pos:
-            if byt == 1 and int_val > 30:
-                return "_"
-            if byt == 2 and int_val > 2046:
-                return "_?"
-            if byt == 3 and int_val > 131070:
-                return "_??"
-        elif pos:
-            if byt == 1 and int_val > 62:
-                return "?"
-            if byt == 2 and int_val > 4094:
-                return "??"
-            if byt == 3 and int_val > 262142:
-                return "???"
-        iv = int_val
-    bi_array = [iv >> 12, (iv >> 6) & 63, iv & 63]
-    for i in range(3):
-        if bi_array[i] != int(63):
-            bi_array[i] += 64
-    if byt == 1:
-        return chr(bi_array[2])
-    if byt == 2:
-        return chr(bi_array[1]) + chr(bi_array[2])
-    if byt == 3:
-        return chr(bi_array[0]) + chr(bi_array[1]) + chr(bi_array[2])
+    return "".join(segments)
 
 
 @TASK